@@ -0,0 +1,127 @@
+"""initial schema with monthly-partitioned transactions
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Pre-create partitions from the earliest order sync date to a year ahead
+FIRST_PARTITION = date(2015, 1, 1)
+MONTHS_AHEAD = 12
+
+
+def _months(start, end):
+    month = start
+    while month <= end:
+        yield month
+        month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def upgrade():
+    op.create_table(
+        'marketplaces',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('currency_code', sa.String(), nullable=False),
+    )
+    op.create_table(
+        'seller_accounts',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('sp_api_refresh_token', sa.String(), nullable=True),
+        sa.Column('seller_id', sa.String(), nullable=False),
+    )
+    op.create_table(
+        'products',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('asin', sa.String(), nullable=False),
+        sa.Column('sku', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('image_url', sa.String(), nullable=True),
+        sa.Column('marketplace_id', sa.String(), sa.ForeignKey('marketplaces.id'), nullable=False),
+        sa.Column('seller_account_id', UUID(as_uuid=True), sa.ForeignKey('seller_accounts.id'), nullable=False),
+    )
+    op.create_index('ix_products_asin', 'products', ['asin'])
+    op.create_index('ix_products_sku', 'products', ['sku'])
+
+    op.create_table(
+        'product_costs',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('product_id', UUID(as_uuid=True), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('cogs', sa.Numeric(10, 2), nullable=False),
+        sa.Column('supplier_invoice_id', sa.String(), nullable=True),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=True),
+    )
+    op.create_index('ix_product_costs_product_start', 'product_costs', ['product_id', 'start_date'])
+
+    op.create_table(
+        'settlement_reports',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('seller_account_id', UUID(as_uuid=True), sa.ForeignKey('seller_accounts.id'), nullable=False),
+        sa.Column('report_id', sa.String(), nullable=False, unique=True),
+        sa.Column('settlement_id', sa.String(), nullable=True),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=False),
+        sa.Column('deposit_date', sa.DateTime(), nullable=True),
+        sa.Column('total_amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('currency', sa.String(), nullable=True),
+    )
+
+    op.create_table(
+        'transactions',
+        sa.Column('id', UUID(as_uuid=True), nullable=False),
+        sa.Column('posted_date', sa.DateTime(), nullable=False),
+        sa.Column('seller_account_id', UUID(as_uuid=True), sa.ForeignKey('seller_accounts.id'), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('currency', sa.String(), nullable=False),
+        sa.Column('amazon_order_id', sa.String(), nullable=True),
+        sa.Column('sku', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('amount_type', sa.String(), nullable=True),
+        sa.Column('amount_description', sa.String(), nullable=True),
+        sa.Column('related_product_id', UUID(as_uuid=True), sa.ForeignKey('products.id'), nullable=True),
+        sa.Column('settlement_report_id', UUID(as_uuid=True), sa.ForeignKey('settlement_reports.id'), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'posted_date'),
+        postgresql_partition_by='RANGE (posted_date)',
+    )
+    # Indexes on the parent are created on every partition automatically
+    op.create_index('ix_transactions_amazon_order_id', 'transactions', ['amazon_order_id'])
+    op.create_index('ix_transactions_account_posted', 'transactions', ['seller_account_id', 'posted_date'])
+    op.create_index('ix_transactions_posted_brin', 'transactions', ['posted_date'], postgresql_using='brin')
+
+    today = date.today()
+    last = date(today.year + (today.month + MONTHS_AHEAD - 1) // 12, (today.month + MONTHS_AHEAD - 1) % 12 + 1, 1)
+    for month in _months(FIRST_PARTITION, last):
+        following = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+        op.execute(
+            f"CREATE TABLE transactions_{month.year:04d}_{month.month:02d} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+
+def downgrade():
+    # Dropping the parent drops every partition
+    op.drop_table('transactions')
+    op.drop_table('settlement_reports')
+    op.drop_index('ix_product_costs_product_start', table_name='product_costs')
+    op.drop_table('product_costs')
+    op.drop_index('ix_products_sku', table_name='products')
+    op.drop_index('ix_products_asin', table_name='products')
+    op.drop_table('products')
+    op.drop_table('seller_accounts')
+    op.drop_table('marketplaces')
@@ -0,0 +1,38 @@
+"""pnl_daily summary table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pnl_daily',
+        sa.Column('seller_account_id', UUID(as_uuid=True), sa.ForeignKey('seller_accounts.id'), nullable=False),
+        sa.Column('sku', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('revenue', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('fees', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('refunds', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('cogs', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('units', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('uncosted_units', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('seller_account_id', 'sku', 'day'),
+    )
+    op.create_index('ix_pnl_daily_account_day', 'pnl_daily', ['seller_account_id', 'day'])
+
+
+def downgrade():
+    op.drop_index('ix_pnl_daily_account_day', table_name='pnl_daily')
+    op.drop_table('pnl_daily')
@@ -0,0 +1,23 @@
+"""unique (seller_account_id, marketplace_id, sku) on products
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_unique_constraint(
+        'uq_products_account_marketplace_sku', 'products', ['seller_account_id', 'marketplace_id', 'sku']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_products_account_marketplace_sku', 'products', type_='unique')
@@ -0,0 +1,89 @@
+"""orders, order_items, inventory_items, shipments mirrored from Firestore
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('account_key', sa.String(), nullable=False),
+        sa.Column('marketplace_code', sa.String(), nullable=False),
+        sa.Column('purchase_date', sa.DateTime(), nullable=True),
+        sa.Column('order_status', sa.String(), nullable=True),
+        sa.Column('order_total', sa.Numeric(12, 2), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+        sa.Column('fulfillment_channel', sa.String(), nullable=True),
+        sa.Column('estimated_fees', sa.Numeric(12, 2), nullable=True),
+        sa.Column('estimated_proceeds', sa.Numeric(12, 2), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('doc', JSONB(), nullable=False),
+    )
+    op.create_index('ix_orders_account_purchase', 'orders', ['account_key', 'purchase_date'])
+
+    op.create_table(
+        'order_items',
+        sa.Column('order_id', sa.String(), sa.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('line_no', sa.Integer(), nullable=False),
+        sa.Column('sku', sa.String(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('item_price', sa.Numeric(12, 2), nullable=True),
+        sa.PrimaryKeyConstraint('order_id', 'line_no'),
+    )
+    op.create_index('ix_order_items_sku', 'order_items', ['sku'])
+
+    op.create_table(
+        'inventory_items',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('account_key', sa.String(), nullable=False),
+        sa.Column('marketplace_code', sa.String(), nullable=False),
+        sa.Column('sku', sa.String(), nullable=False),
+        sa.Column('asin', sa.String(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('stock_level', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('price', sa.Numeric(12, 2), nullable=True),
+        sa.Column('estimated_fees', sa.Numeric(12, 2), nullable=True),
+        sa.Column('estimated_proceeds', sa.Numeric(12, 2), nullable=True),
+        sa.Column('last_sold_date', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('doc', JSONB(), nullable=False),
+    )
+    op.create_index('ix_inventory_items_account_sku', 'inventory_items', ['account_key', 'marketplace_code', 'sku'])
+
+    op.create_table(
+        'shipments',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('account_key', sa.String(), nullable=False),
+        sa.Column('marketplace_code', sa.String(), nullable=False),
+        sa.Column('shipment_name', sa.String(), nullable=True),
+        sa.Column('destination', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('units', sa.Integer(), nullable=True),
+        sa.Column('created_date', sa.Date(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('doc', JSONB(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('shipments')
+    op.drop_index('ix_inventory_items_account_sku', table_name='inventory_items')
+    op.drop_table('inventory_items')
+    op.drop_index('ix_order_items_sku', table_name='order_items')
+    op.drop_table('order_items')
+    op.drop_index('ix_orders_account_purchase', table_name='orders')
+    op.drop_table('orders')
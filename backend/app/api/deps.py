@@ -0,0 +1,7 @@
+from app.db.session import AsyncSessionLocal
+
+
+async def get_db():
+    """Per-request async database session."""
+    async with AsyncSessionLocal() as session:
+        yield session
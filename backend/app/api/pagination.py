@@ -0,0 +1,58 @@
+"""
+Keyset (seek) pagination helpers.
+
+Cursors are opaque URL-safe strings encoding the sort key of the last row
+of the previous page, so each page is an index range scan instead of an
+OFFSET that re-reads every earlier row.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, *parsers):
+    """
+    Returns the cursor's values, each converted by the matching parser
+    (e.g. datetime.fromisoformat, uuid.UUID), or raises 400 if the cursor
+    is malformed or any value fails to parse.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(parsers):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_of(rows, limit, key):
+    """
+    Callers fetch limit + 1 rows; the extra row only signals another page.
+    `key(row)` returns the sort-key tuple to encode in the next cursor.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*key(rows[-1])) if has_more and rows else None
+    return rows, next_cursor
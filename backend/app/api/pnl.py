@@ -0,0 +1,64 @@
+import uuid
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.services.pnl_summary import query_pnl_by_sku, query_pnl_daily
+
+router = APIRouter(prefix="/pnl", tags=["pnl"])
+
+# Upper bound on a single request's date range
+MAX_RANGE_DAYS = 3 * 366
+
+
+class PnlRow(BaseModel):
+    sku: str
+    day: Optional[date] = None
+    revenue: float
+    fees: float
+    refunds: float
+    cogs: float
+    units: int
+    uncosted_units: int
+    net: float
+
+
+def _validate_range(start: date, end: date):
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_RANGE_DAYS} days")
+
+
+def _to_row(record, day=None):
+    revenue, fees, refunds, cogs = (float(record.revenue), float(record.fees), float(record.refunds), float(record.cogs))
+    return PnlRow(
+        sku=record.sku,
+        day=day,
+        revenue=revenue,
+        fees=fees,
+        refunds=refunds,
+        cogs=cogs,
+        units=int(record.units),
+        uncosted_units=int(record.uncosted_units),
+        net=round(revenue + fees + refunds - cogs, 2)
+    )
+
+
+@router.get("/daily", response_model=List[PnlRow])
+async def get_pnl_daily(seller_account_id: uuid.UUID, start: date, end: date, sku: Optional[str] = None,
+                        db: AsyncSession = Depends(get_db)):
+    """Per-SKU, per-day P&L from the pnl_daily summary table."""
+    _validate_range(start, end)
+    return [_to_row(r, r.day) for r in await query_pnl_daily(db, seller_account_id, start, end, sku)]
+
+
+@router.get("/skus", response_model=List[PnlRow])
+async def get_pnl_by_sku(seller_account_id: uuid.UUID, start: date, end: date, db: AsyncSession = Depends(get_db)):
+    """Per-SKU totals over a date range, largest revenue first."""
+    _validate_range(start, end)
+    return [_to_row(r) for r in await query_pnl_by_sku(db, seller_account_id, start, end)]
@@ -0,0 +1,51 @@
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, decode_cursor, page_of
+from app.db.models import Product
+
+router = APIRouter(prefix="/products", tags=["products"])
+
+
+class ProductOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    asin: str
+    sku: str
+    title: Optional[str] = None
+    image_url: Optional[str] = None
+    marketplace_id: str
+    seller_account_id: uuid.UUID
+
+
+@router.get("", response_model=Page[ProductOut])
+async def list_products(
+    seller_account_id: Optional[uuid.UUID] = None,
+    marketplace_id: Optional[str] = None,
+    asin: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Products ordered by (sku, id), keyset-paginated."""
+    stmt = select(Product).order_by(Product.sku, Product.id).limit(limit + 1)
+    if seller_account_id:
+        stmt = stmt.where(Product.seller_account_id == seller_account_id)
+    if marketplace_id:
+        stmt = stmt.where(Product.marketplace_id == marketplace_id)
+    if asin:
+        stmt = stmt.where(Product.asin == asin)
+    if cursor:
+        sku, last_id = decode_cursor(cursor, str, uuid.UUID)
+        stmt = stmt.where(tuple_(Product.sku, Product.id) > tuple_(sku, last_id))
+
+    rows = (await db.execute(stmt)).scalars().all()
+    items, next_cursor = page_of(rows, limit, lambda p: (p.sku, p.id))
+    return Page[ProductOut](items=items, next_cursor=next_cursor)
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+
+from app.api import pnl, products, settlement_reports, transactions
+
+api_router = APIRouter()
+api_router.include_router(products.router)
+api_router.include_router(transactions.router)
+api_router.include_router(settlement_reports.router)
+api_router.include_router(pnl.router)
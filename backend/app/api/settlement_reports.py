@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, decode_cursor, page_of
+from app.db.models import SettlementReport
+
+router = APIRouter(prefix="/settlement-reports", tags=["settlement-reports"])
+
+
+class SettlementReportOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    seller_account_id: uuid.UUID
+    report_id: str
+    settlement_id: Optional[str] = None
+    start_date: datetime
+    end_date: datetime
+    deposit_date: Optional[datetime] = None
+    total_amount: Decimal
+    currency: Optional[str] = None
+
+
+@router.get("", response_model=Page[SettlementReportOut])
+async def list_settlement_reports(
+    seller_account_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Settlement reports for an account, most recent period first, keyset-paginated."""
+    stmt = (
+        select(SettlementReport)
+        .where(SettlementReport.seller_account_id == seller_account_id)
+        .order_by(SettlementReport.end_date.desc(), SettlementReport.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        end_date, last_id = decode_cursor(cursor, datetime.fromisoformat, uuid.UUID)
+        stmt = stmt.where(
+            tuple_(SettlementReport.end_date, SettlementReport.id)
+            < tuple_(end_date, last_id)
+        )
+
+    rows = (await db.execute(stmt)).scalars().all()
+    items, next_cursor = page_of(rows, limit, lambda r: (r.end_date, r.id))
+    return Page[SettlementReportOut](items=items, next_cursor=next_cursor)
+
+
+@router.get("/{report_id}", response_model=SettlementReportOut)
+async def get_settlement_report(report_id: str, db: AsyncSession = Depends(get_db)):
+    """Looks a report up by its SP-API report_id."""
+    report = (await db.execute(
+        select(SettlementReport).where(SettlementReport.report_id == report_id)
+    )).scalar_one_or_none()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Settlement report not found")
+    return report
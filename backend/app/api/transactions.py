@@ -0,0 +1,78 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, decode_cursor, page_of
+from app.db.models import Transaction
+
+router = APIRouter(prefix="/transactions", tags=["transactions"])
+
+
+class TransactionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    seller_account_id: uuid.UUID
+    posted_date: datetime
+    type: str
+    amount: Decimal
+    currency: str
+    amazon_order_id: Optional[str] = None
+    sku: Optional[str] = None
+    quantity: Optional[int] = None
+    amount_type: Optional[str] = None
+    amount_description: Optional[str] = None
+    related_product_id: Optional[uuid.UUID] = None
+    settlement_report_id: Optional[uuid.UUID] = None
+
+
+@router.get("", response_model=Page[TransactionOut])
+async def list_transactions(
+    seller_account_id: uuid.UUID,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sku: Optional[str] = None,
+    amazon_order_id: Optional[str] = None,
+    type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Transactions for an account, newest first, keyset-paginated on
+    (posted_date, id). start/end bound posted_date so only the matching
+    monthly partitions are scanned.
+    """
+    stmt = (
+        select(Transaction)
+        .where(Transaction.seller_account_id == seller_account_id)
+        .order_by(Transaction.posted_date.desc(), Transaction.id.desc())
+        .limit(limit + 1)
+    )
+    if start:
+        stmt = stmt.where(Transaction.posted_date >= start)
+    if end:
+        stmt = stmt.where(Transaction.posted_date < end)
+    if sku:
+        stmt = stmt.where(Transaction.sku == sku)
+    if amazon_order_id:
+        stmt = stmt.where(Transaction.amazon_order_id == amazon_order_id)
+    if type:
+        stmt = stmt.where(Transaction.type == type)
+    if cursor:
+        posted_date, last_id = decode_cursor(cursor, datetime.fromisoformat, uuid.UUID)
+        stmt = stmt.where(
+            tuple_(Transaction.posted_date, Transaction.id)
+            < tuple_(posted_date, last_id)
+        )
+
+    rows = (await db.execute(stmt)).scalars().all()
+    items, next_cursor = page_of(rows, limit, lambda t: (t.posted_date, t.id))
+    return Page[TransactionOut](items=items, next_cursor=next_cursor)
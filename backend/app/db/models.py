@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime, date
-from sqlalchemy import Column, String, Integer, Float, DateTime, Date, ForeignKey, Numeric
+from sqlalchemy import Column, String, Integer, Float, DateTime, Date, ForeignKey, Numeric, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 Base = declarative_base()
 
@@ -32,6 +32,10 @@ class SellerAccount(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Conflict target for the bulk catalog upsert (app.services.catalog_upsert)
+        UniqueConstraint("seller_account_id", "marketplace_id", "sku", name="uq_products_account_marketplace_sku"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     asin = Column(String, nullable=False, index=True)
@@ -50,6 +54,10 @@ class Product(Base):
 
 class ProductCost(Base):
     __tablename__ = "product_costs"
+    __table_args__ = (
+        # As-of lookups: cost in effect for a product on a given date
+        Index("ix_product_costs_product_start", "product_id", "start_date"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
@@ -65,21 +73,37 @@ class ProductCost(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
-
+    __table_args__ = (
+        # Account + date range filters on every analytical query
+        Index("ix_transactions_account_posted", "seller_account_id", "posted_date"),
+        Index("ix_transactions_posted_brin", "posted_date", postgresql_using="brin"),
+        # Monthly partitions, managed by Alembic and app.db.partitions
+        {"postgresql_partition_by": "RANGE (posted_date)"},
+    )
+
+    # posted_date is part of the key because it is the partition key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    posted_date = Column(DateTime, primary_key=True, nullable=False)
     seller_account_id = Column(UUID(as_uuid=True), ForeignKey("seller_accounts.id"), nullable=False)
     
-    posted_date = Column(DateTime, nullable=False)
     type = Column(String, nullable=False) # Order, Refund, ServiceFee, Adjustment
     amount = Column(Numeric(12, 2), nullable=False)
     currency = Column(String, nullable=False)
     amazon_order_id = Column(String, nullable=True, index=True)
     
+    # Settlement line detail (flat file V2): e.g. amount_type "ItemPrice", amount_description "Principal"
+    sku = Column(String, nullable=True)
+    quantity = Column(Integer, nullable=True)
+    amount_type = Column(String, nullable=True)
+    amount_description = Column(String, nullable=True)
+    
     related_product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=True)
+    settlement_report_id = Column(UUID(as_uuid=True), ForeignKey("settlement_reports.id"), nullable=True)
     
     # Relationships
     seller_account = relationship("SellerAccount", back_populates="transactions")
     product = relationship("Product", back_populates="transactions")
+    settlement_report = relationship("SettlementReport", back_populates="transactions")
 
 class SettlementReport(Base):
     __tablename__ = "settlement_reports"
@@ -87,11 +111,118 @@ class SettlementReport(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     seller_account_id = Column(UUID(as_uuid=True), ForeignKey("seller_accounts.id"), nullable=False)
     
-    report_id = Column(String, nullable=False, unique=True)
+    report_id = Column(String, nullable=False, unique=True) # SP-API reportId
+    settlement_id = Column(String, nullable=True) # Amazon settlement-id from the report body
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=False)
     deposit_date = Column(DateTime, nullable=True)
     total_amount = Column(Numeric(12, 2), nullable=False)
+    currency = Column(String, nullable=True)
     
     # Relationships
     seller_account = relationship("SellerAccount", back_populates="settlement_reports")
+    transactions = relationship("Transaction", back_populates="settlement_report")
+
+class PnlDaily(Base):
+    """
+    Per-SKU, per-day P&L summary. Maintained incrementally by
+    app.services.pnl_summary for the dates each ingest touches.
+    """
+    __tablename__ = "pnl_daily"
+
+    seller_account_id = Column(UUID(as_uuid=True), ForeignKey("seller_accounts.id"), primary_key=True)
+    sku = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    fees = Column(Numeric(14, 2), nullable=False, default=0)
+    refunds = Column(Numeric(14, 2), nullable=False, default=0)
+    cogs = Column(Numeric(14, 2), nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    uncosted_units = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_pnl_daily_account_day", "seller_account_id", "day"),
+    )
+
+
+# --- Mirror of the Firestore operational collections ---
+# Written by the Postgres sync sink (functions/postgres_sink.py). Keys are the
+# Firestore document IDs; account_key / marketplace_code are the Firestore
+# accountId / marketplaceId values ('default_account_1', 'US'). `doc` keeps the
+# full document so new Firestore fields are not lost before they get a column.
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(String, primary_key=True)  # Amazon order ID
+    account_key = Column(String, nullable=False)
+    marketplace_code = Column(String, nullable=False)
+    purchase_date = Column(DateTime, nullable=True)
+    order_status = Column(String, nullable=True)
+    order_total = Column(Numeric(12, 2), nullable=True)
+    currency = Column(String, nullable=True)
+    fulfillment_channel = Column(String, nullable=True)
+    estimated_fees = Column(Numeric(12, 2), nullable=True)
+    estimated_proceeds = Column(Numeric(12, 2), nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    doc = Column(JSONB, nullable=False)
+
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_orders_account_purchase", "account_key", "purchase_date"),
+    )
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    order_id = Column(String, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True)
+    line_no = Column(Integer, primary_key=True)
+    sku = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    quantity = Column(Integer, nullable=True)
+    item_price = Column(Numeric(12, 2), nullable=True)
+
+    order = relationship("Order", back_populates="items")
+
+    __table_args__ = (
+        Index("ix_order_items_sku", "sku"),
+    )
+
+class InventoryItem(Base):
+    __tablename__ = "inventory_items"
+
+    id = Column(String, primary_key=True)  # {accountId}_{marketplace}_{sku}
+    account_key = Column(String, nullable=False)
+    marketplace_code = Column(String, nullable=False)
+    sku = Column(String, nullable=False)
+    asin = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    stock_level = Column(Integer, nullable=True)
+    status = Column(String, nullable=True)
+    price = Column(Numeric(12, 2), nullable=True)
+    estimated_fees = Column(Numeric(12, 2), nullable=True)
+    estimated_proceeds = Column(Numeric(12, 2), nullable=True)
+    last_sold_date = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    doc = Column(JSONB, nullable=False)
+
+    __table_args__ = (
+        Index("ix_inventory_items_account_sku", "account_key", "marketplace_code", "sku"),
+    )
+
+class Shipment(Base):
+    __tablename__ = "shipments"
+
+    id = Column(String, primary_key=True)  # FBA shipment ID
+    account_key = Column(String, nullable=False)
+    marketplace_code = Column(String, nullable=False)
+    shipment_name = Column(String, nullable=True)
+    destination = Column(String, nullable=True)
+    status = Column(String, nullable=True)
+    units = Column(Integer, nullable=True)
+    created_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    doc = Column(JSONB, nullable=False)
@@ -0,0 +1,47 @@
+"""
+Monthly range partitions for the transactions table.
+
+Partitions are named transactions_YYYY_MM and cover [first of month, first of
+next month). Rows outside every partition land in transactions_default, but a
+month partition cannot be created while the default partition holds rows for
+it, so loaders call ensure_transaction_partitions() for their date range first.
+"""
+from datetime import date, datetime
+
+DEFAULT_PARTITION = "transactions_default"
+
+
+def month_start(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"transactions_{month.year:04d}_{month.month:02d}"
+
+
+def partition_ddl(month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF transactions "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+def iter_months(start, end):
+    """Month starts covering [start, end] inclusive."""
+    month = month_start(start)
+    last = month_start(end)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def ensure_transaction_partitions(cursor, start, end):
+    """Creates any missing monthly partitions for [start, end] (DB-API cursor)."""
+    for month in iter_months(start, end):
+        cursor.execute(partition_ddl(month))
@@ -0,0 +1,33 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+
+# Synchronous engine for batch jobs (ingestion, backfills). Pinned to psycopg2
+# because the loaders use its COPY support (cursor.copy_expert).
+engine = create_engine(
+    make_url(settings.DATABASE_URL).set(drivername="postgresql+psycopg2"),
+    pool_pre_ping=True,
+    pool_size=5,
+    max_overflow=5
+)
+
+SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+# Async engine for the API. asyncpg keeps a per-connection prepared statement
+# cache, and SQLAlchemy caches compiled SQL, so hot queries skip both
+# compilation and server-side planning after first use.
+async_engine = create_async_engine(
+    make_url(settings.DATABASE_URL).set(
+        drivername="postgresql+asyncpg",
+        query={"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+    ),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=True,
+    query_cache_size=1200
+)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,132 @@
+"""
+Bulk product catalog upsert: inventory sync rows -> products table.
+
+Rows are written with multi-row INSERT ... ON CONFLICT (seller_account_id,
+marketplace_id, sku) statements, one per batch. The DO UPDATE is guarded by
+IS DISTINCT FROM, so unchanged products are neither rewritten nor bloat the
+table; RETURNING (xmax = 0) tells inserts from updates.
+
+CLI (loads an inventory snapshot, e.g. from the functions dev server):
+    cd backend
+    python -m app.services.catalog_upsert --account-id <seller_account uuid> \
+        --marketplace-id ATVPDKIKX0DER --from-json ../functions/data/inventory.json
+    python -m app.services.catalog_upsert --account-id <uuid> --marketplace-id ATVPDKIKX0DER --synthetic 200000
+"""
+import json
+import sys
+import time
+import uuid
+
+from psycopg2.extras import execute_values
+
+# Rows per INSERT statement
+UPSERT_BATCH_ROWS = 1000
+
+UPSERT_SQL = """
+INSERT INTO products (id, seller_account_id, marketplace_id, sku, asin, title, image_url)
+VALUES %s
+ON CONFLICT (seller_account_id, marketplace_id, sku) DO UPDATE
+   SET asin = EXCLUDED.asin,
+       title = COALESCE(EXCLUDED.title, products.title),
+       image_url = COALESCE(EXCLUDED.image_url, products.image_url)
+ WHERE (products.asin, products.title, products.image_url)
+       IS DISTINCT FROM (EXCLUDED.asin, COALESCE(EXCLUDED.title, products.title),
+                         COALESCE(EXCLUDED.image_url, products.image_url))
+RETURNING (xmax = 0) AS inserted
+"""
+
+
+def products_from_inventory(items, marketplace_code=None):
+    """
+    Maps inventory sync records (sp_api_sync.sync_inventory_from_api) to
+    product rows, optionally keeping only one marketplace code ('US', 'UK').
+    The last record wins when a SKU appears more than once.
+    """
+    products = {}
+    for item in items:
+        sku = item.get('sku')
+        if not sku or not item.get('asin'):
+            continue
+        if marketplace_code and item.get('marketplaceId') != marketplace_code:
+            continue
+        title = item.get('title')
+        products[sku] = {
+            "sku": sku,
+            "asin": item['asin'],
+            "title": None if title == 'Unknown Product' else title,
+            "image_url": item.get('image_url')
+        }
+    return list(products.values())
+
+
+def upsert_products(engine, seller_account_id, marketplace_id, products, batch_size=UPSERT_BATCH_ROWS):
+    """
+    Upserts product dicts (sku, asin, title, image_url) for one account and
+    marketplace in a single transaction. Returns stats with inserted /
+    updated / unchanged counts.
+    """
+    started = time.time()
+    # ON CONFLICT cannot touch the same row twice in one statement
+    by_sku = {p["sku"]: p for p in products}
+    rows = [
+        (str(uuid.uuid4()), str(seller_account_id), marketplace_id, p["sku"], p["asin"], p.get("title"), p.get("image_url"))
+        for p in by_sku.values()
+    ]
+
+    inserted = updated = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            results = execute_values(cursor, UPSERT_SQL, batch, page_size=len(batch), fetch=True)
+            batch_inserted = sum(1 for (was_insert,) in results if was_insert)
+            inserted += batch_inserted
+            updated += len(results) - batch_inserted
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    elapsed = time.time() - started
+    rate = len(rows) / elapsed if elapsed > 0 else 0
+    unchanged = len(rows) - inserted - updated
+    print(f"    [Catalog] {len(rows)} products for {marketplace_id}: {inserted} inserted, {updated} updated, "
+          f"{unchanged} unchanged in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return {
+        "rows": len(rows),
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "seconds": elapsed
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk upsert inventory rows into the products table.")
+    parser.add_argument("--account-id", required=True, help="seller_accounts.id")
+    parser.add_argument("--marketplace-id", required=True, help="marketplaces.id, e.g. ATVPDKIKX0DER")
+    parser.add_argument("--marketplace-code", help="Only load inventory records with this marketplaceId (e.g. US)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-json", help="Inventory snapshot (list of inventory records)")
+    source.add_argument("--synthetic", type=int, help="Upsert N generated products (benchmark)")
+    args = parser.parse_args()
+
+    from app.db.session import engine
+
+    if args.from_json:
+        with open(args.from_json) as f:
+            products = products_from_inventory(json.load(f), args.marketplace_code)
+    else:
+        products = [
+            {"sku": f"SYN-{i:07d}", "asin": f"B0SYN{i:05d}", "title": f"Synthetic product {i}"}
+            for i in range(args.synthetic)
+        ]
+
+    if not products:
+        sys.exit("No products to upsert.")
+    upsert_products(engine, args.account_id, args.marketplace_id, products)
@@ -0,0 +1,79 @@
+"""
+Incremental maintenance of the pnl_daily summary table.
+
+After each ingest only the (account, day) range it touched is recomputed:
+the range is deleted and re-aggregated from transactions in the caller's
+database transaction, so dashboards never see a half-refreshed day.
+The summary is built from settlement transactions only, so settlement
+ingest is the one path that refreshes it; the Firestore order mirror does
+not feed transactions and leaves pnl_daily unchanged.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.db.models import PnlDaily
+from app.services.profitability import SQL_COST_JOIN, SQL_PNL_MEASURES
+
+REFRESH_SQL = f"""
+INSERT INTO pnl_daily (seller_account_id, sku, day, revenue, fees, refunds, cogs, units, uncosted_units, refreshed_at)
+SELECT t.seller_account_id, t.sku, t.posted_date::date AS day,{SQL_PNL_MEASURES},
+       now()
+FROM transactions t{SQL_COST_JOIN}
+WHERE t.seller_account_id = %(account)s
+  AND t.posted_date >= %(start)s AND t.posted_date < %(end)s
+  AND t.sku IS NOT NULL
+GROUP BY 1, 2, 3
+"""
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def refresh_pnl_daily(cursor, seller_account_id, first_day, last_day):
+    """Recomputes pnl_daily for one account over [first_day, last_day] (DB-API cursor)."""
+    first_day = _as_date(first_day)
+    last_day = _as_date(last_day)
+    params = {
+        "account": str(seller_account_id),
+        "start": first_day,
+        "end": last_day + timedelta(days=1)
+    }
+    cursor.execute(
+        "DELETE FROM pnl_daily WHERE seller_account_id = %(account)s AND day >= %(start)s AND day < %(end)s",
+        params
+    )
+    cursor.execute(REFRESH_SQL, params)
+    print(f"    [P&L] Refreshed pnl_daily {first_day} .. {last_day}: {cursor.rowcount} SKU-days")
+
+
+async def query_pnl_daily(session, seller_account_id, start, end, sku=None):
+    """Per-SKU, per-day rows for [start, end]."""
+    stmt = (
+        select(PnlDaily)
+        .where(PnlDaily.seller_account_id == seller_account_id, PnlDaily.day >= start, PnlDaily.day <= end)
+        .order_by(PnlDaily.day, PnlDaily.sku)
+    )
+    if sku:
+        stmt = stmt.where(PnlDaily.sku == sku)
+    return (await session.execute(stmt)).scalars().all()
+
+
+async def query_pnl_by_sku(session, seller_account_id, start, end):
+    """Per-SKU totals for [start, end], largest revenue first."""
+    stmt = (
+        select(
+            PnlDaily.sku,
+            func.sum(PnlDaily.revenue).label("revenue"),
+            func.sum(PnlDaily.fees).label("fees"),
+            func.sum(PnlDaily.refunds).label("refunds"),
+            func.sum(PnlDaily.cogs).label("cogs"),
+            func.sum(PnlDaily.units).label("units"),
+            func.sum(PnlDaily.uncosted_units).label("uncosted_units"),
+        )
+        .where(PnlDaily.seller_account_id == seller_account_id, PnlDaily.day >= start, PnlDaily.day <= end)
+        .group_by(PnlDaily.sku)
+        .order_by(func.sum(PnlDaily.revenue).desc())
+    )
+    return (await session.execute(stmt)).all()
@@ -0,0 +1,268 @@
+"""
+Per-SKU, per-period P&L over transactions with date-effective COGS.
+
+Each sale has to be costed with the ProductCost row in effect on its
+posted_date. Rather than a per-row lookup, the as-of match is done in bulk:
+cost rows are sorted by (product, start_day) and every transaction finds its
+cost with a single np.searchsorted over composite integer keys.
+
+compute_pnl_sql() does the same join inside Postgres as a LATERAL lookup of
+the latest product_costs row per (product_id, start_date), for callers that
+don't need the rows in Python. Both paths cost a sale with at most one row,
+so overlapping or touching cost ranges never duplicate a transaction.
+"""
+import numpy as np
+
+# Periods accepted by compute_pnl / compute_pnl_sql (Postgres date_trunc names)
+PERIODS = ("day", "week", "month")
+
+# Keeps (product, day) keys unique: day numbers are far below 2**20 (~2870 AD)
+_DAY_BITS = 20
+
+
+def asof_unit_costs(tx_product, tx_day, cost_product, cost_start, cost_end, cost_value):
+    """
+    Vectorized as-of join. All inputs are NumPy arrays:
+      tx_product, tx_day: int codes / days-since-epoch per transaction (product -1 = none)
+      cost_product, cost_start, cost_end, cost_value: one entry per ProductCost row;
+      cost_end may be -1 for "still active".
+    Returns a float array of unit costs, NaN where no cost was in effect.
+    """
+    order = np.lexsort((cost_start, cost_product))
+    cost_product = cost_product[order]
+    cost_start = cost_start[order]
+    cost_end = np.where(cost_end[order] < 0, np.iinfo(np.int64).max, cost_end[order])
+    cost_value = cost_value[order]
+
+    cost_keys = (cost_product.astype(np.int64) << _DAY_BITS) + cost_start.astype(np.int64)
+    tx_keys = (tx_product.astype(np.int64) << _DAY_BITS) + tx_day.astype(np.int64)
+
+    idx = np.searchsorted(cost_keys, tx_keys, side='right') - 1
+    safe_idx = np.clip(idx, 0, None)
+    matched = (
+        (idx >= 0)
+        & (tx_product >= 0)
+        & (cost_product[safe_idx] == tx_product)
+        & (tx_day <= cost_end[safe_idx])
+    )
+    return np.where(matched, cost_value[safe_idx], np.nan)
+
+
+def period_start_days(tx_day, period):
+    """First day of the period (Monday-based weeks, like date_trunc) for each day number."""
+    if period == "day":
+        return tx_day.astype(np.int64)
+    if period == "week":
+        # Day 0 (1970-01-01) is a Thursday; shift so weeks start on Monday
+        return (tx_day + 3) // 7 * 7 - 3
+    if period == "month":
+        return tx_day.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def aggregate_pnl(tx_sku, tx_day, tx_amount, tx_quantity, tx_kind, unit_cost, period="month"):
+    """
+    Groups transactions by (sku code, period) and sums revenue, fees, refunds
+    and COGS. tx_kind: 0 = principal revenue (ItemPrice / Principal on
+    orders), 3 = other revenue (ItemPrice shipping, tax, gift wrap), 1 = fee,
+    2 = refund. Settlement V2 repeats quantity-purchased on every ItemPrice
+    row of an order item, so units and COGS (quantity * unit cost) are
+    counted on principal rows only.
+    Returns a dict of equal-length arrays (sku, period_start, revenue, fees,
+    refunds, cogs, units, net, uncosted_units).
+    """
+    period_day = period_start_days(tx_day, period)
+    keys = (tx_sku.astype(np.int64) << 32) | (period_day - period_day.min())
+    group_keys, group = np.unique(keys, return_inverse=True)
+    n = len(group_keys)
+
+    is_revenue = (tx_kind == 0) | (tx_kind == 3)
+    is_principal = tx_kind == 0
+    costed = is_principal & ~np.isnan(unit_cost)
+    units = np.where(is_principal, tx_quantity, 0)
+
+    def total(weights):
+        return np.bincount(group, weights=weights, minlength=n)
+
+    revenue = total(np.where(is_revenue, tx_amount, 0.0))
+    fees = total(np.where(tx_kind == 1, tx_amount, 0.0))
+    refunds = total(np.where(tx_kind == 2, tx_amount, 0.0))
+    cogs = total(np.where(costed, tx_quantity * np.nan_to_num(unit_cost), 0.0))
+
+    first = np.zeros(n, dtype=np.int64)
+    first[group[::-1]] = np.arange(len(group))[::-1]
+
+    return {
+        "sku": tx_sku[first],
+        "period_start": period_day[first].astype('datetime64[D]'),
+        "revenue": revenue,
+        "fees": fees,
+        "refunds": refunds,
+        "cogs": cogs,
+        "units": total(units).astype(np.int64),
+        "uncosted_units": total(np.where(is_principal & ~costed, tx_quantity, 0)).astype(np.int64),
+        "net": revenue + fees + refunds - cogs
+    }
+
+
+def _classify(tx_type, amount_type, amount_description):
+    if tx_type == "Refund":
+        return 2
+    if tx_type == "Order" and amount_type == "ItemPrice":
+        return 0 if amount_description == "Principal" else 3
+    return 1
+
+
+def load_cost_arrays(cursor, seller_account_id):
+    """Returns (product_codes {product_id: code}, cost arrays) for an account."""
+    cursor.execute(
+        "SELECT pc.product_id, pc.start_date, pc.end_date, pc.cogs FROM product_costs pc "
+        "JOIN products p ON p.id = pc.product_id WHERE p.seller_account_id = %s",
+        (str(seller_account_id),)
+    )
+    rows = cursor.fetchall()
+    product_codes = {}
+    products, starts, ends, values = [], [], [], []
+    for product_id, start_date, end_date, cogs in rows:
+        products.append(product_codes.setdefault(str(product_id), len(product_codes)))
+        starts.append(start_date)
+        ends.append(end_date)
+        values.append(float(cogs))
+
+    start_days = np.array(starts, dtype='datetime64[D]').astype(np.int64)
+    end_days = np.array([e if e is not None else np.datetime64('NaT') for e in ends], dtype='datetime64[D]')
+    end_days = np.where(np.isnat(end_days), -1, end_days.astype(np.int64))
+    return product_codes, (
+        np.array(products, dtype=np.int64), start_days, end_days, np.array(values, dtype=np.float64)
+    )
+
+
+def load_transaction_arrays(cursor, seller_account_id, start, end, product_codes, batch_size=100000):
+    """Streams transactions for the account/date range into column arrays."""
+    cursor.execute(
+        "SELECT related_product_id, sku, posted_date, type, amount_type, amount_description, amount, quantity "
+        "FROM transactions WHERE seller_account_id = %s AND posted_date >= %s AND posted_date < %s "
+        "AND sku IS NOT NULL",
+        (str(seller_account_id), start, end)
+    )
+    sku_codes = {}
+    products, skus, days, amounts, quantities, kinds = [], [], [], [], [], []
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for product_id, sku, posted_date, tx_type, amount_type, amount_description, amount, quantity in rows:
+            products.append(product_codes.get(str(product_id), -1) if product_id else -1)
+            skus.append(sku_codes.setdefault(sku, len(sku_codes)))
+            days.append(posted_date)
+            amounts.append(float(amount))
+            quantities.append(quantity or 0)
+            kinds.append(_classify(tx_type, amount_type, amount_description))
+
+    sku_names = np.array(list(sku_codes), dtype=object)
+    return sku_names, {
+        "product": np.array(products, dtype=np.int64),
+        "sku": np.array(skus, dtype=np.int64),
+        "day": np.array(days, dtype='datetime64[D]').astype(np.int64),
+        "amount": np.array(amounts, dtype=np.float64),
+        "quantity": np.array(quantities, dtype=np.float64),
+        "kind": np.array(kinds, dtype=np.int8)
+    }
+
+
+def compute_pnl(engine, seller_account_id, start, end, period="month"):
+    """
+    Per-SKU, per-period P&L for [start, end) computed in NumPy.
+    Returns a list of row dicts sorted by sku, period_start.
+    """
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        product_codes, costs = load_cost_arrays(cursor, seller_account_id)
+        sku_names, tx = load_transaction_arrays(cursor, seller_account_id, start, end, product_codes)
+    finally:
+        raw.close()
+
+    if len(tx["day"]) == 0:
+        return []
+
+    unit_cost = asof_unit_costs(tx["product"], tx["day"], *costs)
+    result = aggregate_pnl(tx["sku"], tx["day"], tx["amount"], tx["quantity"], tx["kind"], unit_cost, period)
+
+    rows = []
+    for i in range(len(result["sku"])):
+        rows.append({
+            "sku": sku_names[result["sku"][i]],
+            "period_start": str(result["period_start"][i]),
+            "revenue": round(float(result["revenue"][i]), 2),
+            "fees": round(float(result["fees"][i]), 2),
+            "refunds": round(float(result["refunds"][i]), 2),
+            "cogs": round(float(result["cogs"][i]), 2),
+            "units": int(result["units"][i]),
+            "uncosted_units": int(result["uncosted_units"][i]),
+            "net": round(float(result["net"][i]), 2)
+        })
+    rows.sort(key=lambda r: (r["sku"], r["period_start"]))
+    return rows
+
+
+# Classification shared by every SQL P&L query (see _classify for the NumPy path)
+# and the pnl_daily summary table. `t` = transactions, `pc` = product_costs.
+SQL_IS_REVENUE = "(t.type = 'Order' AND t.amount_type = 'ItemPrice')"
+# Units and COGS only on the Principal row: quantity repeats on every ItemPrice row of an item
+SQL_IS_PRINCIPAL = f"({SQL_IS_REVENUE} AND t.amount_description = 'Principal')"
+SQL_PNL_MEASURES = f"""
+       SUM(CASE WHEN {SQL_IS_REVENUE} THEN t.amount ELSE 0 END) AS revenue,
+       SUM(CASE WHEN t.type <> 'Refund' AND NOT {SQL_IS_REVENUE} THEN t.amount ELSE 0 END) AS fees,
+       SUM(CASE WHEN t.type = 'Refund' THEN t.amount ELSE 0 END) AS refunds,
+       SUM(CASE WHEN {SQL_IS_PRINCIPAL} THEN COALESCE(t.quantity, 0) * COALESCE(pc.cogs, 0) ELSE 0 END) AS cogs,
+       SUM(CASE WHEN {SQL_IS_PRINCIPAL} THEN COALESCE(t.quantity, 0) ELSE 0 END) AS units,
+       SUM(CASE WHEN {SQL_IS_PRINCIPAL} AND pc.id IS NULL THEN COALESCE(t.quantity, 0) ELSE 0 END) AS uncosted_units"""
+# As-of join, like asof_unit_costs: the latest cost row starting on or before
+# the posted day, used only if it has not ended by then.
+SQL_COST_JOIN = """
+LEFT JOIN LATERAL (
+    SELECT c.id, c.cogs, c.end_date
+    FROM product_costs c
+    WHERE c.product_id = t.related_product_id
+      AND c.start_date <= t.posted_date::date
+    ORDER BY c.start_date DESC
+    LIMIT 1
+) pc ON pc.end_date IS NULL OR pc.end_date >= t.posted_date::date"""
+
+PNL_SQL = f"""
+SELECT t.sku,
+       date_trunc(%(period)s, t.posted_date)::date AS period_start,{SQL_PNL_MEASURES}
+FROM transactions t{SQL_COST_JOIN}
+WHERE t.seller_account_id = %(account)s
+  AND t.posted_date >= %(start)s AND t.posted_date < %(end)s
+  AND t.sku IS NOT NULL
+GROUP BY 1, 2
+ORDER BY 1, 2
+"""
+
+
+def compute_pnl_sql(engine, seller_account_id, start, end, period="month"):
+    """Same P&L as compute_pnl, evaluated in Postgres with an as-of join on product_costs."""
+    if period not in PERIODS:
+        raise ValueError(f"Unsupported period: {period}")
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(PNL_SQL, {"period": period, "account": str(seller_account_id), "start": start, "end": end})
+        rows = []
+        for sku, period_start, revenue, fees, refunds, cogs, units, uncosted_units in cursor.fetchall():
+            rows.append({
+                "sku": sku,
+                "period_start": period_start.isoformat(),
+                "revenue": float(revenue),
+                "fees": float(fees),
+                "refunds": float(refunds),
+                "cogs": float(cogs),
+                "units": int(units),
+                "uncosted_units": int(uncosted_units),
+                "net": float(revenue + fees + refunds - cogs)
+            })
+        return rows
+    finally:
+        raw.close()
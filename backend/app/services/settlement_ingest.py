@@ -0,0 +1,337 @@
+"""
+Settlement report ingestion: SP-API flat file V2 settlement reports ->
+settlement_reports / transactions tables.
+
+Reports are parsed row by row and loaded with PostgreSQL COPY in large chunks.
+Ingestion is idempotent on the SP-API report_id: the settlement_reports row is
+claimed with ON CONFLICT DO NOTHING in the same database transaction as the
+COPY, so a report is either fully loaded once or not at all.
+
+Backfill CLI (needs the functions/ requirements for the Reports API client):
+    cd backend
+    python -m app.services.settlement_ingest --account-id <seller_account uuid> --since 2019-01-01
+"""
+import csv
+import io
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from app.db.partitions import ensure_transaction_partitions, iter_months
+from app.services.pnl_summary import refresh_pnl_daily
+
+SETTLEMENT_REPORT_TYPE = "GET_V2_SETTLEMENT_REPORT_DATA_FLAT_FILE_V2"
+
+# Rows buffered per COPY statement
+COPY_CHUNK_ROWS = 50000
+
+TRANSACTION_COLUMNS = (
+    "id", "seller_account_id", "settlement_report_id", "posted_date", "type", "amount",
+    "currency", "amazon_order_id", "sku", "quantity", "amount_type", "amount_description",
+    "related_product_id"
+)
+
+# Settlement files use US or EU formats depending on the marketplace
+DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S %Z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d",
+    "%d.%m.%Y %H:%M:%S %Z",
+    "%d.%m.%Y",
+)
+
+
+def parse_settlement_date(value):
+    if not value:
+        return None
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+            return parsed.replace(tzinfo=None)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised settlement date: {value!r}")
+
+
+def parse_amount(value):
+    """Parses '1,234.56', '1.234,56' and '-12,34' style amounts."""
+    if not value:
+        return None
+    value = value.strip()
+    if ',' in value and '.' in value:
+        # Whichever separator comes last is the decimal point
+        if value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '').replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    elif ',' in value:
+        value = value.replace(',', '.')
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Unrecognised settlement amount: {value!r}")
+
+
+def decode_report(content):
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        return content.decode('iso-8859-1')
+
+
+def parse_settlement_report(content):
+    """
+    Returns (summary, rows) for a settlement flat file V2 document.
+    summary: dict from the first data row (settlement-id, dates, total-amount).
+    rows: generator of dicts, one per transaction line.
+    """
+    reader = csv.reader(io.StringIO(decode_report(content)), delimiter='\t')
+    header = next(reader, None)
+    if not header:
+        raise ValueError("Empty settlement report")
+    col = {name.strip(): i for i, name in enumerate(header)}
+
+    def field(row, name):
+        i = col.get(name)
+        if i is None or i >= len(row):
+            return None
+        return row[i].strip() or None
+
+    summary_row = next(reader, None)
+    if summary_row is None or not field(summary_row, 'settlement-start-date'):
+        raise ValueError("Settlement report has no summary row")
+
+    summary = {
+        "settlement_id": field(summary_row, 'settlement-id'),
+        "start_date": parse_settlement_date(field(summary_row, 'settlement-start-date')),
+        "end_date": parse_settlement_date(field(summary_row, 'settlement-end-date')),
+        "deposit_date": parse_settlement_date(field(summary_row, 'deposit-date')),
+        "total_amount": parse_amount(field(summary_row, 'total-amount')) or Decimal("0"),
+        "currency": field(summary_row, 'currency')
+    }
+
+    def rows():
+        for row in reader:
+            amount = field(row, 'amount')
+            posted = field(row, 'posted-date-time') or field(row, 'posted-date')
+            if amount is None or posted is None:
+                continue
+            quantity = field(row, 'quantity-purchased')
+            yield {
+                "posted_date": parse_settlement_date(posted),
+                "type": field(row, 'transaction-type') or "Other",
+                "amount": parse_amount(amount),
+                "currency": field(row, 'currency') or summary["currency"],
+                "amazon_order_id": field(row, 'order-id'),
+                "sku": field(row, 'sku'),
+                "quantity": int(quantity) if quantity and quantity.lstrip('-').isdigit() else None,
+                "amount_type": field(row, 'amount-type'),
+                "amount_description": field(row, 'amount-description'),
+                "marketplace_name": field(row, 'marketplace-name')
+            }
+
+    return summary, rows()
+
+
+def _load_product_ids(cursor, seller_account_id):
+    """(marketplace name, sku) -> product id, plus a sku-only fallback for unambiguous SKUs."""
+    cursor.execute(
+        "SELECT m.name, p.sku, p.id FROM products p "
+        "JOIN marketplaces m ON m.id = p.marketplace_id "
+        "WHERE p.seller_account_id = %s",
+        (str(seller_account_id),)
+    )
+    by_marketplace = {}
+    by_sku = {}
+    for marketplace_name, sku, product_id in cursor.fetchall():
+        by_marketplace[(marketplace_name, sku)] = product_id
+        by_sku[sku] = None if sku in by_sku else product_id
+    return by_marketplace, by_sku
+
+
+def _copy_chunk(cursor, buffer):
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY transactions ({', '.join(TRANSACTION_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+def ingest_settlement_report(engine, seller_account_id, report_id, content):
+    """
+    Loads one settlement report. Returns stats dict; `skipped` is True if
+    the report_id was already ingested.
+    """
+    started = time.time()
+    summary, rows = parse_settlement_report(content)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        settlement_report_id = uuid.uuid4()
+        cursor.execute(
+            "INSERT INTO settlement_reports "
+            "(id, seller_account_id, report_id, settlement_id, start_date, end_date, deposit_date, total_amount, currency) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (report_id) DO NOTHING RETURNING id",
+            (
+                str(settlement_report_id), str(seller_account_id), report_id, summary["settlement_id"],
+                summary["start_date"], summary["end_date"], summary["deposit_date"],
+                summary["total_amount"], summary["currency"]
+            )
+        )
+        if cursor.fetchone() is None:
+            raw.rollback()
+            print(f"    [Settlements] Report {report_id} already ingested. Skipping.")
+            return {"report_id": report_id, "skipped": True, "rows": 0}
+
+        ensure_transaction_partitions(cursor, summary["start_date"], summary["end_date"])
+        ensured = set(iter_months(summary["start_date"], summary["end_date"]))
+
+        def ensure_posted_partitions():
+            # Rows posted outside the settlement window would otherwise land in
+            # transactions_default and block creating their month's partition later
+            for month in set(iter_months(first_posted, last_posted)) - ensured:
+                ensure_transaction_partitions(cursor, month, month)
+                ensured.add(month)
+
+        products_by_marketplace, products_by_sku = _load_product_ids(cursor, seller_account_id)
+
+        total_rows = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        chunk_rows = 0
+        first_posted = last_posted = None
+
+        for row in rows:
+            sku = row["sku"]
+            product_id = None
+            if sku:
+                product_id = products_by_marketplace.get((row["marketplace_name"], sku)) or products_by_sku.get(sku)
+            writer.writerow((
+                uuid.uuid4(), seller_account_id, settlement_report_id, row["posted_date"].isoformat(sep=' '),
+                row["type"], row["amount"], row["currency"], row["amazon_order_id"], sku,
+                row["quantity"], row["amount_type"], row["amount_description"], product_id
+            ))
+            chunk_rows += 1
+            if first_posted is None or row["posted_date"] < first_posted:
+                first_posted = row["posted_date"]
+            if last_posted is None or row["posted_date"] > last_posted:
+                last_posted = row["posted_date"]
+
+            if chunk_rows >= COPY_CHUNK_ROWS:
+                ensure_posted_partitions()
+                _copy_chunk(cursor, buffer)
+                total_rows += chunk_rows
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                chunk_rows = 0
+
+        if chunk_rows:
+            ensure_posted_partitions()
+            _copy_chunk(cursor, buffer)
+            total_rows += chunk_rows
+
+        # Keep the P&L summary in step with the rows just loaded (same transaction)
+        if first_posted is not None:
+            refresh_pnl_daily(cursor, seller_account_id, first_posted, last_posted)
+
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    elapsed = time.time() - started
+    rate = total_rows / elapsed if elapsed > 0 else 0
+    print(f"    [Settlements] Report {report_id}: {total_rows} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    return {"report_id": report_id, "skipped": False, "rows": total_rows, "seconds": elapsed}
+
+
+def _ingested_report_ids(engine, seller_account_id):
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SELECT report_id FROM settlement_reports WHERE seller_account_id = %s", (str(seller_account_id),))
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        raw.close()
+
+
+def backfill_settlements(engine, seller_account_id, auth, created_since, download_workers=4):
+    """
+    Lists every settlement report since `created_since` and ingests the ones
+    not yet loaded. Documents are downloaded in a thread pool while earlier
+    ones are being COPY'd, at most `download_workers` ahead of the ingest,
+    so a slow COPY never lets downloaded documents pile up. `auth` is an SPAPIAuthHandler, so long backfills
+    keep getting fresh access tokens.
+    """
+    from sp_api_sync import list_reports, get_report_document
+
+    reports = list_reports(auth.get_access_token(), [SETTLEMENT_REPORT_TYPE], created_since=created_since)
+    done = _ingested_report_ids(engine, seller_account_id)
+    pending = [r for r in reports if r.get('reportId') not in done and r.get('reportDocumentId')]
+    # Oldest first so a partial backfill leaves a contiguous history
+    pending.sort(key=lambda r: r.get('dataEndTime') or '')
+    print(f"    [Settlements] {len(pending)} of {len(reports)} reports to ingest.")
+
+    started = time.time()
+    total_rows = 0
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        download = lambda r: get_report_document(auth.get_access_token(), r['reportDocumentId'])
+        queued = iter(pending)
+        window = deque((report, pool.submit(download, report)) for _, report in zip(range(download_workers), queued))
+        while window:
+            report, future = window.popleft()
+            content = future.result()
+            # Refill the window before the COPY so the next download overlaps it
+            next_report = next(queued, None)
+            if next_report is not None:
+                window.append((next_report, pool.submit(download, next_report)))
+            if not content:
+                print(f"    [Settlements] Failed to download report {report['reportId']}.")
+                continue
+            stats = ingest_settlement_report(engine, seller_account_id, report['reportId'], content)
+            total_rows += stats["rows"]
+
+    elapsed = time.time() - started
+    print(f"    [Settlements] Backfill loaded {total_rows} rows in {elapsed:.1f}s "
+          f"({total_rows / elapsed * 60 if elapsed else 0:,.0f} rows/min)")
+    return total_rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill settlement reports into Postgres.")
+    parser.add_argument("--account-id", required=True, help="seller_accounts.id")
+    parser.add_argument("--since", required=True, help="createdSince, e.g. 2019-01-01")
+    args = parser.parse_args()
+
+    # Reuse the Reports API client from the Cloud Functions code
+    sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "functions"))
+
+    from app.core.config import settings
+    from app.db.session import engine
+    from app.services.sp_api_auth import SPAPIAuthHandler
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SELECT sp_api_refresh_token FROM seller_accounts WHERE id = %s", (args.account_id,))
+        row = cursor.fetchone()
+    finally:
+        raw.close()
+    if not row or not row[0]:
+        sys.exit(f"Seller account {args.account_id} not found or has no refresh token.")
+
+    auth = SPAPIAuthHandler(settings.LWA_APP_ID, settings.LWA_CLIENT_SECRET, row[0])
+    backfill_settlements(engine, args.account_id, auth, f"{args.since}T00:00:00Z")
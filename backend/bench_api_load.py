@@ -0,0 +1,191 @@
+"""
+Load test for the FastAPI backend against a local Postgres.
+
+1. Seed synthetic data (needs `alembic upgrade head` on DATABASE_URL first):
+       python bench_api_load.py seed --products 20000 --transactions 2000000
+2. Start the API in another shell:
+       uvicorn app.main:app --workers 2
+3. Run the load test (needs `pip install httpx`):
+       python bench_api_load.py run --concurrency 50 --duration 30
+
+Each virtual user loops over the scenarios below, following next_cursor
+links for a few pages, and per-endpoint p50/p95/p99 latency plus overall
+throughput are printed at the end.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import random
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+BENCH_ACCOUNT_ID = uuid.UUID("00000000-0000-4000-8000-00000000beef")
+BENCH_MARKETPLACE_ID = "ATVPDKIKX0DER"
+
+
+def seed(products, transactions, days):
+    from app.db.partitions import ensure_transaction_partitions
+    from app.db.session import engine
+    from app.services.pnl_summary import refresh_pnl_daily
+
+    rng = random.Random(42)
+    end = datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=days)
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(
+            "INSERT INTO marketplaces (id, name, region, currency_code) VALUES (%s, 'Amazon.com', 'North America', 'USD') "
+            "ON CONFLICT DO NOTHING", (BENCH_MARKETPLACE_ID,)
+        )
+        cur.execute(
+            "INSERT INTO seller_accounts (id, name, seller_id) VALUES (%s, 'Load Test', 'BENCH') ON CONFLICT DO NOTHING",
+            (str(BENCH_ACCOUNT_ID),)
+        )
+        cur.execute("DELETE FROM pnl_daily WHERE seller_account_id = %s", (str(BENCH_ACCOUNT_ID),))
+        cur.execute("DELETE FROM transactions WHERE seller_account_id = %s", (str(BENCH_ACCOUNT_ID),))
+        cur.execute(
+            "DELETE FROM product_costs WHERE product_id IN (SELECT id FROM products WHERE seller_account_id = %s)",
+            (str(BENCH_ACCOUNT_ID),)
+        )
+        cur.execute("DELETE FROM products WHERE seller_account_id = %s", (str(BENCH_ACCOUNT_ID),))
+
+        product_ids = [uuid.uuid4() for _ in range(products)]
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for i, pid in enumerate(product_ids):
+            writer.writerow((pid, f"B0BENCH{i:05d}", f"BENCH-{i:06d}", f"Bench product {i}", BENCH_MARKETPLACE_ID, BENCH_ACCOUNT_ID))
+        buf.seek(0)
+        cur.copy_expert("COPY products (id, asin, sku, title, marketplace_id, seller_account_id) FROM STDIN WITH (FORMAT csv)", buf)
+
+        ensure_transaction_partitions(cur, start, end)
+        span = int((end - start).total_seconds())
+        loaded = 0
+        while loaded < transactions:
+            batch = min(200000, transactions - loaded)
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for _ in range(batch):
+                i = rng.randrange(products)
+                posted = start + timedelta(seconds=rng.randrange(span))
+                is_sale = rng.random() < 0.5
+                writer.writerow((
+                    uuid.uuid4(), posted.isoformat(sep=' '), BENCH_ACCOUNT_ID,
+                    "Order", round(rng.uniform(5, 80), 2) if is_sale else -round(rng.uniform(0.5, 12), 2), "USD",
+                    f"111-{rng.randrange(10**7):07d}-{rng.randrange(10**7):07d}", f"BENCH-{i:06d}",
+                    rng.randint(1, 3) if is_sale else "", "ItemPrice" if is_sale else "ItemFees",
+                    "Principal" if is_sale else "FBAPerUnitFulfillmentFee", product_ids[i]
+                ))
+            buf.seek(0)
+            cur.copy_expert(
+                "COPY transactions (id, posted_date, seller_account_id, type, amount, currency, amazon_order_id, "
+                "sku, quantity, amount_type, amount_description, related_product_id) FROM STDIN WITH (FORMAT csv)",
+                buf
+            )
+            loaded += batch
+            print(f"  seeded {loaded:,} / {transactions:,} transactions")
+
+        refresh_pnl_daily(cur, BENCH_ACCOUNT_ID, start, end)
+        cur.execute("ANALYZE products; ANALYZE transactions; ANALYZE pnl_daily;")
+        raw.commit()
+    finally:
+        raw.close()
+    print(f"Seeded account {BENCH_ACCOUNT_ID}")
+
+
+def scenarios(days):
+    today = date.today()
+    return {
+        "products": ("/api/v1/products", {"seller_account_id": str(BENCH_ACCOUNT_ID), "limit": 100}, 3),
+        "transactions": ("/api/v1/transactions", {"seller_account_id": str(BENCH_ACCOUNT_ID), "limit": 100}, 3),
+        "transactions_month": ("/api/v1/transactions", {
+            "seller_account_id": str(BENCH_ACCOUNT_ID), "limit": 100,
+            "start": (today - timedelta(days=60)).isoformat(), "end": (today - timedelta(days=30)).isoformat()
+        }, 2),
+        "pnl_skus_90d": ("/api/v1/pnl/skus", {
+            "seller_account_id": str(BENCH_ACCOUNT_ID),
+            "start": (today - timedelta(days=90)).isoformat(), "end": today.isoformat()
+        }, 1),
+        "settlement_reports": ("/api/v1/settlement-reports", {"seller_account_id": str(BENCH_ACCOUNT_ID)}, 1),
+    }
+
+
+async def virtual_user(client, plan, deadline, latencies, errors):
+    names = list(plan)
+    while time.perf_counter() < deadline:
+        name = random.choice(names)
+        path, params, pages = plan[name]
+        params = dict(params)
+        for _ in range(pages):
+            t0 = time.perf_counter()
+            try:
+                resp = await client.get(path, params=params)
+                ok = resp.status_code == 200
+            except Exception:
+                ok = False
+            latencies[name].append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                errors[name] += 1
+                break
+            body = resp.json()
+            cursor = body.get("next_cursor") if isinstance(body, dict) else None
+            if not cursor:
+                break
+            params["cursor"] = cursor
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(base_url, concurrency, duration):
+    import httpx
+
+    plan = scenarios(duration)
+    latencies = {name: [] for name in plan}
+    errors = {name: 0 for name in plan}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(virtual_user(client, plan, deadline, latencies, errors) for _ in range(concurrency)))
+
+    total = sum(len(v) for v in latencies.values())
+    print("=" * 72)
+    print(f"{concurrency} concurrent users, {duration}s, {total:,} requests ({total / duration:,.0f} req/s)")
+    print(f"{'endpoint':<22}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in latencies.items():
+        if not values:
+            continue
+        print(f"{name:<22}{len(values):>8}{errors[name]:>8}{statistics.median(values):>10.1f}"
+              f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}")
+    print("=" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_cmd = sub.add_parser("seed")
+    seed_cmd.add_argument("--products", type=int, default=20000)
+    seed_cmd.add_argument("--transactions", type=int, default=2_000_000)
+    seed_cmd.add_argument("--days", type=int, default=730)
+
+    run_cmd = sub.add_parser("run")
+    run_cmd.add_argument("--base-url", default="http://localhost:8000")
+    run_cmd.add_argument("--concurrency", type=int, default=50)
+    run_cmd.add_argument("--duration", type=int, default=30)
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed(args.products, args.transactions, args.days)
+    else:
+        asyncio.run(run(args.base_url, args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark for the vectorized as-of COGS join and P&L aggregation.
+
+Generates synthetic transactions and date-effective costs in memory (no
+database needed) and compares the NumPy path with a per-row Python lookup.
+
+Usage (from the backend/ directory):
+    python bench_profitability.py                       # 1M transactions
+    python bench_profitability.py --transactions 5000000 --products 20000
+"""
+import argparse
+import bisect
+import time
+
+import numpy as np
+
+from app.services.profitability import asof_unit_costs, aggregate_pnl
+
+START_DAY = int(np.datetime64('2021-01-01').astype(np.int64))
+DAYS = 3 * 365
+
+
+def make_costs(rng, products, costs_per_product):
+    """Consecutive cost periods per product; the last one is open-ended."""
+    product = np.repeat(np.arange(products), costs_per_product)
+    gaps = rng.integers(30, DAYS // costs_per_product, size=(products, costs_per_product))
+    gaps[:, 0] = 0
+    offsets = np.cumsum(gaps, axis=1)
+    start = START_DAY + offsets.ravel()
+    end = np.empty_like(start)
+    end[:-1] = start[1:] - 1
+    end[costs_per_product - 1::costs_per_product] = -1
+    value = rng.uniform(1, 50, size=len(product)).round(2)
+    return product, start, end, value
+
+
+def make_transactions(rng, n, products):
+    product = rng.integers(0, products, size=n)
+    day = START_DAY + rng.integers(0, DAYS, size=n)
+    kind = rng.choice(np.array([0, 1, 2], dtype=np.int8), size=n, p=[0.5, 0.45, 0.05])
+    amount = np.where(kind == 0, rng.uniform(5, 100, size=n), -rng.uniform(0.5, 15, size=n))
+    quantity = np.where(kind == 0, rng.integers(1, 4, size=n), 0).astype(np.float64)
+    return product, day, amount, quantity, kind
+
+
+def python_asof(tx_product, tx_day, cost_product, cost_start, cost_end, cost_value):
+    """Reference per-row implementation: bisect per transaction."""
+    by_product = {}
+    for p, s, e, v in zip(cost_product.tolist(), cost_start.tolist(), cost_end.tolist(), cost_value.tolist()):
+        by_product.setdefault(p, []).append((s, e, v))
+    for rows in by_product.values():
+        rows.sort()
+    starts = {p: [r[0] for r in rows] for p, rows in by_product.items()}
+
+    out = []
+    for p, d in zip(tx_product.tolist(), tx_day.tolist()):
+        rows = by_product.get(p)
+        i = bisect.bisect_right(starts[p], d) - 1 if rows else -1
+        if i >= 0 and (rows[i][1] < 0 or d <= rows[i][1]):
+            out.append(rows[i][2])
+        else:
+            out.append(float('nan'))
+    return np.array(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--costs-per-product", type=int, default=4)
+    parser.add_argument("--python-sample", type=int, default=200_000,
+                        help="rows timed with the per-row reference (extrapolated)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    costs = make_costs(rng, args.products, args.costs_per_product)
+    tx_product, tx_day, amount, quantity, kind = make_transactions(rng, args.transactions, args.products)
+
+    t0 = time.perf_counter()
+    unit_cost = asof_unit_costs(tx_product, tx_day, *costs)
+    t_join = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    pnl = aggregate_pnl(tx_product, tx_day, amount, quantity, kind, unit_cost, "month")
+    t_agg = time.perf_counter() - t0
+
+    sample = min(args.python_sample, args.transactions)
+    t0 = time.perf_counter()
+    reference = python_asof(tx_product[:sample], tx_day[:sample], *costs)
+    t_python = (time.perf_counter() - t0) * args.transactions / sample
+    assert np.allclose(reference, unit_cost[:sample], equal_nan=True), "as-of join mismatch"
+
+    print("=" * 50)
+    print(f"{args.transactions:,} transactions, {args.products:,} products, "
+          f"{len(costs[0]):,} cost rows -> {len(pnl['sku']):,} SKU-month rows")
+    print(f"  as-of join (NumPy):        {t_join * 1000:8.1f} ms")
+    print(f"  P&L aggregation (NumPy):   {t_agg * 1000:8.1f} ms")
+    print(f"  as-of join (per-row est.): {t_python * 1000:8.1f} ms  ({t_python / t_join:.0f}x slower)")
+    print(f"  throughput: {args.transactions / (t_join + t_agg):,.0f} transactions/s")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 import sys
 import os
-import json
 from dotenv import load_dotenv
 
-# Add current dir to path
+# Add current dir and functions/ to path (the sync modules import each other by plain name)
 sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "functions"))
 
 load_dotenv(".env.local")
 
-from functions.sp_api_sync import sync_pricing_from_api, load_json, save_json, get_lwa_access_token
+from sp_api_sync import sync_pricing_from_api, load_json, save_json, get_lwa_access_token, get_db
+from fee_estimates import FeeEstimator, apply_fee_estimates
+from sync_records import InventoryRecord
 
 def run_pricing_sync():
     print("Running Targeted Pricing Sync...")
@@ -42,17 +44,16 @@ def run_pricing_sync():
             for item in inventory:
                 asin = item.get('asin')
                 if asin in asin_prices:
-                    price_val = asin_prices[asin]
-                    item['price'] = price_val
-                    
-                    # Estimate Fees (15%)
-                    fees_est = price_val * 0.15
-                    proceeds_est = price_val - fees_est
-                    
-                    item['estimated_fees'] = round(fees_est, 2)
-                    item['estimated_proceeds'] = round(proceeds_est, 2)
+                    item['price'] = asin_prices[asin]
                     updated_count += 1
             
+            # Estimate Fees (Fees API, cached per SKU / price bucket)
+            records = [InventoryRecord.from_dict(item) for item in inventory]
+            for account_id in {r.account_id for r in records if r.marketplace_code == "US"}:
+                estimator = FeeEstimator(get_db(), access_token, account_id, mp_id, "US")
+                apply_fee_estimates(estimator, [r for r in records if r.account_id == account_id], [])
+            inventory = [r.to_dict() for r in records]
+            
             save_json("inventory.json", inventory)
             print(f"Updated {updated_count} items with pricing data.")
             
@@ -5,6 +5,8 @@ import { Bell, Search, RefreshCw, Loader2, CheckCircle, XCircle, Menu } from 'lu
 import Image from 'next/image';
 import { useSidebar } from '@/context/SidebarContext';
 
+const SYNC_POLL_TIMEOUT_MS = 12 * 60 * 1000;
+
 const Header = () => {
     const { toggleMobileSidebar } = useSidebar();
     const [syncing, setSyncing] = useState(false);
@@ -28,6 +30,20 @@ const Header = () => {
             const response = await fetch(functionUrl, { method: 'POST' });
             if (!response.ok) throw new Error('Sync failed');
 
+            // Sync runs as a background job; poll its status until it finishes.
+            // The server fails jobs whose lease (10 min) expired; stop polling a bit after that.
+            const { job_id } = await response.json();
+            const deadline = Date.now() + SYNC_POLL_TIMEOUT_MS;
+            let job = { status: 'queued' };
+            while (job.status === 'queued' || job.status === 'running') {
+                if (Date.now() > deadline) throw new Error('Sync timed out');
+                await new Promise(r => setTimeout(r, 5000));
+                const jobRes = await fetch(`/api/sync_jobs/${job_id}`);
+                if (!jobRes.ok) throw new Error('Failed to fetch sync job status');
+                job = await jobRes.json();
+            }
+            if (job.status !== 'succeeded') throw new Error('Sync failed');
+
             setStatus('success');
             // Refresh page to show new data? Or just let user navigate
             setTimeout(() => window.location.reload(), 1500);
@@ -0,0 +1,147 @@
+"""
+Benchmark: "units per SKU over the last 3 years" from the columnar order
+archive vs. the Firestore document path.
+
+The Firestore path is what sync_amazon_data does today: load every order
+document (load_json) and walk the nested items arrays. By default it is
+measured offline against synthetic orders serialized one JSON document per
+order, which excludes network time and so flatters Firestore. Pass
+--firestore to also time the real load_json("orders.json") + scan.
+
+Usage (from the functions/ directory):
+    python bench_order_archive.py --orders 300000
+    python bench_order_archive.py --firestore
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from order_archive import units_per_sku, write_order_archive
+
+STATUSES = ["Shipped"] * 8 + ["Unshipped", "Canceled"]
+
+
+def synthetic_orders(count, skus, years, seed=7):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    span = int(timedelta(days=365 * years + 180).total_seconds())
+    orders = []
+    for i in range(count):
+        purchased = now - timedelta(seconds=rng.randrange(span))
+        items = []
+        for _ in range(rng.choice((1, 1, 1, 2, 3))):
+            quantity = rng.randint(1, 4)
+            items.append({
+                "sku": f"SKU-{rng.randrange(skus):05d}",
+                "title": "Synthetic product",
+                "quantity": quantity,
+                "item_price": round(quantity * rng.uniform(5, 60), 2)
+            })
+        orders.append({
+            "id": f"111-{i:07d}-{rng.randrange(10**7):07d}",
+            "amazon_order_id": f"111-{i:07d}",
+            "accountId": "default_account_1",
+            "marketplaceId": "US",
+            "purchase_date": purchased.isoformat(),
+            "order_status": rng.choice(STATUSES),
+            "order_total": sum(item["item_price"] for item in items),
+            "currency": "USD",
+            "items": items,
+            "fulfillment_channel": "AFN",
+            "updated_at": now.isoformat()
+        })
+    return orders
+
+
+def scan_documents(orders, since):
+    """The Firestore-path query: every order, every nested item."""
+    units = defaultdict(int)
+    for order in orders:
+        if order.get('order_status') == 'Canceled' or (order.get('purchase_date') or '') < since:
+            continue
+        for item in order.get('items', []):
+            units[item['sku']] += int(item.get('quantity') or 0)
+    return dict(units)
+
+
+def timed(fn, runs=3):
+    best = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - t0) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--skus", type=int, default=3000)
+    parser.add_argument("--years", type=int, default=5, help="History length (the query covers the last 3)")
+    parser.add_argument("--firestore", action="store_true")
+    args = parser.parse_args()
+
+    orders = synthetic_orders(args.orders, args.skus, args.years)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=365 * 3)
+    # Month granularity on the archive side; compare against the same boundary
+    since_month = cutoff.strftime('%Y-%m')
+    since_iso = cutoff.strftime('%Y-%m-01')
+
+    documents = [json.dumps(o) for o in orders]
+    root = tempfile.mkdtemp(prefix="order_archive_")
+    try:
+        t0 = time.perf_counter()
+        partitions = write_order_archive(root, orders)
+        write_ms = (time.perf_counter() - t0) * 1000
+
+        # A daily sync mostly changes recent orders (new orders, status updates)
+        recent = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+        changed = [o["id"] for o in orders if o["purchase_date"] >= recent][:200]
+        t0 = time.perf_counter()
+        rewritten = write_order_archive(root, orders, changed)
+        incremental_ms = (time.perf_counter() - t0) * 1000
+
+        doc_result, doc_ms = timed(lambda: scan_documents([json.loads(d) for d in documents], since_iso))
+        archive_result, archive_ms = timed(lambda: units_per_sku(root, since_month))
+        assert doc_result == archive_result, "archive and document scan disagree"
+
+        print("=" * 60)
+        print(f"{args.orders:,} orders, {args.skus:,} SKUs, {args.years} years, query since {since_month}")
+        print(f"Storage: JSON documents {sum(map(len, documents)) / 1e6:,.1f} MB, "
+              f"Parquet archive {directory_size(root) / 1e6:,.1f} MB ({partitions} partitions)")
+        print(f"Archive full write:            {write_ms:10.1f} ms")
+        print(f"Archive update ({len(changed)} changes):  {incremental_ms:10.1f} ms ({rewritten} months rewritten)")
+        print(f"Document scan (decode + walk): {doc_ms:10.1f} ms")
+        print(f"Archive units per SKU:         {archive_ms:10.1f} ms  ({doc_ms / archive_ms:.1f}x faster)")
+
+        if args.firestore:
+            from dotenv import load_dotenv
+            load_dotenv(".env.local")
+            import firebase_admin
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app()
+            from sp_api_sync import load_json
+
+            t0 = time.perf_counter()
+            live_orders = load_json("orders.json")
+            scan_documents(live_orders, since_iso)
+            live_ms = (time.perf_counter() - t0) * 1000
+            print(f"Live Firestore load_json + scan ({len(live_orders):,} orders): {live_ms:10.1f} ms")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
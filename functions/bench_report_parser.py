@@ -0,0 +1,263 @@
+"""
+Benchmark: SP-API flat-file report parsing, csv.DictReader vs. the columnar
+report_parser (pyarrow and pure-Python engines).
+
+Synthetic orders (GET_FLAT_FILE_ALL_ORDERS_DATA_BY_ORDER_DATE_GENERAL) and
+listings (GET_MERCHANT_LISTINGS_ALL_DATA) reports are generated with the
+real column layout, including empty and malformed numeric cells. The
+DictReader baseline is the row-at-a-time parser the sync used before; every
+engine must produce the same columns / orders / prices. "typed columns"
+times parsing alone, "OrderRecords" includes building the sync's records.
+
+--pool times a backfill instead: documents are "downloaded" (a sleep
+standing in for create/poll/download) and streamed through
+stream_order_reports, with one fetch worker and inline parsing vs.
+--fetch-workers downloads and --workers parse processes, so downloads
+overlap each other and parsing uses every CPU.
+
+Usage (from the functions/ directory):
+    python bench_report_parser.py --rows 1000000
+    python bench_report_parser.py --pool --rows 1200000 --documents 12 --workers 8 --fetch-workers 2
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from report_parser import (
+    ORDERS_REPORT_SCHEMA, parse_listing_prices, parse_orders_report, parse_report, stream_order_reports
+)
+from sync_records import OrderLine, OrderRecord
+
+ORDER_COLUMNS = [
+    "amazon-order-id", "merchant-order-id", "purchase-date", "last-updated-date", "order-status",
+    "fulfillment-channel", "sales-channel", "order-channel", "ship-service-level", "product-name", "sku",
+    "asin", "item-status", "quantity", "currency", "item-price", "item-tax", "shipping-price", "shipping-tax",
+    "gift-wrap-price", "gift-wrap-tax", "item-promotion-discount", "ship-promotion-discount", "ship-city",
+    "ship-state", "ship-postal-code", "ship-country", "promotion-ids", "is-business-order",
+    "quantity-shipped",
+]
+LISTING_COLUMNS = [
+    "item-name", "item-description", "listing-id", "seller-sku", "price", "quantity", "open-date",
+    "image-url", "item-is-marketplace", "product-id-type", "zshop-shipping-fee", "item-note",
+    "item-condition", "zshop-category1", "zshop-browse-path", "zshop-storefront-feature", "asin1",
+    "asin2", "asin3", "will-ship-internationally", "expedited-shipping", "zshop-boldface", "product-id",
+    "bid-for-featured-placement", "add-delete", "pending-quantity", "fulfillment-channel", "status",
+]
+
+
+def synthetic_orders_report(rows, skus=5000, seed=11):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    out = ["\t".join(ORDER_COLUMNS)]
+    order_no = 0
+    while len(out) <= rows:
+        order_no += 1
+        purchased = (now - timedelta(seconds=rng.randrange(86400 * 30))).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        status = rng.choice(("Shipped",) * 8 + ("Pending", "Cancelled"))
+        channel = rng.choice(("Amazon", "Amazon", "Merchant"))
+        for _ in range(rng.choice((1, 1, 1, 2, 3))):
+            qty = rng.randint(1, 4)
+            price = f"{qty * rng.uniform(5, 60):.2f}"
+            shipped = str(qty) if status == "Shipped" else ""
+            if rng.random() < 0.001:
+                price = rng.choice(("N/A", "12,50", "--"))
+            sku = f"SKU-{rng.randrange(skus):05d}"
+            out.append("\t".join((
+                f"111-{order_no:07d}-0000000", "", purchased, purchased, status,
+                "AFN" if channel == "Amazon" else "MFN", "Amazon.com", "", "Standard",
+                f'Synthetic product {sku} 12" size', sku, f"B0{rng.randrange(10**8):08d}", "Shipped",
+                str(qty), "USD", price, "0.00", "0.00", "0.00", "", "", "", "", "SEATTLE", "WA", "98101", "US", "",
+                "false", shipped,
+            )))
+    return ("\n".join(out[:rows + 1]) + "\n").encode("utf-8")
+
+
+def synthetic_listings_report(rows, seed=13):
+    rng = random.Random(seed)
+    out = ["\t".join(LISTING_COLUMNS)]
+    for i in range(rows):
+        price = "" if rng.random() < 0.05 else f"{rng.uniform(5, 120):.2f}"
+        row = [""] * len(LISTING_COLUMNS)
+        row[0], row[3], row[4], row[5] = f"Listing {i}", f"SKU-{i:07d}", price, str(rng.randrange(100))
+        row[16], row[-1] = f"B0{rng.randrange(10**8):08d}", rng.choice(("Active", "Inactive"))
+        out.append("\t".join(row))
+    return ("\n".join(out) + "\n").encode("utf-8")
+
+
+def dictreader_orders(content, account_id, marketplace_code):
+    """The row-at-a-time parser fetch_report_range used before report_parser."""
+    try:
+        text_content = content.decode('utf-8')
+    except:
+        text_content = content.decode('iso-8859-1')
+    orders = {}
+    updated_at = datetime.utcnow().isoformat()
+    for row in csv.DictReader(io.StringIO(text_content), delimiter='\t', quoting=csv.QUOTE_NONE):
+        amz_order_id = row.get('amazon-order-id')
+        if not amz_order_id: continue
+        try:
+            qty = int(row.get('quantity-shipped', 0))
+        except:
+            qty = 0
+        try:
+            item_price = float(row.get('item-price', 0.0))
+        except:
+            item_price = 0.0
+        sku, title = row.get('sku'), row.get('product-name')
+        line = OrderLine(sku=sys.intern(sku) if sku else sku, title=sys.intern(title) if title else title,
+                         quantity=qty, item_price=item_price)
+        order = orders.get(amz_order_id)
+        if order:
+            order.items.append(line)
+            order.order_total += item_price
+        else:
+            channel = row.get('fulfillment-channel', 'Unknown')
+            orders[amz_order_id] = OrderRecord(
+                id=amz_order_id, amazon_order_id=amz_order_id, account_id=account_id,
+                marketplace_code=marketplace_code, purchase_date=row.get('purchase-date'),
+                order_status=sys.intern(row.get('order-status', 'Unknown')), order_total=item_price,
+                currency=sys.intern(row.get('currency', 'USD')), items=[line],
+                fulfillment_channel="FBA" if channel == "AFN" else "FBM", updated_at=updated_at
+            )
+    return list(orders.values())
+
+
+def dictreader_columns(content, schema):
+    """DictReader + per-cell try/except conversion into one list per column."""
+    columns = {c.name: [] for c in schema}
+    for row in csv.DictReader(io.StringIO(content.decode('utf-8')), delimiter='\t', quoting=csv.QUOTE_NONE):
+        for c in schema:
+            value = row.get(c.name, c.default)
+            if c.kind != "str":
+                try:
+                    value = int(value) if c.kind == "int" else float(value)
+                except:
+                    value = c.default
+            columns[c.name].append(value)
+    return columns
+
+
+def dictreader_listings(content):
+    sku_price_map = {}
+    for row in csv.DictReader(io.StringIO(content.decode('utf-8')), delimiter='\t', quoting=csv.QUOTE_NONE):
+        sku, price_str = row.get('seller-sku'), row.get('price')
+        if sku and price_str:
+            try:
+                sku_price_map[sku] = float(price_str)
+            except:
+                pass
+    return sku_price_map
+
+
+def timed(fn, *args, repeat=3):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def comparable_orders(orders):
+    return [(o.id, o.order_status, o.fulfillment_channel, round(o.order_total, 2),
+             [(l.sku, l.title, l.quantity, l.item_price) for l in o.items]) for o in orders]
+
+
+def backfill(documents, workers, fetch_workers, download_seconds):
+    """A backfill: 'download' each document (sleep) and stream it through the pipeline."""
+    def download(content):
+        time.sleep(download_seconds)
+        return content
+
+    orders, failed = stream_order_reports(documents, download, "acct", "US",
+                                          parse_workers=workers, fetch_workers=fetch_workers)
+    assert not failed
+    return orders
+
+
+def bench_pool(args):
+    # Distinct order IDs per document, like monthly backfill chunks
+    documents = [
+        synthetic_orders_report(args.rows // args.documents, seed=i).replace(b"111-", f"{i:03d}-".encode())
+        for i in range(args.documents)
+    ]
+    print(f"backfill, {args.documents} documents x {args.rows // args.documents:,} rows, "
+          f"{args.download_seconds:.1f}s simulated download each ({os.cpu_count()} CPUs):")
+    baseline, baseline_s = None, None
+    for workers, fetch_workers in ((0, 1), (args.workers, args.fetch_workers)):
+        t0 = time.perf_counter()
+        result = backfill(documents, workers, fetch_workers, args.download_seconds)
+        seconds = time.perf_counter() - t0
+        if baseline is None:
+            baseline, baseline_s = result, seconds
+        else:
+            assert comparable_orders(result) == comparable_orders(baseline)
+        label = f"{fetch_workers} fetch, " + ("inline" if workers <= 1 else f"{workers} processes")
+        print(f"  {label:24s} {seconds:7.2f} s  {baseline_s / seconds:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pool", action="store_true", help="benchmark a stream_order_reports backfill instead")
+    parser.add_argument("--documents", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--fetch-workers", type=int, default=2)
+    parser.add_argument("--download-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    if args.pool:
+        print("=" * 60)
+        bench_pool(args)
+        print("=" * 60)
+        return
+
+    orders_report = synthetic_orders_report(args.rows)
+    listings_report = synthetic_listings_report(args.rows)
+    print(f"Orders report: {len(orders_report) / 1e6:.0f} MB, listings report: {len(listings_report) / 1e6:.0f} MB")
+
+    runs = {
+        "orders -> typed columns": [
+            ("csv.DictReader", lambda: dictreader_columns(orders_report, ORDERS_REPORT_SCHEMA)),
+            ("columnar/python", lambda: parse_report(orders_report, ORDERS_REPORT_SCHEMA, engine="python")),
+            ("columnar/arrow", lambda: parse_report(orders_report, ORDERS_REPORT_SCHEMA, engine="arrow")),
+        ],
+        "orders -> OrderRecords": [
+            ("csv.DictReader", lambda: dictreader_orders(orders_report, "acct", "US")),
+            ("columnar/python", lambda: parse_orders_report(orders_report, "acct", "US", engine="python")),
+            ("columnar/arrow", lambda: parse_orders_report(orders_report, "acct", "US", engine="arrow")),
+        ],
+        "listings -> prices": [
+            ("csv.DictReader", lambda: dictreader_listings(listings_report)),
+            ("columnar/python", lambda: parse_listing_prices(listings_report, engine="python")),
+            ("columnar/arrow", lambda: parse_listing_prices(listings_report, engine="arrow")),
+        ],
+    }
+
+    print("=" * 60)
+    for report, engines in runs.items():
+        baseline, baseline_s = None, None
+        print(f"{report}, {args.rows:,} rows (best of {args.repeat}):")
+        for name, run in engines:
+            result, seconds = timed(run, repeat=args.repeat)
+            if baseline is None:
+                baseline, baseline_s = result, seconds
+            elif report.endswith("OrderRecords"):
+                assert comparable_orders(result) == comparable_orders(baseline), name
+            elif report.endswith("columns"):
+                assert all(result[c.name].tolist() == baseline[c.name] for c in ORDERS_REPORT_SCHEMA), name
+            else:
+                assert result == baseline, name
+            print(f"  {name:16s} {seconds:7.2f} s  {args.rows / seconds / 1e6:5.2f} M rows/s  "
+                  f"{baseline_s / seconds:5.1f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark for the Cloud Functions entry point.
+
+Measures, in fresh interpreter processes:
+  - import time of main.py (what every cold start pays)
+  - whether the sync-only modules leak into the read path
+  - first-request latency of GET /api/inventory on the read app
+
+Usage (from the functions/ directory):
+    python bench_startup.py                    # import timing only
+    python bench_startup.py --first-request    # also hit /api/inventory (needs Firestore credentials)
+    python bench_startup.py --max-import-ms 1500
+Exits non-zero if the import budget is exceeded or sync modules are imported eagerly.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must only be loaded by the sync worker. (requests, gzip and hmac
+# are not listed: firebase_admin and werkzeug pull them in on their own.)
+SYNC_ONLY_MODULES = ["sp_api_sync"]
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - t0) * 1000
+result = {
+    "import_ms": import_ms,
+    "sync_modules_loaded": [m for m in SYNC_ONLY_MODULES if m in sys.modules],
+}
+if FIRST_REQUEST:
+    client = main.app.test_client()
+    t1 = time.perf_counter()
+    resp = client.get("/api/inventory")
+    result["first_request_ms"] = (time.perf_counter() - t1) * 1000
+    result["first_request_status"] = resp.status_code
+print(json.dumps(result))
+"""
+
+
+def run_probe(first_request):
+    code = f"SYNC_ONLY_MODULES = {SYNC_ONLY_MODULES!r}\nFIRST_REQUEST = {first_request!r}\n" + PROBE
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(limit=10):
+    """Slowest modules by cumulative import time (python -X importtime)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        rows.append((int(parts[1]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-request", action="store_true")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    results = [run_probe(args.first_request) for _ in range(args.runs)]
+    import_times = [r["import_ms"] for r in results]
+
+    print("=" * 50)
+    print(f"Import main.py ({args.runs} cold runs)")
+    print(f"  median: {statistics.median(import_times):.1f} ms")
+    print(f"  min/max: {min(import_times):.1f} / {max(import_times):.1f} ms")
+
+    if args.first_request:
+        req_times = [r["first_request_ms"] for r in results]
+        print(f"First GET /api/inventory (status {results[0]['first_request_status']})")
+        print(f"  median: {statistics.median(req_times):.1f} ms")
+
+    print("Slowest imports (cumulative):")
+    for cumulative_us, name in top_imports():
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    print("=" * 50)
+
+    failed = False
+    leaked = results[0]["sync_modules_loaded"]
+    if leaked:
+        print(f"FAIL: sync-only modules imported on the read path: {', '.join(leaked)}")
+        failed = True
+    if args.max_import_ms is not None and statistics.median(import_times) > args.max_import_ms:
+        print(f"FAIL: median import time exceeds budget of {args.max_import_ms:.0f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Memory benchmark: sync pipeline orders as plain dicts vs. compact records.
+
+Synthetic orders are serialized one JSON document each and decoded
+separately, as load_json does with Firestore documents, so the dict
+baseline does not get string sharing for free. tracemalloc measures what the
+in-memory order list retains in each representation.
+
+Usage (from the functions/ directory):
+    python bench_sync_records.py --orders 100000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from bench_order_archive import synthetic_orders
+from sync_records import OrderRecord
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = build()
+    elapsed = (time.perf_counter() - t0) * 1000
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--skus", type=int, default=3000)
+    args = parser.parse_args()
+
+    documents = [json.dumps(o) for o in synthetic_orders(args.orders, args.skus, years=5)]
+
+    dicts, dict_bytes, dict_peak, dict_ms = retained_bytes(lambda: [json.loads(d) for d in documents])
+    del dicts
+    records, record_bytes, record_peak, record_ms = retained_bytes(
+        lambda: [OrderRecord.from_dict(json.loads(d)) for d in documents]
+    )
+
+    # Round trip must be lossless, or change detection would flag every order
+    assert all(r.to_dict() == json.loads(d) for r, d in zip(records[:1000], documents[:1000]))
+
+    scale = 100000 / args.orders
+    print("=" * 60)
+    print(f"{args.orders:,} orders ({args.skus:,} SKUs), per 100k orders:")
+    print(f"  dicts:   {dict_bytes * scale / 1e6:8.1f} MB retained  (peak {dict_peak * scale / 1e6:6.1f} MB, {dict_ms:6.0f} ms)")
+    print(f"  records: {record_bytes * scale / 1e6:8.1f} MB retained  (peak {record_peak * scale / 1e6:6.1f} MB, {record_ms:6.0f} ms)")
+    print(f"  saving:  {(1 - record_bytes / dict_bytes) * 100:8.1f} %  ({dict_bytes / args.orders:.0f} -> {record_bytes / args.orders:.0f} bytes/order)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
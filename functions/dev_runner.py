@@ -1,54 +1,250 @@
 import os
 import json
+import time
+import uuid
+from datetime import datetime
 from dotenv import load_dotenv
-from flask import Flask, jsonify, send_file
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from sp_api_sync import sync_amazon_data, DATA_DIR
+from sp_api_sync import order_line_records, sync_amazon_data
+from sync_jobs import SYNC_PHASES, compact_delta, stream_job_events, wait_for_job_change
 
 # Load local environment vars
 load_dotenv(".env.local")
 
+# Local JSON snapshots served by the dev server
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Same query parameters as the production read endpoints (see main.py)
+FILTER_FIELDS = ['accountId', 'marketplaceId']
+MAX_PAGE_SIZE = 1000
+DEFAULT_SKU_HISTORY_LIMIT = 100
+
 app = Flask(__name__)
 CORS(app)
 
 import threading
 
-@app.route('/manual_amazon_sync', methods=['POST'])
-def manual_sync():
-    print("Received Manual Sync Request... Processing Synchronously.")
+
+class DataFileCache:
+    """
+    Keeps parsed data files and serialized responses in memory.
+    Everything cached for a file is dropped when its mtime or size changes.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self._files = {}  # filename -> {"stamp", "items", "responses"}
+        self._lock = threading.Lock()
+
+    def _entry(self, filename):
+        file_path = os.path.join(self.data_dir, filename)
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._files.get(filename)
+            if entry is None or entry["stamp"] != stamp:
+                with open(file_path, 'r') as f:
+                    items = json.load(f)
+                entry = {"stamp": stamp, "items": items, "responses": {}}
+                self._files[filename] = entry
+                print(f"Loaded {len(items)} records from {filename}")
+            return entry
+
+    def get_response(self, filename, args):
+        """Returns (body_bytes, next_cursor) for a filtered/paginated read."""
+        entry = self._entry(filename)
+        if entry is None:
+            return b"[]", None
+
+        key = tuple(sorted(args.items()))
+        cached = entry["responses"].get(key)
+        if cached is None:
+            page, next_cursor = select_page(entry["items"], args)
+            cached = (json.dumps(page).encode('utf-8'), next_cursor)
+            entry["responses"][key] = cached
+        return cached
+
+    def get_sku_history(self, sku, args):
+        """Same contract as /api/skus/<sku>/orders, built from orders.json."""
+        entry = self._entry("orders.json")
+        if entry is None:
+            return b"[]", None
+
+        key = ("sku", sku) + tuple(sorted(args.items()))
+        cached = entry["responses"].get(key)
+        if cached is None:
+            with self._lock:
+                if "sku_index" not in entry:
+                    index = {}
+                    for order in entry["items"]:
+                        for line in order_line_records(order):
+                            index.setdefault(line["sku"], []).append(line)
+                    for lines in index.values():
+                        lines.sort(key=lambda line: (line.get('purchase_date') or '', line['id']), reverse=True)
+                    entry["sku_index"] = index
+            lines = entry["sku_index"].get(sku, [])
+            for field in FILTER_FIELDS:
+                if args.get(field):
+                    lines = [line for line in lines if line.get(field) == args[field]]
+            start_after = args.get('start_after')
+            if start_after:
+                ids = [line['id'] for line in lines]
+                lines = lines[ids.index(start_after) + 1:] if start_after in ids else lines
+            limit = min(args.get('limit', type=int) or DEFAULT_SKU_HISTORY_LIMIT, MAX_PAGE_SIZE)
+            page = lines[:limit]
+            next_cursor = page[-1]['id'] if len(page) == limit else None
+            cached = (json.dumps(page).encode('utf-8'), next_cursor)
+            entry["responses"][key] = cached
+        return cached
+
+
+def select_page(items, args):
+    """Applies the production filter and pagination rules to a list of records."""
+    for field in FILTER_FIELDS:
+        if args.get(field):
+            items = [item for item in items if item.get(field) == args[field]]
+
+    limit = args.get('limit', type=int)
+    if not limit:
+        return items, None
+
+    # Firestore pages by document ID, so mirror that ordering here.
+    limit = min(limit, MAX_PAGE_SIZE)
+    items = sorted(items, key=lambda item: str(item.get('id', '')))
+    start_after = args.get('start_after')
+    if start_after:
+        items = [item for item in items if str(item.get('id', '')) > start_after]
+    page = items[:limit]
+    next_cursor = str(page[-1].get('id')) if len(page) == limit else None
+    return page, next_cursor
+
+
+data_cache = DataFileCache(DATA_DIR)
+
+# In-memory sync jobs (the dev server runs a single process)
+sync_jobs = {}
+sync_jobs_lock = threading.Lock()
+running_job_id = None
+
+
+def run_sync_in_background(job):
+    global running_job_id
+    phase_started = None
+
+    def on_phase(name):
+        nonlocal phase_started
+        now = time.time()
+        if job["phase"]:
+            job["phases"][job["phase"]]["duration_sec"] = round(now - phase_started, 2)
+        job["phase"] = name
+        job["phases"][name] = {"started_at": datetime.utcnow().isoformat()}
+        job["updated_at"] = datetime.utcnow().isoformat()
+        if name in SYNC_PHASES:
+            job["progress"] = round(SYNC_PHASES.index(name) / len(SYNC_PHASES), 2)
+        phase_started = now
+
     try:
-        sync_amazon_data()
-        return jsonify({"status": "success", "message": "Sync completed successfully"}), 200
+        job["status"] = "running"
+        delta = sync_amazon_data(on_phase=on_phase)
+        job["delta"] = compact_delta(delta)
+        job["status"] = "succeeded"
+        job["progress"] = 1.0
     except Exception as e:
         print(f"Sync failed: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        if job["phase"]:
+            job["phases"][job["phase"]]["duration_sec"] = round(time.time() - phase_started, 2)
+        job["finished_at"] = datetime.utcnow().isoformat()
+        job["updated_at"] = job["finished_at"]
+        with sync_jobs_lock:
+            running_job_id = None
+
+
+def paged_response(filename):
+    body, next_cursor = data_cache.get_response(filename, request.args)
+    response = app.response_class(body, status=200, mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+@app.route('/manual_amazon_sync', methods=['POST'])
+def manual_sync():
+    global running_job_id
+    with sync_jobs_lock:
+        if running_job_id:
+            return jsonify({"job_id": running_job_id, "coalesced": True}), 202
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "trigger": "manual",
+            "status": "queued",
+            "phase": None,
+            "progress": 0.0,
+            "phases": {},
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        sync_jobs[job_id] = job
+        running_job_id = job_id
+
+    print(f"Received Manual Sync Request... Running in background as job {job_id}.")
+    threading.Thread(target=run_sync_in_background, args=(job,), daemon=True).start()
+    return jsonify({"job_id": job_id, "coalesced": False}), 202
+
+@app.route('/sync_jobs/<job_id>', methods=['GET'])
+def get_sync_job_status(job_id):
+    job = sync_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Sync job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/sync_jobs/<job_id>/events', methods=['GET'])
+def stream_sync_job_events(job_id):
+    """Same SSE / long-poll contract as /api/sync_jobs/<id>/events in main.py."""
+    if job_id == 'current':
+        job_id = running_job_id
+        if job_id is None:
+            return jsonify({"error": "No sync is running"}), 404
+
+    load_job = lambda: sync_jobs.get(job_id)
+
+    if request.args.get('poll'):
+        job = wait_for_job_change(load_job, request.args.get('after'), poll_interval=0.5)
+        if job is None:
+            return jsonify({"error": "Sync job not found"}), 404
+        return jsonify(job), 200
+
+    events = stream_job_events(job_id, load_job, poll_interval=0.5, timeout=600)
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/skus/<path:sku>/orders', methods=['GET'])
+def get_sku_orders(sku):
+    body, next_cursor = data_cache.get_sku_history(sku, request.args)
+    response = app.response_class(body, status=200, mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/inventory', methods=['GET'])
 def get_inventory():
-    file_path = os.path.join(DATA_DIR, "inventory.json")
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
-    return jsonify([])
+    return paged_response("inventory.json")
 
 @app.route('/orders', methods=['GET'])
 def get_orders():
-    file_path = os.path.join(DATA_DIR, "orders.json")
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
-    return jsonify([])
+    return paged_response("orders.json")
 
 @app.route('/shipments', methods=['GET'])
 def get_shipments():
-    file_path = os.path.join(DATA_DIR, "shipments.json")
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
-    return jsonify([])
+    return paged_response("shipments.json")
 
 @app.route('/', methods=['GET'])
 def index():
@@ -57,8 +253,12 @@ def index():
         "message": "Local Amazon Sync Server is running.",
         "endpoints": {
             "manual_sync": "/manual_amazon_sync [POST]",
+            "sync_jobs": "/sync_jobs/<job_id> [GET]",
+            "sync_events": "/sync_jobs/<job_id|current>/events [GET, SSE]",
             "inventory": "/inventory [GET]",
-            "orders": "/orders [GET]"
+            "orders": "/orders [GET]",
+            "shipments": "/shipments [GET]",
+            "sku_orders": "/skus/<sku>/orders [GET]"
         }
     }), 200
 
@@ -71,4 +271,4 @@ if __name__ == "__main__":
     print("   Orders:      http://localhost:5001/orders")
     print("   Shipments:   http://localhost:5001/shipments")
     print("="*50 + "\n")
-    app.run(port=5001, debug=True)
+    app.run(port=5001, debug=True, threaded=True)
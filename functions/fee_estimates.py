@@ -0,0 +1,283 @@
+"""
+Amazon fee estimates from the Product Fees API (getMyFeesEstimates), cached.
+
+Estimates are requested up to BATCH_SIZE listings per call and cached in
+Firestore, one document per
+
+    (account, marketplace, fulfillment channel, SKU, price bucket)
+
+for CACHE_TTL_DAYS. Price buckets are PRICE_BUCKET_STEP apart on a log
+scale, so a listing costs an API call only when it is new, re-priced into
+another bucket, or its estimate has expired. Each cached estimate keeps the
+fee split into a fixed part (FBA / closing fees) and a referral rate, and a
+price is charged `fixed_fee + referral_rate * price`, which stays accurate
+inside a bucket.
+
+One FeeEstimator serves both the inventory and the order enrichment of a
+sync: everything is registered first, then resolved in one pass, within
+MAX_API_CALLS batches and API_BUDGET_SECONDS of wall-clock time so the
+sync worker keeps most of its timeout for the other phases.
+
+Records carry fee_source: FEE_SOURCE once every line was priced from an
+estimate of its own bucket, FALLBACK_SOURCE otherwise (written explicitly,
+since an absent field would leave a stored value in place under merge).
+Exact orders are never estimated again; carry_fee_estimates() keeps their
+numbers when a report re-pull replaces the record.
+"""
+import math
+import os
+import time
+from datetime import datetime, timedelta
+
+FEES_COLLECTION = "fee_estimates"
+BATCH_SIZE = 20
+PRICE_BUCKET_STEP = 0.05
+CACHE_TTL_DAYS = int(os.environ.get("FEE_CACHE_TTL_DAYS", "7"))
+# Batches per sync; the API allows one call every two seconds
+MAX_API_CALLS = int(os.environ.get("FEE_API_MAX_CALLS", "30"))
+API_BUDGET_SECONDS = float(os.environ.get("FEE_API_BUDGET_SECONDS", "60"))
+# Only used when neither an estimate nor any cached bucket of the SKU exists
+FALLBACK_FEE_RATE = 0.15
+FEE_SOURCE = "fees_api"
+FALLBACK_SOURCE = "fallback"
+
+
+def price_bucket(price):
+    return int(round(math.log(price) / math.log1p(PRICE_BUCKET_STEP)))
+
+
+def bucket_price(bucket):
+    return round(math.exp(bucket * math.log1p(PRICE_BUCKET_STEP)), 2)
+
+
+def is_amazon_fulfilled(channel):
+    return channel in ("FBA", "AFN")
+
+
+def cache_key(account_id, marketplace_code, sku, bucket, amazon_fulfilled):
+    safe_sku = sku.replace("/", "_").replace("\\", "_")
+    channel = "FBA" if amazon_fulfilled else "FBM"
+    return f"{account_id}_{marketplace_code}_{channel}_{safe_sku}_{bucket}"
+
+
+def parse_fee_result(result, price):
+    """One getMyFeesEstimates result -> cache entry, or None if it failed."""
+    if result.get('Status') != 'Success':
+        return None
+    estimate = result.get('FeesEstimate') or {}
+    total = float((estimate.get('TotalFeesEstimate') or {}).get('Amount', 0.0))
+    referral = sum(
+        float((fee.get('FinalFee') or {}).get('Amount', 0.0))
+        for fee in estimate.get('FeeDetailList') or []
+        if fee.get('FeeType') == 'ReferralFee'
+    )
+    return {
+        "fixed_fee": round(total - referral, 4),
+        "referral_rate": round(referral / price, 6) if price else 0.0,
+        "bucket_price": price,
+    }
+
+
+class FeeEstimator:
+    def __init__(self, db, access_token, account_id, marketplace_id, marketplace_code, now=None):
+        self.db = db
+        self.access_token = access_token
+        self.account_id = account_id
+        self.marketplace_id = marketplace_id
+        self.marketplace_code = marketplace_code
+        self.now = now or datetime.utcnow()
+        self._entries = {}    # cache key -> entry
+        self._listings = {}   # (sku, amazon_fulfilled) -> any entry of that listing
+        self._pending = {}    # cache key -> (sku, bucket, amazon_fulfilled, currency), in priority order
+        self.api_calls = 0
+
+    def _key(self, sku, price, amazon_fulfilled):
+        bucket = price_bucket(price)
+        return cache_key(self.account_id, self.marketplace_code, sku, bucket, amazon_fulfilled), bucket
+
+    def want(self, sku, price, amazon_fulfilled, currency):
+        """Registers a listing price to estimate; call resolve() before fees()."""
+        if not sku or not price or price <= 0:
+            return
+        key, bucket = self._key(sku, price, amazon_fulfilled)
+        if key not in self._entries:
+            self._pending.setdefault(key, (sku, bucket, amazon_fulfilled, currency or "USD"))
+
+    def _remember(self, key, sku, amazon_fulfilled, entry):
+        self._entries[key] = entry
+        self._listings[(sku, amazon_fulfilled)] = entry
+
+    def _load_cached(self):
+        keys = list(self._pending)
+        expires_before = (self.now - timedelta(days=CACHE_TTL_DAYS)).isoformat()
+        collection = self.db.collection(FEES_COLLECTION)
+        for i in range(0, len(keys), 400):
+            refs = [collection.document(key) for key in keys[i:i + 400]]
+            for snapshot in self.db.get_all(refs):
+                if not snapshot.exists:
+                    continue
+                entry = snapshot.to_dict()
+                sku, _, amazon_fulfilled, _ = self._pending[snapshot.id]
+                # Expired entries still serve as a same-listing fallback
+                self._listings.setdefault((sku, amazon_fulfilled), entry)
+                if entry.get("fetched_at", "") >= expires_before:
+                    self._remember(snapshot.id, sku, amazon_fulfilled, entry)
+                    del self._pending[snapshot.id]
+
+    def _fetch_batch(self, keys):
+        import requests
+        from sp_api_sync import SP_API_ENDPOINT, sign_request
+
+        url = f"{SP_API_ENDPOINT}/products/fees/v0/feesEstimate"
+        body = []
+        for key in keys:
+            sku, bucket, amazon_fulfilled, currency = self._pending[key]
+            body.append({
+                "FeesEstimateRequest": {
+                    "MarketplaceId": self.marketplace_id,
+                    "IsAmazonFulfilled": amazon_fulfilled,
+                    "PriceToEstimateFees": {"ListingPrice": {"CurrencyCode": currency, "Amount": bucket_price(bucket)}},
+                    "Identifier": key
+                },
+                "IdType": "SellerSKU",
+                "IdValue": sku
+            })
+
+        for attempt in range(3):
+            headers = sign_request('POST', url, self.access_token, data=body)
+            response = requests.post(url, headers=headers, json=body)
+            self.api_calls += 1
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 429:
+                sleep_time = 2 * (attempt + 1)
+                print(f"      [429] Rate limit on fee estimates, retrying in {sleep_time}s...")
+                time.sleep(sleep_time)
+                continue
+            print(f"      Fees API Error {response.status_code}: {response.text}")
+            return []
+        return []
+
+    def resolve(self):
+        """Loads cached estimates and fetches the rest, within MAX_API_CALLS / API_BUDGET_SECONDS."""
+        if not self._pending:
+            return
+        wanted = len(self._pending)
+        self._load_cached()
+        cached = wanted - len(self._pending)
+
+        fetched = {}
+        keys = list(self._pending)
+        started = time.time()
+        for i in range(0, len(keys), BATCH_SIZE):
+            if self.api_calls >= MAX_API_CALLS or time.time() - started >= API_BUDGET_SECONDS:
+                print(f"      Fee estimate budget reached; {len(keys) - i} prices left for the next sync.")
+                break
+            if i:
+                time.sleep(2.0)
+            for result in self._fetch_batch(keys[i:i + BATCH_SIZE]):
+                key = (result.get('FeesEstimateIdentifier') or {}).get('SellerInputIdentifier')
+                if key not in self._pending:
+                    continue
+                sku, bucket, amazon_fulfilled, currency = self._pending[key]
+                entry = parse_fee_result(result, bucket_price(bucket))
+                if entry is None:
+                    continue
+                entry.update({"currency": currency, "fetched_at": self.now.isoformat()})
+                self._remember(key, sku, amazon_fulfilled, entry)
+                fetched[key] = entry
+
+        collection = self.db.collection(FEES_COLLECTION)
+        items = list(fetched.items())
+        for i in range(0, len(items), 400):
+            batch = self.db.batch()
+            for key, entry in items[i:i + 400]:
+                batch.set(collection.document(key), entry)
+            batch.commit()
+        self._pending = {key: value for key, value in self._pending.items() if key not in fetched}
+        print(f"    [Fees] {wanted} listing prices: {cached} cached, {len(fetched)} fetched "
+              f"in {self.api_calls} calls, {len(self._pending)} unresolved")
+
+    def fees(self, sku, price, amazon_fulfilled):
+        """
+        (fee per unit, exact). Not exact when the estimate comes from another
+        price bucket of the listing or the flat fallback rate.
+        """
+        if not sku or not price or price <= 0:
+            return 0.0, True
+        key, _ = self._key(sku, price, amazon_fulfilled)
+        entry = self._entries.get(key)
+        exact = entry is not None
+        entry = entry or self._listings.get((sku, amazon_fulfilled))
+        if entry is None:
+            return price * FALLBACK_FEE_RATE, False
+        return entry["fixed_fee"] + entry["referral_rate"] * price, exact
+
+
+def _fee_inputs(order):
+    lines = sorted((line.sku or "", line.quantity, round(float(line.item_price or 0), 2)) for line in order.items)
+    return lines, order.fulfillment_channel, order.currency, order.order_status == 'Canceled'
+
+
+def carry_fee_estimates(stored, update):
+    """
+    Keeps the stored order's exact estimate on `update` (the same order
+    re-read from a report) when its lines, prices, channel and cancellation
+    are unchanged; otherwise the order is estimated again. Returns `update`.
+    """
+    if stored is None or stored.fee_source != FEE_SOURCE or _fee_inputs(stored) != _fee_inputs(update):
+        return update
+    update.estimated_fees = stored.estimated_fees
+    update.estimated_proceeds = stored.estimated_proceeds
+    update.fee_source = FEE_SOURCE
+    return update
+
+
+def apply_fee_estimates(estimator, inventory, orders):
+    """
+    Sets estimated_fees / estimated_proceeds on the estimator's marketplace:
+    every priced inventory item (FBA), and orders not yet estimated from the
+    Fees API. Works on InventoryRecord / OrderRecord; fee_source marks the
+    records whose estimates are exact, so the rest are retried next sync;
+    exact orders are left untouched.
+    """
+    code = estimator.marketplace_code
+    items = [i for i in inventory if i.marketplace_code == code and (i.price or 0) > 0]
+    pending_orders = sorted(
+        (o for o in orders if o.marketplace_code == code and o.fee_source != FEE_SOURCE),
+        key=lambda o: o.purchase_date or "", reverse=True
+    )
+
+    # Inventory first, then newest orders: they get the API budget first
+    for item in items:
+        estimator.want(item.sku, item.price, True, item.currency)
+    for order in pending_orders:
+        amazon_fulfilled = is_amazon_fulfilled(order.fulfillment_channel)
+        for line in order.items:
+            units = max(int(float(line.quantity or 0)), 1)
+            unit_price = float(line.item_price or 0) / units
+            estimator.want(line.sku, unit_price, amazon_fulfilled, order.currency)
+    estimator.resolve()
+
+    for item in items:
+        fee, exact = estimator.fees(item.sku, item.price, True)
+        item.estimated_fees = round(fee, 2)
+        item.estimated_proceeds = round(item.price - fee, 2)
+        item.fee_source = FEE_SOURCE if exact else FALLBACK_SOURCE
+
+    exact_orders = 0
+    for order in pending_orders:
+        amazon_fulfilled = is_amazon_fulfilled(order.fulfillment_channel)
+        total_fees, all_exact = 0.0, True
+        if order.order_status != 'Canceled':
+            for line in order.items:
+                units = max(int(float(line.quantity or 0)), 1)
+                fee, exact = estimator.fees(line.sku, float(line.item_price or 0) / units, amazon_fulfilled)
+                total_fees += fee * units
+                all_exact = all_exact and exact
+        order.estimated_fees = round(total_fees, 2)
+        order.estimated_proceeds = round(float(order.order_total or 0) - total_fees, 2)
+        order.fee_source = FEE_SOURCE if all_exact else FALLBACK_SOURCE
+        exact_orders += all_exact
+    print(f"    [Fees] Estimated {len(items)} inventory items and {len(pending_orders)} orders "
+          f"({exact_orders} exact).")
@@ -0,0 +1,258 @@
+"""
+Inventory stock history, stored as changes only.
+
+Each sync records the (SKU, fulfillable quantity, status) tuples that differ
+from the state it loaded, one document per account/marketplace per sync:
+
+    inventory_history/{accountId}_{marketplaceId}
+        syncs/{timestamp}_{n}      changes from one sync (today only)
+        days/{YYYY-MM-DD}_{n}      a day's syncs compacted to end-of-day values
+        keyframes/{YYYY-MM-DD}_{n} full catalog state, every KEYFRAME_INTERVAL_DAYS
+
+Change documents are columnar (parallel sku / qty / status arrays, statuses
+dictionary-encoded), so a sync costs one write per marketplace and
+CHUNK_SKUS moved SKUs. Larger change sets (the first sync's full catalog,
+keyframes, busy days) are split into part documents `_0`, `_1`, ... of at
+most CHUNK_SKUS SKUs each, sorted by SKU, which keeps every document far
+below Firestore's size limit. Parts of one record share its `day` / `at`
+and hold disjoint SKUs, so readers simply apply every matching document.
+The arrays are exempt from indexing (firestore.indexes.json); only `day`
+and `at` are queried. Compaction folds every sync document older than today
+into its day document and writes a keyframe when one is due. The catalog at
+any point in time is therefore the nearest keyframe plus at most
+KEYFRAME_INTERVAL_DAYS day documents.
+"""
+from datetime import date, datetime, timedelta
+
+HISTORY_COLLECTION = "inventory_history"
+KEYFRAME_INTERVAL_DAYS = 7
+# SKUs per change document, and part documents per write batch
+CHUNK_SKUS = 2000
+PARTS_PER_BATCH = 20
+
+
+def stream_id(account_id, marketplace_code):
+    return f"{account_id}_{marketplace_code}"
+
+
+def stock_state(items):
+    """{(accountId, marketplaceId): {sku: (qty, status)}} from inventory docs or records."""
+    state = {}
+    for item in items:
+        if not isinstance(item, dict):
+            item = item.to_dict()
+        sku = item.get('sku')
+        if not sku:
+            continue
+        key = (item.get('accountId'), item.get('marketplaceId'))
+        state.setdefault(key, {})[sku] = (int(item.get('stock_level') or 0), item.get('status'))
+    return state
+
+
+def diff_states(before, after):
+    """{sku: (qty, status)} for SKUs that are new or whose tuple changed."""
+    return {sku: value for sku, value in after.items() if before.get(sku) != value}
+
+
+def encode_changes(changes, **fields):
+    """{sku: (qty, status)} -> columnar document with dictionary-encoded statuses."""
+    status_names = sorted({status or "" for _, status in changes.values()})
+    codes = {name: i for i, name in enumerate(status_names)}
+    skus = sorted(changes)
+    doc = dict(fields)
+    doc.update({
+        "sku": skus,
+        "qty": [changes[sku][0] for sku in skus],
+        "status": [codes[changes[sku][1] or ""] for sku in skus],
+        "status_names": status_names,
+    })
+    return doc
+
+
+def decode_changes(doc):
+    names = doc.get("status_names", [])
+    return {
+        sku: (qty, names[code] or None)
+        for sku, qty, code in zip(doc.get("sku", []), doc.get("qty", []), doc.get("status", []))
+    }
+
+
+def write_parts(db, collection, base_id, changes, replace=(), **fields):
+    """
+    Writes `changes` as part documents {base_id}_{n} (at least one), then
+    deletes the documents in `replace` that were not rewritten. Returns the
+    number of parts.
+    """
+    skus = sorted(changes)
+    refs = []
+    batch, pending = db.batch(), 0
+    for n, i in enumerate(range(0, max(len(skus), 1), CHUNK_SKUS)):
+        ref = collection.document(f"{base_id}_{n}")
+        batch.set(ref, encode_changes({sku: changes[sku] for sku in skus[i:i + CHUNK_SKUS]}, part=n, **fields))
+        refs.append(ref)
+        pending += 1
+        if pending >= PARTS_PER_BATCH:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    written = {ref.id for ref in refs}
+    for ref in replace:
+        if ref.id not in written:
+            batch.delete(ref)
+            pending += 1
+    if pending:
+        batch.commit()
+    return len(refs)
+
+
+def _day_str(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def record_inventory_changes(db, before_items, after_items, at=None):
+    """
+    Writes one change document per account/marketplace whose stock changed.
+    `before_items` may be a stock_state() result already. The first record
+    of a marketplace holds its whole catalog. Returns the number of SKUs written.
+    """
+    at = at or datetime.utcnow()
+    before = before_items if isinstance(before_items, dict) else stock_state(before_items)
+    after = stock_state(after_items)
+
+    total = 0
+    for (account_id, marketplace_code), state in after.items():
+        parent = db.collection(HISTORY_COLLECTION).document(stream_id(account_id, marketplace_code))
+        changes = diff_states(before.get((account_id, marketplace_code), {}), state)
+        if not changes:
+            continue
+        if not parent.get().exists:
+            # First record for this marketplace: start from the full catalog
+            changes = dict(state)
+        write_parts(db, parent.collection("syncs"), at.strftime('%Y%m%dT%H%M%S%f'), changes,
+                    day=at.date().isoformat(), at=at.isoformat())
+        # The parent goes last: if a part failed, the next sync starts over from the full catalog
+        parent.set({"accountId": account_id, "marketplaceId": marketplace_code, "updated_at": at.isoformat()}, merge=True)
+        total += len(changes)
+    print(f"    [Inventory History] Recorded {total} stock changes.")
+    return total
+
+
+def _latest_keyframe(parent, day):
+    """(keyframe day, {sku: (qty, status)}) of the latest keyframe up to `day`, or None."""
+    keyframes = parent.collection("keyframes")
+    docs = keyframes.where("day", "<=", day).order_by("day", direction="DESCENDING").limit(1).get()
+    if not docs:
+        return None
+    keyframe_day = docs[0].to_dict()["day"]
+    state = {}
+    for doc in keyframes.where("day", "==", keyframe_day).stream():
+        state.update(decode_changes(doc.to_dict()))
+    return keyframe_day, state
+
+
+def catalog_at(db, account_id, marketplace_code, at):
+    """{sku: (qty, status)} as of `at` (date or datetime)."""
+    parent = db.collection(HISTORY_COLLECTION).document(stream_id(account_id, marketplace_code))
+    day = _day_str(at)
+    at_iso = at.isoformat() if isinstance(at, datetime) else f"{day}T23:59:59.999999"
+
+    keyframe = _latest_keyframe(parent, day)
+    state = dict(keyframe[1]) if keyframe else {}
+    query = parent.collection("days").where("day", "<=", day)
+    if keyframe:
+        query = query.where("day", ">", keyframe[0])
+    for doc in query.order_by("day").stream():
+        state.update(decode_changes(doc.to_dict()))
+
+    # Today's changes are still per sync
+    for doc in parent.collection("syncs").where("day", "==", day).order_by("at").stream():
+        data = doc.to_dict()
+        if data["at"] <= at_iso:
+            state.update(decode_changes(data))
+    return state
+
+
+def sku_stock_curve(db, account_id, marketplace_code, sku, start, end):
+    """
+    [(timestamp, qty, status)] for one SKU between `start` and `end` (dates):
+    the value in effect at `start`, then one point per day (or per sync, for
+    days not yet compacted) on which the SKU changed.
+    """
+    parent = db.collection(HISTORY_COLLECTION).document(stream_id(account_id, marketplace_code))
+    start_day, end_day = _day_str(start), _day_str(end)
+    initial = catalog_at(db, account_id, marketplace_code, date.fromisoformat(start_day) - timedelta(days=1)).get(sku)
+    points = [(start_day, initial[0], initial[1])] if initial else []
+
+    changes = []
+    for collection, stamp in (("days", "day"), ("syncs", "at")):
+        query = parent.collection(collection).where("day", ">=", start_day).where("day", "<=", end_day)
+        for doc in query.stream():
+            data = doc.to_dict()
+            value = decode_changes(data).get(sku)
+            if value is not None:
+                changes.append((data[stamp], value[0], value[1]))
+    changes.sort()
+    return points + changes
+
+
+def compact_inventory_history(db, today=None):
+    """
+    Folds sync documents from before `today` into day documents, writes due
+    keyframes and deletes the folded syncs. Safe to run repeatedly.
+    """
+    today = (today or datetime.utcnow().date()).isoformat()
+    compacted = 0
+    for parent in db.collection(HISTORY_COLLECTION).list_documents():
+        syncs = list(parent.collection("syncs").where("day", "<", today).order_by("day").stream())
+        if not syncs:
+            continue
+
+        by_day = {}
+        for doc in syncs:
+            data = doc.to_dict()
+            by_day.setdefault(data["day"], []).append((data["at"], doc.reference, decode_changes(data)))
+
+        for day in sorted(by_day):
+            entries = sorted(by_day[day], key=lambda entry: entry[0])
+            days = parent.collection("days")
+            existing = list(days.where("day", "==", day).stream())
+            merged = {}
+            for doc in existing:
+                merged.update(decode_changes(doc.to_dict()))
+            for _, _, changes in entries:
+                merged.update(changes)
+
+            keyframe = _latest_keyframe(parent, day)
+            if keyframe is None or (date.fromisoformat(day) - date.fromisoformat(keyframe[0])).days >= KEYFRAME_INTERVAL_DAYS:
+                # State at end of `day`: previous keyframe + day documents up to and including this one
+                state = dict(keyframe[1]) if keyframe else {}
+                query = days.where("day", "<", day)
+                if keyframe:
+                    query = query.where("day", ">", keyframe[0])
+                for doc in query.order_by("day").stream():
+                    state.update(decode_changes(doc.to_dict()))
+                state.update(merged)
+                keyframes = parent.collection("keyframes")
+                stale = [doc.reference for doc in keyframes.where("day", "==", day).stream()]
+                write_parts(db, keyframes, day, state, replace=stale, day=day)
+            # Rewriting the day's parts is not atomic, but every part of the
+            # old and new sets agrees on the SKUs outside these syncs, and a
+            # rerun re-applies the syncs on top.
+            write_parts(db, days, day, merged, replace=[doc.reference for doc in existing], day=day)
+
+            # Drop the folded syncs only once the day document is written;
+            # a rerun after a partial failure re-applies the same changes.
+            refs = [ref for _, ref, _ in entries]
+            for i in range(0, len(refs), 400):
+                batch = db.batch()
+                for ref in refs[i:i + 400]:
+                    batch.delete(ref)
+                batch.commit()
+            compacted += len(entries)
+
+    if compacted:
+        print(f"    [Inventory History] Compacted {compacted} sync records into day records.")
+    return compacted
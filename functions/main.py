@@ -1,14 +1,33 @@
 import os
-from firebase_functions import https_fn, pubsub_fn, options
+import json
+from datetime import date, datetime, timedelta
+from firebase_functions import https_fn, pubsub_fn, firestore_fn, options
 from firebase_admin import initialize_app, firestore
 import logging
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from sp_api_sync import sync_amazon_data
+from sync_jobs import (
+    enqueue_sync_job, get_sync_job, get_current_sync_job_id, get_sync_generation, run_sync_job,
+    stream_job_events, wait_for_job_change, JOBS_COLLECTION
+)
+from read_cache import ReadCache
+from inventory_history import catalog_at, sku_stock_curve
+
+# NOTE: Every function in this codebase loads this module on cold start, so keep
+# top-level imports to what the read path needs. The SP-API sync code (requests,
+# gzip, csv, signing) is imported lazily by sync_jobs.run_sync_job only.
 
 # Initialize Firebase Admin
 initialize_app()
-db = firestore.client()
+
+# Firestore Client (created once per instance, on first use)
+db = None
+
+def get_db():
+    global db
+    if db is None:
+        db = firestore.client()
+    return db
 
 # Set up logging
 logger = logging.getLogger()
@@ -23,17 +42,97 @@ SECRETS = [
     "LWA_AWS_SECRET_KEY"
 ]
 
+# Read path: served by the lightweight `api` function.
 app = Flask(__name__)
 CORS(app)
 
+# Sync path: enqueue + job status, served by `sync_api`.
+sync_app = Flask(__name__ + ".sync")
+CORS(sync_app)
+
+# Warm-instance cache of serialized collection pages, dropped when a sync
+# writes new data (sync generation check at most every 5s). 64 MB keeps it
+# well inside the 512 MB api instance.
+read_cache = ReadCache(lambda: get_sync_generation(get_db()), max_entries=64, max_bytes=64 * 1024 * 1024,
+                       ttl_seconds=300, generation_check_interval=5)
+
+# Query parameters accepted by the collection read endpoints.
+FILTER_FIELDS = ['accountId', 'marketplaceId']
+MAX_PAGE_SIZE = 1000
+
+def read_collection_page(collection_name, args):
+    """
+    Reads a collection, optionally filtered (accountId, marketplaceId) and
+    paginated (limit, start_after=<document id>). Returns (json_body, next_cursor).
+    Without `limit` the whole (filtered) collection is returned.
+    """
+    query = get_db().collection(collection_name)
+    for field in FILTER_FIELDS:
+        if args.get(field):
+            query = query.where(filter=firestore.FieldFilter(field, '==', args[field]))
+
+    limit = args.get('limit', type=int)
+    if limit:
+        limit = min(limit, MAX_PAGE_SIZE)
+        query = query.order_by('__name__')
+        if args.get('start_after'):
+            query = query.start_after(get_db().collection(collection_name).document(args['start_after']))
+        query = query.limit(limit)
+
+    items = []
+    last_id = None
+    for doc in query.stream():
+        items.append(doc.to_dict())
+        last_id = doc.id
+
+    next_cursor = last_id if limit and len(items) == limit else None
+    return json.dumps(items, default=str), next_cursor
+
+# SKU-indexed order lines written by the sync (sp_api_sync.ORDER_LINES_COLLECTION)
+ORDER_LINES_COLLECTION = 'order_items'
+DEFAULT_SKU_HISTORY_LIMIT = 100
+
+def read_sku_order_lines(sku, args):
+    """
+    Newest-first order lines for one SKU, optionally filtered by accountId /
+    marketplaceId. Served by the composite indexes in firestore.indexes.json,
+    so a page costs O(limit) reads. start_after=<order line id> pages on.
+    """
+    collection = get_db().collection(ORDER_LINES_COLLECTION)
+    query = collection.where(filter=firestore.FieldFilter('sku', '==', sku))
+    for field in FILTER_FIELDS:
+        if args.get(field):
+            query = query.where(filter=firestore.FieldFilter(field, '==', args[field]))
+    query = query.order_by('purchase_date', direction=firestore.Query.DESCENDING)
+
+    limit = min(args.get('limit', type=int) or DEFAULT_SKU_HISTORY_LIMIT, MAX_PAGE_SIZE)
+    if args.get('start_after'):
+        cursor_doc = collection.document(args['start_after']).get()
+        if cursor_doc.exists:
+            query = query.start_after(cursor_doc)
+    query = query.limit(limit)
+
+    items = []
+    last_id = None
+    for doc in query.stream():
+        items.append(doc.to_dict())
+        last_id = doc.id
+
+    next_cursor = last_id if len(items) == limit else None
+    return json.dumps(items, default=str), next_cursor
+
+def cached_collection_response(collection_name):
+    key = (collection_name,) + tuple(sorted(request.args.items()))
+    body, next_cursor = read_cache.get_or_load(key, lambda: read_collection_page(collection_name, request.args))
+    response = app.response_class(body, status=200, mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @app.route('/api/inventory', methods=['GET'])
 def get_inventory():
     try:
-        docs = db.collection('inventory').stream()
-        inventory = []
-        for doc in docs:
-            inventory.append(doc.to_dict())
-        return jsonify(inventory), 200
+        return cached_collection_response('inventory')
     except Exception as e:
         logger.error(f"Error fetching inventory: {e}")
         return jsonify({"error": str(e)}), 500
@@ -41,11 +140,7 @@ def get_inventory():
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
     try:
-        docs = db.collection('orders').stream()
-        orders = []
-        for doc in docs:
-            orders.append(doc.to_dict())
-        return jsonify(orders), 200
+        return cached_collection_response('orders')
     except Exception as e:
         logger.error(f"Error fetching orders: {e}")
         return jsonify({"error": str(e)}), 500
@@ -53,40 +148,151 @@ def get_orders():
 @app.route('/api/shipments', methods=['GET'])
 def get_shipments():
     try:
-        docs = db.collection('shipments').stream()
-        shipments = []
-        for doc in docs:
-            shipments.append(doc.to_dict())
-        return jsonify(shipments), 200
+        return cached_collection_response('shipments')
     except Exception as e:
         logger.error(f"Error fetching shipments: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/manual_amazon_sync', methods=['POST'])
+@app.route('/api/skus/<path:sku>/orders', methods=['GET'])
+def get_sku_orders(sku):
+    try:
+        key = (ORDER_LINES_COLLECTION, sku) + tuple(sorted(request.args.items()))
+        body, next_cursor = read_cache.get_or_load(key, lambda: read_sku_order_lines(sku, request.args))
+        response = app.response_class(body, status=200, mimetype='application/json')
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    except Exception as e:
+        logger.error(f"Error fetching order history for SKU {sku}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/inventory_history', methods=['GET'])
+def get_inventory_history():
+    """
+    ?accountId=&marketplaceId=&sku=&start=YYYY-MM-DD&end=YYYY-MM-DD -> one SKU's stock curve
+    ?accountId=&marketplaceId=&at=YYYY-MM-DD                        -> whole catalog on that day
+    """
+    account_id = request.args.get('accountId')
+    marketplace_id = request.args.get('marketplaceId')
+    if not account_id or not marketplace_id:
+        return jsonify({"error": "accountId and marketplaceId are required"}), 400
+    try:
+        if request.args.get('sku'):
+            end = request.args.get('end') or datetime.utcnow().date().isoformat()
+            start = request.args.get('start') or (date.fromisoformat(end) - timedelta(days=90)).isoformat()
+            points = sku_stock_curve(get_db(), account_id, marketplace_id, request.args['sku'], start, end)
+            return jsonify([{"at": at, "stock_level": qty, "status": status} for at, qty, status in points]), 200
+
+        at = date.fromisoformat(request.args.get('at') or datetime.utcnow().date().isoformat())
+        catalog = catalog_at(get_db(), account_id, marketplace_id, at)
+        return jsonify({sku: {"stock_level": qty, "status": status} for sku, (qty, status) in catalog.items()}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching inventory history: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/_debug/cache', methods=['GET'])
+def get_cache_stats():
+    return jsonify(read_cache.stats()), 200
+
+@sync_app.route('/api/manual_amazon_sync', methods=['POST'])
 def manual_sync():
+    """
+    Enqueues a sync job and returns immediately. The sync itself runs in
+    run_sync_job_worker; poll /api/sync_jobs/<job_id> for progress.
+    """
+    try:
+        logger.info("Enqueuing Manual Amazon Sync (HTTP)...")
+        job_id, coalesced = enqueue_sync_job(get_db(), trigger="manual")
+        if coalesced:
+            logger.info(f"Sync already running as job {job_id}. Coalescing request.")
+        return jsonify({"job_id": job_id, "coalesced": coalesced}), 202
+    except Exception as e:
+        logger.error(f"Manual Sync Enqueue Failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@sync_app.route('/api/sync_jobs/<job_id>', methods=['GET'])
+def get_sync_job_status(job_id):
+    try:
+        job = get_sync_job(get_db(), job_id)
+        if job is None:
+            return jsonify({"error": "Sync job not found"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        logger.error(f"Error fetching sync job {job_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# Below the 60s Firebase Hosting proxy limit, so streams end cleanly with a `timeout` event
+SSE_STREAM_SECONDS = 50
+
+@sync_app.route('/api/sync_jobs/<job_id>/events', methods=['GET'])
+def stream_sync_job_events(job_id):
+    """
+    Streams sync progress as server-sent events (phase, delta, done).
+    Use job_id 'current' to follow whichever sync is running.
+    Firebase Hosting rewrites cut requests off at 60s, so each stream ends
+    with a `timeout` event after SSE_STREAM_SECONDS and the client reconnects.
+    With ?poll=1&after=<updated_at> it long-polls instead and returns the job
+    as JSON once it changes, for clients behind proxies that buffer SSE.
+    """
     try:
-        logger.info("Starting Manual Amazon Sync (HTTP)...")
-        # Ensure sp_api_sync uses the secrets which are injected as env vars
-        sync_amazon_data()
-        return jsonify({"message": "Sync completed successfully"}), 200
+        if job_id == 'current':
+            job_id = get_current_sync_job_id(get_db())
+            if job_id is None:
+                return jsonify({"error": "No sync is running"}), 404
+
+        load_job = lambda: get_sync_job(get_db(), job_id)
+
+        if request.args.get('poll'):
+            job = wait_for_job_change(load_job, request.args.get('after'))
+            if job is None:
+                return jsonify({"error": "Sync job not found"}), 404
+            return jsonify(job), 200
+
+        events = stream_job_events(job_id, load_job, poll_interval=2.0, timeout=SSE_STREAM_SECONDS)
+        return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
     except Exception as e:
-        logger.error(f"Manual Sync Failed: {e}")
+        logger.error(f"Error streaming sync job {job_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
-@https_fn.on_request(secrets=SECRETS, timeout_sec=540, memory=options.MemoryOption.GB_1)
+@https_fn.on_request(timeout_sec=60, memory=options.MemoryOption.MB_512)
 def api(req: https_fn.Request) -> https_fn.Response:
     with app.request_context(req):
         return app.full_dispatch_request()
 
-@pubsub_fn.on_message_published(topic="daily-sync-topic", secrets=SECRETS, timeout_sec=540, memory=options.MemoryOption.GB_1)
+@https_fn.on_request(timeout_sec=300, memory=options.MemoryOption.MB_256)
+def sync_api(req: https_fn.Request) -> https_fn.Response:
+    with sync_app.request_context(req):
+        return sync_app.full_dispatch_request()
+
+@firestore_fn.on_document_created(document=JOBS_COLLECTION + "/{jobId}", secrets=SECRETS, timeout_sec=540, memory=options.MemoryOption.GB_1)
+def run_sync_job_worker(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    """
+    Runs a queued sync job. Manual and scheduled triggers both only enqueue,
+    so the sync lease guarantees a single running sync.
+    """
+    job_id = event.params["jobId"]
+    logger.info(f"Starting Amazon Sync for job {job_id}...")
+    run_sync_job(get_db(), job_id)
+    logger.info(f"Sync job {job_id} finished.")
+
+@pubsub_fn.on_message_published(topic="daily-sync-topic")
 def sync_amazon_data_scheduled_v2(event: pubsub_fn.CloudEvent[pubsub_fn.MessagePublishedData]) -> None:
     """
     Scheduled Trigger (via Pub/Sub format).
+    Enqueues a sync job; coalesces with a manual sync already in progress.
     """
     try:
-        logger.info("Starting Scheduled Amazon Sync...")
-        sync_amazon_data()
-        logger.info("Scheduled Sync Completed.")
+        logger.info("Enqueuing Scheduled Amazon Sync...")
+        job_id, coalesced = enqueue_sync_job(get_db(), trigger="scheduled")
+        if coalesced:
+            logger.info(f"Sync already running as job {job_id}. Skipping scheduled run.")
+        else:
+            logger.info(f"Scheduled Sync enqueued as job {job_id}.")
     except Exception as e:
-        logger.error(f"Scheduled Sync Failed: {e}")
+        logger.error(f"Scheduled Sync Enqueue Failed: {e}")
 
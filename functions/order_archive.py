@@ -0,0 +1,169 @@
+"""
+Columnar order history archive.
+
+Orders are flattened to one row per line item and stored as Parquet, hive
+partitioned by account / marketplace / month:
+
+    <root>/account=default_account_1/marketplace=US/month=2025-12/orders.parquet
+
+The order sync rewrites only the months that contain changed orders, so a
+run costs O(changed months) rather than O(lifetime history). Readers use
+pyarrow.dataset, which prunes partitions from the filters and only decodes
+the requested columns; local archives are memory-mapped.
+
+Enable for sync runs with ORDER_ARCHIVE_ROOT=/path/to/archive (or gs://bucket/prefix).
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+ORDER_ARCHIVE_ROOT_ENV = "ORDER_ARCHIVE_ROOT"
+
+PARTITION_FIELDS = ("account", "marketplace", "month")
+PARTITIONING = ds.partitioning(
+    pa.schema([(name, pa.string()) for name in PARTITION_FIELDS]), flavor="hive"
+)
+
+LINE_SCHEMA = pa.schema([
+    ("order_id", pa.string()),
+    ("line_no", pa.int16()),
+    ("purchase_date", pa.timestamp("ms", tz="UTC")),
+    ("order_status", pa.string()),
+    ("fulfillment_channel", pa.string()),
+    ("currency", pa.string()),
+    ("order_total", pa.float64()),
+    ("sku", pa.string()),
+    ("title", pa.string()),
+    ("quantity", pa.int32()),
+    ("item_price", pa.float64()),
+])
+
+
+def _parse_purchase_date(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _partition_key(order, purchased):
+    return (
+        order.get('accountId') or 'unknown',
+        order.get('marketplaceId') or 'unknown',
+        f"{purchased.year:04d}-{purchased.month:02d}" if purchased else 'unknown'
+    )
+
+
+def orders_to_partitions(orders):
+    """Groups orders into {(account, marketplace, month): column dict} of flattened line items."""
+    partitions = defaultdict(lambda: {field.name: [] for field in LINE_SCHEMA})
+    for order in orders:
+        purchased = _parse_purchase_date(order.get('purchase_date'))
+        columns = partitions[_partition_key(order, purchased)]
+        for line_no, item in enumerate(order.get('items') or []):
+            quantity = _float(item.get('quantity'))
+            columns["order_id"].append(str(order.get('id')))
+            columns["line_no"].append(line_no)
+            columns["purchase_date"].append(purchased)
+            columns["order_status"].append(order.get('order_status'))
+            columns["fulfillment_channel"].append(order.get('fulfillment_channel'))
+            columns["currency"].append(order.get('currency'))
+            columns["order_total"].append(_float(order.get('order_total')))
+            columns["sku"].append(item.get('sku'))
+            columns["title"].append(item.get('title'))
+            columns["quantity"].append(int(quantity) if quantity is not None else None)
+            columns["item_price"].append(_float(item.get('item_price')))
+    return partitions
+
+
+def _filesystem(root):
+    if "://" in root:
+        filesystem, path = pafs.FileSystem.from_uri(root)
+    else:
+        filesystem, path = pafs.LocalFileSystem(use_mmap=True), os.path.abspath(root)
+    return filesystem, path.rstrip('/')
+
+
+def write_order_archive(root, orders, changed_ids=None):
+    """
+    Rewrites the archive partitions that contain any order in `changed_ids`
+    (all partitions if None) from the full `orders` list. Returns the number
+    of partitions written.
+    """
+    filesystem, base = _filesystem(root)
+    if changed_ids is not None:
+        changed_ids = set(changed_ids)
+        keyed = [(_partition_key(o, _parse_purchase_date(o.get('purchase_date'))), o) for o in orders]
+        touched = {key for key, o in keyed if str(o.get('id')) in changed_ids}
+        orders = [o for key, o in keyed if key in touched]
+
+    written = 0
+    for (account, marketplace, month), columns in orders_to_partitions(orders).items():
+        directory = f"{base}/account={account}/marketplace={marketplace}/month={month}"
+        filesystem.create_dir(directory, recursive=True)
+        table = pa.Table.from_pydict(columns, schema=LINE_SCHEMA).sort_by([("sku", "ascending")])
+        # Write then move, so readers never see a half-written month. The "_"
+        # prefix keeps pyarrow.dataset from reading an in-flight or orphaned temp file.
+        tmp_path = f"{directory}/_orders.parquet.tmp"
+        pq.write_table(table, tmp_path, filesystem=filesystem, compression="zstd")
+        filesystem.move(tmp_path, f"{directory}/orders.parquet")
+        written += 1
+    print(f"    [Archive] Rewrote {written} order month partitions under {root}")
+    return written
+
+
+def open_order_archive(root):
+    filesystem, base = _filesystem(root)
+    return ds.dataset(base, filesystem=filesystem, format="parquet", partitioning=PARTITIONING)
+
+
+def read_order_lines(root, columns, account=None, marketplace=None, since_month=None, until_month=None):
+    """
+    Reads only `columns` from the months in [since_month, until_month]
+    ('YYYY-MM', inclusive) for the given account / marketplace.
+    """
+    expression = None
+    for condition in (
+        ds.field("account") == account if account else None,
+        ds.field("marketplace") == marketplace if marketplace else None,
+        ds.field("month") >= since_month if since_month else None,
+        ds.field("month") <= until_month if until_month else None,
+    ):
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    dataset = open_order_archive(root)
+    scanner = dataset.scanner(columns=list(columns), filter=expression)
+    return scanner.to_table()
+
+
+def units_per_sku(root, since_month, account=None, marketplace=None):
+    """{sku: units sold} since `since_month`, excluding cancelled orders."""
+    table = read_order_lines(root, ["sku", "quantity", "order_status"], account, marketplace, since_month)
+    table = table.filter(pc.field("order_status") != "Canceled")
+    grouped = table.group_by("sku").aggregate([("quantity", "sum")])
+    return dict(zip(grouped["sku"].to_pylist(), grouped["quantity_sum"].to_pylist()))
+
+
+def last_sold_by_sku(root, account=None, marketplace=None):
+    """{sku: latest purchase_date} across the archive."""
+    table = read_order_lines(root, ["sku", "purchase_date"], account, marketplace)
+    grouped = table.group_by("sku").aggregate([("purchase_date", "max")])
+    return dict(zip(grouped["sku"].to_pylist(), grouped["purchase_date_max"].to_pylist()))
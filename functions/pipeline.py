@@ -0,0 +1,147 @@
+"""
+Bounded producer/consumer pipeline for the sync.
+
+A Pipeline is a chain of Stages connected by bounded queues. Each stage runs
+`workers` threads; a stage function takes one item and returns an iterable
+of items for the next stage (zero, one or many), so stages can filter, split
+and batch. Because every queue is bounded, a slow stage blocks the ones
+upstream (backpressure) and at most `queue_size` items wait between any two
+stages, which keeps memory flat however long the source is. Stages overlap,
+so a run takes roughly as long as its slowest stage rather than the sum.
+
+Threads suit the sync's stages: network calls and Firestore commits release
+the GIL, and CPU-heavy parsing is handed to a process pool from its stage.
+
+The first exception in any stage stops the source, the remaining items are
+drained and discarded, and run() re-raises it. Per-stage metrics (items,
+busy time, throughput, input queue depth, time blocked by backpressure) are
+kept on each Stage and printed by report().
+"""
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+        self._lock = threading.Lock()
+
+    def _record(self, depth, busy, blocked, produced):
+        with self._lock:
+            self.items_in += 1
+            self.items_out += produced
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def summary(self, elapsed):
+        rate = self.items_in / elapsed if elapsed else 0.0
+        depth_avg = self.depth_total / self.items_in if self.items_in else 0.0
+        return (f"{self.name}: {self.items_in} in / {self.items_out} out, x{self.workers}, "
+                f"busy {self.busy_seconds:.1f}s, {rate:.1f}/s, queue avg {depth_avg:.1f} max {self.depth_max}, "
+                f"blocked {self.blocked_seconds:.1f}s")
+
+
+class Pipeline:
+    def __init__(self, name, stages, queue_size=4):
+        self.name = name
+        self.stages = stages
+        self.queue_size = queue_size
+        self.elapsed = 0.0
+        self.source_blocked_seconds = 0.0
+
+    def run(self, source):
+        """Feeds `source` through every stage; returns the last stage's outputs (in completion order)."""
+        queues = [queue.Queue(maxsize=stage.queue_size or self.queue_size) for stage in self.stages]
+        results = []
+        results_lock = threading.Lock()
+        errors = []
+        abort = threading.Event()
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+
+        def worker(index):
+            stage = self.stages[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            while True:
+                depth = inbox.qsize()
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                if abort.is_set():
+                    continue  # drain so upstream never blocks on a dead stage
+                busy = blocked = 0.0
+                produced = 0
+                try:
+                    started = time.perf_counter()
+                    outputs = list(stage.fn(item) or ())
+                    busy = time.perf_counter() - started
+                    for output in outputs:
+                        if outbox is None:
+                            with results_lock:
+                                results.append(output)
+                        else:
+                            put_started = time.perf_counter()
+                            outbox.put(output)
+                            blocked += time.perf_counter() - put_started
+                        produced += 1
+                except Exception as e:
+                    errors.append((stage.name, e))
+                    abort.set()
+                stage._record(depth, busy, blocked, produced)
+
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    outbox.put(_DONE)
+
+        threads = [
+            threading.Thread(target=worker, args=(index,), name=f"{self.name}-{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            for item in source:
+                if abort.is_set():
+                    break
+                put_started = time.perf_counter()
+                queues[0].put(item)
+                self.source_blocked_seconds += time.perf_counter() - put_started
+        except Exception as e:
+            errors.append(("source", e))
+            abort.set()
+        finally:
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - started
+
+        if errors:
+            stage_name, error = errors[0]
+            raise RuntimeError(f"{self.name} pipeline failed in stage '{stage_name}': {error}") from error
+        return results
+
+    def report(self, indent="    "):
+        print(f"{indent}[Pipeline] {self.name}: {self.elapsed:.1f}s total, source blocked {self.source_blocked_seconds:.1f}s")
+        for stage in self.stages:
+            print(f"{indent}  {stage.summary(self.elapsed)}")
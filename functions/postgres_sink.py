@@ -0,0 +1,261 @@
+"""
+Postgres sink: mirrors the Firestore inventory / orders / shipments collections
+into the backend's analytical tables (see backend/app/db/models.py, migration
+0004).
+
+Each write COPYs the records into a temporary staging table and upserts from
+there on the Firestore document ID, all in one transaction. Order line items
+are replaced wholesale for every order written.
+
+Enable for sync runs with SYNC_SINKS=postgres and POSTGRES_SINK_URL=postgresql://...
+
+Backfill existing Firestore data (parallel partitioned readers, one Postgres
+connection per reader):
+    cd functions
+    python postgres_sink.py --readers 8
+    python postgres_sink.py --collections orders --readers 16 --batch-size 5000
+"""
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+from sync_sinks import SyncSink
+
+
+def _text(value):
+    if value is None:
+        return None
+    return str(value)
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _integer(value):
+    number = _number(value)
+    return int(number) if number is not None else None
+
+
+def _timestamp(value):
+    """ISO string / datetime -> naive UTC ISO string (None if unparseable)."""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, datetime):
+        if isinstance(value, date):
+            return value.isoformat()
+        try:
+            value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(sep=' ')
+
+
+def _date(value):
+    stamp = _timestamp(value)
+    return stamp[:10] if stamp else None
+
+
+def _doc(record):
+    return json.dumps(record, default=str)
+
+
+def _inventory_row(r):
+    return (
+        r['id'], r.get('accountId') or '', r.get('marketplaceId') or '', r.get('sku') or '', _text(r.get('asin')),
+        _text(r.get('title')), _integer(r.get('stock_level')), _text(r.get('status')), _number(r.get('price')),
+        _number(r.get('estimated_fees')), _number(r.get('estimated_proceeds')), _timestamp(r.get('last_sold_date')),
+        _timestamp(r.get('updated_at')), _doc(r)
+    )
+
+
+def _order_row(r):
+    return (
+        r['id'], r.get('accountId') or '', r.get('marketplaceId') or '', _timestamp(r.get('purchase_date')),
+        _text(r.get('order_status')), _number(r.get('order_total')), _text(r.get('currency')),
+        _text(r.get('fulfillment_channel')), _number(r.get('estimated_fees')), _number(r.get('estimated_proceeds')),
+        _timestamp(r.get('updated_at')), _doc(r)
+    )
+
+
+def _shipment_row(r):
+    units = r.get('items')
+    return (
+        r['id'], r.get('accountId') or '', r.get('marketplaceId') or '', _text(r.get('shipment_name')),
+        _text(r.get('destination')), _text(r.get('status')), _integer(units) if not isinstance(units, list) else None,
+        _date(r.get('created_date')), _timestamp(r.get('updated_at')), _doc(r)
+    )
+
+
+# Firestore collection -> (table, columns, row builder)
+MIRROR_TABLES = {
+    "inventory": ("inventory_items", (
+        "id", "account_key", "marketplace_code", "sku", "asin", "title", "stock_level", "status", "price",
+        "estimated_fees", "estimated_proceeds", "last_sold_date", "updated_at", "doc"
+    ), _inventory_row),
+    "orders": ("orders", (
+        "id", "account_key", "marketplace_code", "purchase_date", "order_status", "order_total", "currency",
+        "fulfillment_channel", "estimated_fees", "estimated_proceeds", "updated_at", "doc"
+    ), _order_row),
+    "shipments": ("shipments", (
+        "id", "account_key", "marketplace_code", "shipment_name", "destination", "status", "units",
+        "created_date", "updated_at", "doc"
+    ), _shipment_row),
+}
+
+ORDER_ITEM_COLUMNS = ("order_id", "line_no", "sku", "title", "quantity", "item_price")
+
+
+def _copy(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+class PostgresSink(SyncSink):
+    name = "postgres"
+
+    def __init__(self, dsn):
+        import psycopg2
+
+        self.conn = psycopg2.connect(dsn)
+
+    def write(self, collection, records):
+        if collection not in MIRROR_TABLES:
+            return 0
+        table, columns, to_row = MIRROR_TABLES[collection]
+        # Last record wins; ON CONFLICT cannot update the same row twice
+        by_id = {str(r['id']): dict(r, id=str(r['id'])) for r in records if r.get('id')}
+        if not by_id:
+            return 0
+
+        started = time.time()
+        stage = f"stage_{table}"
+        col_list = ', '.join(columns)
+        updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c != "id")
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            _copy(cursor, stage, columns, (to_row(r) for r in by_id.values()))
+            cursor.execute(
+                f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM {stage} "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}"
+            )
+            if collection == "orders":
+                cursor.execute(f"DELETE FROM order_items WHERE order_id IN (SELECT id FROM {stage})")
+                _copy(cursor, "order_items", ORDER_ITEM_COLUMNS, (
+                    (order_id, line_no, _text(item.get('sku')), _text(item.get('title')),
+                     _integer(item.get('quantity')), _number(item.get('item_price')))
+                    for order_id, order in by_id.items()
+                    for line_no, item in enumerate(order.get('items') or [])
+                ))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        elapsed = time.time() - started
+        print(f"    [Postgres] {len(by_id)} {collection} records -> {table} in {elapsed:.2f}s "
+              f"({len(by_id) / elapsed if elapsed else 0:,.0f} rows/s)")
+        return len(by_id)
+
+    def close(self):
+        self.conn.close()
+
+
+def partition_queries(db, collection, readers):
+    """
+    Splits the top-level `collection` into up to `readers` document-ID ranges.
+    Firestore only offers partition queries on collection groups, which would
+    also read same-named subcollections, so the group's split points are used
+    as bounds on the top-level collection and any that fall elsewhere are dropped.
+    """
+    splits = [
+        partition.end_at.id
+        for partition in db.collection_group(collection).get_partitions(readers)
+        if partition.end_at is not None and partition.end_at.parent.parent is None
+    ]
+    base = db.collection(collection).order_by("__name__")
+    queries = []
+    for start, end in zip([None] + splits, splits + [None]):
+        query = base
+        if start is not None:
+            query = query.start_at({"__name__": start})
+        if end is not None:
+            query = query.end_before({"__name__": end})
+        queries.append(query)
+    return queries
+
+
+def backfill_collection(db, dsn, collection, readers=8, batch_size=2000):
+    """
+    Copies one top-level Firestore collection into Postgres. The collection is
+    split into up to `readers` partitions (see partition_queries); each
+    partition is streamed by its own thread and written through its own
+    PostgresSink.
+    """
+    started = time.time()
+    partitions = partition_queries(db, collection, readers)
+    print(f"  [Backfill] {collection}: {len(partitions)} partitions")
+
+    def load_partition(query):
+        sink = PostgresSink(dsn)
+        total = 0
+        batch = []
+        try:
+            for snapshot in query.stream():
+                item = snapshot.to_dict()
+                item.setdefault('id', snapshot.id)
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    total += sink.write(collection, batch)
+                    batch = []
+            if batch:
+                total += sink.write(collection, batch)
+        finally:
+            sink.close()
+        return total
+
+    with ThreadPoolExecutor(max_workers=max(1, len(partitions))) as pool:
+        total = sum(pool.map(load_partition, partitions))
+
+    elapsed = time.time() - started
+    print(f"  [Backfill] {collection}: {total} records in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:,.0f} records/s)")
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+    load_dotenv(".env.local")
+
+    import firebase_admin
+    from firebase_admin import firestore
+
+    parser = argparse.ArgumentParser(description="Backfill Firestore collections into Postgres.")
+    parser.add_argument("--dsn", default=os.environ.get("POSTGRES_SINK_URL"), help="Defaults to POSTGRES_SINK_URL")
+    parser.add_argument("--collections", default=",".join(MIRROR_TABLES))
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or POSTGRES_SINK_URL is required")
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app()
+    client = firestore.client()
+    for name in args.collections.split(","):
+        backfill_collection(client, args.dsn, name.strip(), args.readers, args.batch_size)
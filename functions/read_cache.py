@@ -0,0 +1,128 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReadCache:
+    """
+    Per-instance LRU cache with TTL for API read responses.
+
+    Entries are dropped wholesale when the sync generation changes. The
+    generation is fetched through `generation_loader` at most once every
+    `generation_check_interval` seconds, so a warm instance costs one tiny
+    document read per interval instead of one collection scan per request.
+    get_or_load() re-checks it after a miss and does not store a result
+    whose load overlapped a generation bump.
+
+    The LRU is bounded by entry count and by the in-memory size of the
+    cached values (`max_bytes`; strings and bytes inside tuples are counted),
+    since one entry can be a whole serialized collection. Values larger
+    than `max_bytes` are returned but never stored.
+    """
+
+    def __init__(self, generation_loader, max_entries=64, max_bytes=64 * 1024 * 1024, ttl_seconds=300,
+                 generation_check_interval=5):
+        self.generation_loader = generation_loader
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.generation_check_interval = generation_check_interval
+
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = None
+        self._generation_checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _size(value):
+        if isinstance(value, (tuple, list)):
+            return sys.getsizeof(value) + sum(map(ReadCache._size, value))
+        return sys.getsizeof(value)
+
+    def _check_generation(self, force=False):
+        now = time.time()
+        if not force and now - self._generation_checked_at < self.generation_check_interval:
+            return
+        self._generation_checked_at = now
+        try:
+            generation = self.generation_loader()
+        except Exception as e:
+            # Serve possibly-stale entries (still bounded by TTL) rather than fail reads.
+            print(f"ReadCache: failed to load sync generation: {e}")
+            return
+        if generation != self._generation:
+            with self._lock:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._generation = generation
+
+    def get(self, key):
+        self._check_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                    self._bytes -= entry[2]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        size = self._size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (time.time() + self.ttl_seconds, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is None:
+            generation = self._generation
+            value = loader()
+            # A sync may have written while we read: only cache loads that ended in the same generation
+            self._check_generation(force=True)
+            if self._generation == generation:
+                self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,412 @@
+"""
+Column-wise parsing of SP-API flat-file (TSV) reports.
+
+Each report type has a schema: the columns the sync reads, their type and
+the value used when a cell is empty, malformed or the column is missing.
+parse_report() returns one NumPy array per schema column instead of one
+dict per row:
+
+    str    object array ("" stays "", a missing column is filled with the default)
+    int    int64 array
+    float  float64 array
+
+Numeric cells that are empty get the column default; cells that do not
+parse as numbers also get the default and are counted per column in
+ParsedReport.bad_values. Rows with the wrong number of fields are skipped
+and counted in ParsedReport.skipped_rows.
+
+pyarrow.csv does the splitting and typing in C++ when it is installed;
+otherwise a csv.reader fallback produces the same arrays. Amazon flat
+files are unquoted, so quote characters are kept as data by both paths
+(a product name like `12" ruler` does not swallow the following columns).
+"""
+import csv
+import io
+import math
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:  # pragma: no cover - pure-Python fallback
+    pa = pc = pacsv = None
+
+from pipeline import Pipeline, Stage
+from sync_records import OrderLine, OrderRecord
+
+INT_PATTERN = r"^\s*[+-]?\d+\s*$"
+FLOAT_PATTERN = r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$"
+_NUMBER_RE = {"int": re.compile(INT_PATTERN), "float": re.compile(FLOAT_PATTERN)}
+_NUMPY_TYPES = {"int": np.int64, "float": np.float64}
+
+# Backfills parse order documents in this many processes (<= 1 parses inline).
+# Each worker holds a decoded document, so the default stays at 2 for the 1GB sync worker.
+REPORT_PARSE_WORKERS = int(os.environ.get("REPORT_PARSE_WORKERS", str(min(os.cpu_count() or 1, 2))))
+# Reports created / polled / downloaded at once during a backfill
+REPORT_FETCH_WORKERS = int(os.environ.get("REPORT_FETCH_WORKERS", "2"))
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    kind: str = "str"
+    default: object = ""
+
+
+ORDERS_REPORT_SCHEMA = (
+    Column("amazon-order-id"),
+    Column("purchase-date", default=None),
+    Column("order-status", default="Unknown"),
+    Column("fulfillment-channel", default="Unknown"),
+    Column("sku", default=None),
+    Column("product-name", default=None),
+    Column("currency", default="USD"),
+    Column("quantity-shipped", "int", 0),
+    Column("item-price", "float", 0.0),
+)
+
+LISTINGS_REPORT_SCHEMA = (
+    Column("seller-sku"),
+    Column("price", "float", math.nan),
+)
+
+REPORT_SCHEMAS = {
+    "GET_FLAT_FILE_ALL_ORDERS_DATA_BY_ORDER_DATE_GENERAL": ORDERS_REPORT_SCHEMA,
+    "GET_FLAT_FILE_ALL_ORDERS_DATA_BY_LAST_UPDATE_GENERAL": ORDERS_REPORT_SCHEMA,
+    "GET_MERCHANT_LISTINGS_ALL_DATA": LISTINGS_REPORT_SCHEMA,
+}
+
+
+@dataclass
+class ParsedReport:
+    columns: dict
+    rows: int
+    bad_values: dict = field(default_factory=dict)
+    skipped_rows: int = 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def summary(self):
+        problems = {name: count for name, count in self.bad_values.items() if count}
+        text = f"{self.rows} rows"
+        if problems:
+            text += ", bad values " + ", ".join(f"{name}={count}" for name, count in problems.items())
+        if self.skipped_rows:
+            text += f", {self.skipped_rows} malformed rows skipped"
+        return text
+
+
+def _decode(content):
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        return content.decode('iso-8859-1')
+
+
+def _parse_arrow(content, schema):
+    skipped = [0]
+
+    def skip(row):
+        skipped[0] += 1
+        return 'skip'
+
+    try:
+        content.decode('utf-8')
+        encoding = 'utf8'
+    except UnicodeDecodeError:
+        encoding = 'latin1'
+    # Only the header is needed to know which schema columns exist
+    header = _decode(content.split(b"\n", 1)[0]).rstrip("\r").split("\t")
+    present = [c for c in schema if c.name in header]
+    table = pacsv.read_csv(
+        io.BytesIO(content),
+        read_options=pacsv.ReadOptions(encoding=encoding),
+        parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False, invalid_row_handler=skip),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=[c.name for c in present],
+            column_types={c.name: pa.string() for c in present},
+            strings_can_be_null=False,
+        ),
+    )
+
+    columns, bad_values = {}, {}
+    for column in schema:
+        if column.name not in header:
+            columns[column.name] = np.full(table.num_rows, column.default,
+                                           dtype=_NUMPY_TYPES.get(column.kind, object))
+            continue
+        values = table.column(column.name)
+        if column.kind == "str":
+            columns[column.name] = values.to_numpy(zero_copy_only=False)
+            continue
+        stripped = pc.utf8_trim_whitespace(values)
+        empty = pc.equal(stripped, "")
+        valid = pc.match_substring_regex(values, INT_PATTERN if column.kind == "int" else FLOAT_PATTERN)
+        bad_values[column.name] = int(pc.sum(pc.and_(pc.invert(valid), pc.invert(empty))).as_py() or 0)
+        numbers = pc.cast(pc.if_else(valid, stripped, None), pa.int64() if column.kind == "int" else pa.float64())
+        columns[column.name] = pc.fill_null(numbers, column.default).to_numpy(zero_copy_only=False)
+    return ParsedReport(columns, table.num_rows, bad_values, skipped[0])
+
+
+def _parse_python(content, schema):
+    reader = csv.reader(io.StringIO(_decode(content)), delimiter="\t", quoting=csv.QUOTE_NONE)
+    header = next(reader, [])
+    index = {name: i for i, name in enumerate(header)}
+    values = {c.name: [] for c in schema if c.name in index}
+    positions = [(index[name], cells) for name, cells in values.items()]
+    rows = skipped = 0
+    for row in reader:
+        if len(row) != len(header):
+            if row:
+                skipped += 1
+            continue
+        rows += 1
+        for i, cells in positions:
+            cells.append(row[i])
+
+    columns, bad_values = {}, {}
+    for column in schema:
+        cells = values.get(column.name)
+        dtype = _NUMPY_TYPES.get(column.kind, object)
+        if cells is None:
+            columns[column.name] = np.full(rows, column.default, dtype=dtype)
+            continue
+        if column.kind == "str":
+            columns[column.name] = np.array(cells, dtype=object)
+            continue
+        pattern, convert, bad = _NUMBER_RE[column.kind], _NUMPY_TYPES[column.kind], 0
+        parsed = []
+        for cell in cells:
+            if pattern.match(cell):
+                parsed.append(int(cell) if column.kind == "int" else float(cell))
+            else:
+                bad += bool(cell.strip())
+                parsed.append(column.default)
+        columns[column.name] = np.array(parsed, dtype=convert)
+        bad_values[column.name] = bad
+    return ParsedReport(columns, rows, bad_values, skipped)
+
+
+def parse_report(content, schema, engine=None):
+    """
+    Parses report bytes into typed column arrays. `schema` is a report type
+    (see REPORT_SCHEMAS) or a sequence of Columns; `engine` forces "arrow"
+    or "python" (default: arrow when available).
+    """
+    if isinstance(schema, str):
+        schema = REPORT_SCHEMAS[schema]
+    engine = engine or ("arrow" if pacsv is not None else "python")
+    if not content.strip():
+        return ParsedReport({c.name: np.empty(0, dtype=_NUMPY_TYPES.get(c.kind, object)) for c in schema}, 0)
+    if engine == "arrow":
+        return _parse_arrow(content, schema)
+    return _parse_python(content, schema)
+
+
+def _interned(values):
+    """List whose equal strings share one interned object."""
+    unique = {value: sys.intern(value) for value in set(values) if value}
+    return [unique.get(value, value) for value in values]
+
+
+def order_report_columns(content, engine=None):
+    """
+    Order report bytes -> plain column lists grouped by order (first-seen
+    order): per order id / purchase_date / order_status / currency /
+    fulfillment_channel / order_total / line_count, per line sku / title /
+    quantity / item_price, lines of one order contiguous. Plain lists pickle
+    cheaply, so this is what report workers send back.
+    """
+    report = parse_report(content, ORDERS_REPORT_SCHEMA, engine)
+    if any(report.bad_values.values()) or report.skipped_rows:
+        print(f"      [Reports] Orders report: {report.summary()}")
+
+    ids = report["amazon-order-id"].tolist()
+    order_of_row = {}
+    codes = [order_of_row.setdefault(order_id, len(order_of_row)) for order_id in ids]
+    codes = np.array(codes, dtype=np.int64)
+    keep = report["amazon-order-id"] != ""
+    rows = np.flatnonzero(keep)[np.argsort(codes[keep], kind="stable")]
+    first = np.flatnonzero(keep)[np.unique(codes[keep], return_index=True)[1]]
+    prices = report["item-price"]
+    return {
+        "id": report["amazon-order-id"][first].tolist(),
+        "purchase_date": report["purchase-date"][first].tolist(),
+        "order_status": report["order-status"][first].tolist(),
+        "currency": report["currency"][first].tolist(),
+        "fulfillment_channel": ["FBA" if fba else "FBM" for fba in (report["fulfillment-channel"][first] == "AFN").tolist()],
+        "order_total": np.bincount(codes[keep], weights=prices[keep])[codes[first]].tolist(),
+        "line_count": np.bincount(codes[keep])[codes[first]].tolist(),
+        "sku": report["sku"][rows].tolist(),
+        "title": report["product-name"][rows].tolist(),
+        "quantity": report["quantity-shipped"][rows].tolist(),
+        "item_price": prices[rows].tolist(),
+    }
+
+
+def orders_from_columns(columns, account_id, marketplace_code):
+    """order_report_columns() output -> [OrderRecord], strings interned."""
+    lines = list(map(OrderLine, _interned(columns["sku"]), _interned(columns["title"]),
+                     columns["quantity"], columns["item_price"]))
+    updated_at = datetime.utcnow().isoformat()
+    orders, start = [], 0
+    for order_id, purchase_date, status, currency, channel, total, count in zip(
+        columns["id"], columns["purchase_date"], _interned(columns["order_status"]),
+        _interned(columns["currency"]), _interned(columns["fulfillment_channel"]),
+        columns["order_total"], columns["line_count"]
+    ):
+        orders.append(OrderRecord(
+            id=order_id,
+            amazon_order_id=order_id,
+            account_id=account_id,
+            marketplace_code=marketplace_code,
+            purchase_date=purchase_date,
+            order_status=status,
+            order_total=total,
+            currency=currency,
+            items=lines[start:start + count],
+            fulfillment_channel=channel,
+            updated_at=updated_at
+        ))
+        start += count
+    return orders
+
+
+def parse_orders_report(content, account_id, marketplace_code, engine=None):
+    """
+    Order report bytes -> [OrderRecord], one per amazon-order-id in first-seen
+    order (report rows are per line item; order_total sums the line prices).
+    """
+    return orders_from_columns(order_report_columns(content, engine), account_id, marketplace_code)
+
+
+def parse_listing_prices(content, engine=None):
+    """Listings report bytes -> {seller-sku: price} for rows with a numeric price."""
+    report = parse_report(content, LISTINGS_REPORT_SCHEMA, engine)
+    if any(report.bad_values.values()) or report.skipped_rows:
+        print(f"    [Reports] Listings report: {report.summary()}")
+    skus, prices = report["seller-sku"], report["price"]
+    keep = ~np.isnan(prices) & (skus != "")
+    return dict(zip(skus[keep].tolist(), prices[keep].tolist()))
+
+
+class OrderReportPool:
+    """
+    Parses order report documents in worker processes. parse() blocks until
+    its document is parsed, so several threads (the parse stage of
+    stream_order_reports) keep every worker busy while the sync creates,
+    polls and downloads the next documents. Workers return
+    order_report_columns() lists, which are far cheaper to send back than
+    records. With workers <= 1 documents are parsed inline.
+
+    Workers come from a forkserver started with only this module preloaded:
+    by the time a backfill runs, fetch threads, gRPC channels and pyarrow's
+    thread pool exist, and forking that process directly can deadlock the
+    children. Workers import the entry script as __mp_main__, so scripts
+    that start a sync must keep it under `if __name__ == "__main__"`.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = REPORT_PARSE_WORKERS if workers is None else workers
+        self._pool = None
+        if self.workers > 1:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["report_parser"])
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def parse(self, content):
+        if self._pool is None:
+            return order_report_columns(content)
+        return self._pool.submit(order_report_columns, content).result()
+
+
+def stream_order_reports(chunks, download, account_id, marketplace_code, write=None,
+                         parse_workers=None, fetch_workers=None):
+    """
+    Runs a backfill as a fetch -> parse -> merge (-> write) pipeline:
+
+        fetch   download(chunk) -> document bytes or None, `fetch_workers` threads
+        parse   OrderReportPool.parse, one thread per parse worker
+        merge   builds the records and merges them by order ID in chunk order
+                (later chunks win, first-seen position), whatever order the
+                documents finish parsing in
+        write   write(orders) per chunk, in chunk order, if given
+
+    Queues between stages are bounded, so at most a few documents are held
+    at once however many chunks there are. Returns (orders, sorted indices
+    of the chunks that failed to download or parse).
+    """
+    chunks = list(chunks)
+    parse_workers = min(REPORT_PARSE_WORKERS if parse_workers is None else parse_workers, len(chunks) or 1)
+    fetch_workers = min(REPORT_FETCH_WORKERS if fetch_workers is None else fetch_workers, len(chunks) or 1)
+    merged, pending, failed = {}, {}, []
+    next_index = [0]
+
+    def fetch(job):
+        index, chunk = job
+        yield index, download(chunk)
+
+    def parse(job):
+        index, content = job
+        columns = None
+        if content is None:
+            failed.append(index)
+        else:
+            try:
+                columns = pool.parse(content)
+            except Exception as e:
+                print(f"      [Reports] Parsing a report document failed: {e}")
+                failed.append(index)
+        yield index, columns
+
+    def merge(job):
+        pending[job[0]] = job[1]
+        while next_index[0] in pending:
+            columns = pending.pop(next_index[0])
+            next_index[0] += 1
+            if columns is None:
+                continue
+            orders = orders_from_columns(columns, account_id, marketplace_code)
+            for order in orders:
+                # Re-inserting keeps the first-seen position, the value is the latest report's
+                merged[order.id] = order
+            if write is not None and orders:
+                yield orders
+
+    def store(orders):
+        write(orders)
+        return ()
+
+    with OrderReportPool(workers=parse_workers) as pool:
+        stages = [
+            Stage("fetch", fetch, workers=fetch_workers),
+            Stage("parse", parse, workers=max(parse_workers, 1)),
+            Stage("merge", merge),
+        ]
+        if write is not None:
+            stages.append(Stage("write", store))
+        pipeline = Pipeline(f"orders {marketplace_code}", stages, queue_size=max(parse_workers, 2))
+        pipeline.run(enumerate(chunks))
+    pipeline.report()
+    return list(merged.values()), sorted(failed)
@@ -0,0 +1,99 @@
+"""
+Batch restock planner.
+
+Joins, for the whole catalog at once:
+  - inventory stock_level and forecast_daily_units (see forecasting.py)
+  - inbound units per SKU: quantity_shipped - quantity_received over every
+    open inbound shipment (INBOUND_STATUSES)
+
+and writes onto each inventory document:
+  inbound_units     units on the way to FBA
+  restock_by_date   last day to place a supplier order before cover drops
+                    below lead time + safety stock
+  restock_units     units to order on that date to reach the target cover
+
+Shipment lines are matched to SKUs with the same sorted-key join as the
+forecast, and summed with np.bincount; there are no per-SKU lookups.
+"""
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from forecasting import inventory_keys, join_codes, sku_key
+
+# Shipments whose units are not (fully) in fulfillable stock yet.
+# WORKING shipments are counted too: their units are already committed.
+INBOUND_STATUSES = ("WORKING", "SHIPPED", "IN_TRANSIT", "DELIVERED", "CHECKED_IN", "RECEIVING")
+
+LEAD_TIME_DAYS = int(os.environ.get("RESTOCK_LEAD_TIME_DAYS", "45"))
+SAFETY_STOCK_DAYS = int(os.environ.get("RESTOCK_SAFETY_STOCK_DAYS", "14"))
+TARGET_COVER_DAYS = int(os.environ.get("RESTOCK_TARGET_COVER_DAYS", "60"))
+
+
+def inbound_line_arrays(shipments):
+    """(keys, units in flight) for every line of every open inbound shipment."""
+    keys, units = [], []
+    for shipment in shipments:
+        if shipment.get('status') not in INBOUND_STATUSES:
+            continue
+        account_id, marketplace_code = shipment.get('accountId'), shipment.get('marketplaceId')
+        for item in shipment.get('shipment_items') or []:
+            if not item.get('sku'):
+                continue
+            keys.append(sku_key(account_id, marketplace_code, item['sku']))
+            units.append(max(int(item.get('quantity_shipped') or 0) - int(item.get('quantity_received') or 0), 0))
+    return np.array(keys, dtype=object), np.array(units, dtype=np.float64)
+
+
+def plan_restock(stock, inbound, daily_units, today, lead_time=LEAD_TIME_DAYS, safety=SAFETY_STOCK_DAYS,
+                 target_cover=TARGET_COVER_DAYS):
+    """
+    Vectorized (s, S) policy. Reorder point = demand over lead time + safety
+    stock; order up to reorder point + target cover. Returns
+    (restock_units, restock_by_date, has_demand) arrays.
+    """
+    available = stock + inbound
+    has_demand = daily_units > 0
+    reorder_point = daily_units * (lead_time + safety)
+    order_up_to = reorder_point + daily_units * target_cover
+
+    days_until = np.divide(available - reorder_point, daily_units, out=np.zeros(len(stock)), where=has_demand)
+    due_now = days_until <= 0
+    # Ordering now tops up from current availability; later orders start from the reorder point
+    units = np.where(due_now, order_up_to - available, order_up_to - reorder_point)
+    units = np.where(has_demand, np.ceil(np.maximum(units, 0)), 0).astype(np.int64)
+    by_date = np.datetime64(today, 'D') + np.where(due_now, 0, np.floor(days_until)).astype('timedelta64[D]')
+    return units, by_date, has_demand
+
+
+def plan_inventory_restock(inventory, shipments, today=None):
+    """
+    Writes inbound_units / restock_units / restock_by_date onto each inventory
+    document in place. Expects forecast_daily_units from forecast_inventory.
+    Returns the number of SKUs that need an order within SAFETY_STOCK_DAYS.
+    """
+    started = time.time()
+    today = today or datetime.utcnow().date()
+    if not inventory:
+        return 0
+
+    line_keys, line_units = inbound_line_arrays(shipments)
+    codes = join_codes(inventory_keys(inventory), line_keys)
+    known = codes >= 0
+    inbound = np.bincount(codes[known], weights=line_units[known], minlength=len(inventory))
+
+    stock = np.array([float(i.get('stock_level') or 0) for i in inventory])
+    daily_units = np.array([float(i.get('forecast_daily_units') or 0) for i in inventory])
+    units, by_date, has_demand = plan_restock(stock, inbound, daily_units, today)
+
+    for i, item in enumerate(inventory):
+        item["inbound_units"] = int(inbound[i])
+        item["restock_units"] = int(units[i])
+        item["restock_by_date"] = str(by_date[i]) if has_demand[i] else None
+
+    urgent = int((has_demand & (by_date <= np.datetime64(today, 'D') + SAFETY_STOCK_DAYS)).sum())
+    print(f"    [Restock] {int(inbound.sum())} units inbound across {int((inbound > 0).sum())} SKUs; "
+          f"{urgent} SKUs to reorder within {SAFETY_STOCK_DAYS} days ({time.time() - started:.2f}s)")
+    return urgent
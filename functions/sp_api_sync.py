@@ -1,10 +1,11 @@
 import os
+import sys
 import time
 import requests
 import json
 import gzip
-import io
 import random
+import threading
 import hmac
 import hashlib
 import urllib.parse
@@ -14,8 +15,32 @@ from datetime import datetime, timedelta
 LWA_ENDPOINT = "https://api.amazon.com/auth/o2/token"
 SP_API_ENDPOINT = "https://sellingpartnerapi-na.amazon.com"
 
+# Incremental syncs re-read this much before their watermark, for clock skew
+WATERMARK_OVERLAP = timedelta(minutes=10)
+# Inventory: full reconciliation pass cadence; incremental runs in between
+INVENTORY_FULL_SYNC_HOURS = float(os.environ.get("INVENTORY_FULL_SYNC_HOURS", "24"))
+# Inbound shipments in these states no longer change once their items are stored
+TERMINAL_SHIPMENT_STATUSES = ("CLOSED", "CANCELLED", "DELETED")
+# Orders: incremental runs read the last-update report; the lifetime order-date
+# re-pull runs only every ORDERS_FULL_SYNC_DAYS as a consistency check
+ORDERS_BY_ORDER_DATE_REPORT = "GET_FLAT_FILE_ALL_ORDERS_DATA_BY_ORDER_DATE_GENERAL"
+ORDERS_BY_LAST_UPDATE_REPORT = "GET_FLAT_FILE_ALL_ORDERS_DATA_BY_LAST_UPDATE_GENERAL"
+ORDERS_FULL_SYNC_DAYS = float(os.environ.get("ORDERS_FULL_SYNC_DAYS", "30"))
+# Order report chunks are started only within this many seconds of a sync; the
+# lifetime re-pull resumes from its checkpoint on the next run
+ORDERS_FETCH_BUDGET_SECONDS = float(os.environ.get("ORDERS_FETCH_BUDGET_SECONDS", "240"))
+# save_json commits this many 400-document batches at once
+FIRESTORE_WRITERS = int(os.environ.get("FIRESTORE_WRITERS", "4"))
+
 import firebase_admin
 from firebase_admin import firestore
+from sync_jobs import bump_sync_generation, get_sync_watermark, set_sync_watermark
+from sync_sinks import publish_changes
+from sync_records import InventoryRecord, OrderRecord, as_dict
+from inventory_history import compact_inventory_history, record_inventory_changes, stock_state
+from fee_estimates import FeeEstimator, apply_fee_estimates, carry_fee_estimates
+from pipeline import Pipeline, Stage
+from report_parser import parse_listing_prices, parse_orders_report, stream_order_reports
 
 # Firestore Client
 # Firestore Client
@@ -31,40 +56,37 @@ def save_json(filename, data):
     """
     Saves data to Firestore.
     filename: Use 'inventory.json' -> collection 'inventory'
+    Batches of 400 are prepared and committed by FIRESTORE_WRITERS threads
+    at once (commits are independent: every document is merged by ID).
     """
     collection_name = filename.replace('.json', '')
     print(f"    Syncing {len(data)} records to Firestore collection '{collection_name}'...")
-    
-    batch = get_db().batch()
-    batch_count = 0
-    total_count = 0
-    
-    for item in data:
+    collection = get_db().collection(collection_name)
+
+    def prepare(chunk):
         # Use 'id' as document ID if available, otherwise auto-id
-        doc_id = str(item.get('id')) if item.get('id') else None
-        
-        if doc_id:
-            doc_ref = get_db().collection(collection_name).document(doc_id)
+        yield [(str(item['id']) if item.get('id') else None, item) for item in map(as_dict, chunk)]
+
+    def commit(docs):
+        batch = get_db().batch()
+        for doc_id, item in docs:
+            doc_ref = collection.document(doc_id) if doc_id else collection.document()
             batch.set(doc_ref, item, merge=True) # Merge allows updating fields without wiping
-        else:
-            doc_ref = get_db().collection(collection_name).document()
-            batch.set(doc_ref, item, merge=True)
-            
-        batch_count += 1
-        
-        # Firestore batch limit is 500
-        if batch_count >= 400:
-            batch.commit()
-            total_count += batch_count
-            batch_count = 0
-            batch = get_db().batch()
-            # print(f"      Committed batch of 400...")
-
-    if batch_count > 0:
         batch.commit()
-        total_count += batch_count
-    
+        yield len(docs)
+
+    # Firestore batch limit is 500
+    chunks = (data[i:i + 400] for i in range(0, len(data), 400))
+    pipeline = Pipeline(collection_name, [
+        Stage("prepare", prepare),
+        Stage("commit", commit, workers=FIRESTORE_WRITERS),
+    ])
+    total_count = sum(pipeline.run(chunks))
+    if total_count > 400:
+        pipeline.report()
+
     print(f"    Successfully synced {total_count} documents to {collection_name}.")
+    bump_sync_generation(get_db(), collection_name)
 
 def load_json(filename):
     """
@@ -83,6 +105,69 @@ def load_json(filename):
         data.append(item)
     return data
 
+def fingerprint_records(data):
+    """Maps record ID -> content hash (ignoring updated_at) for change detection."""
+    fingerprints = {}
+    for item in map(as_dict, data):
+        if not item.get('id'):
+            continue
+        content = {k: v for k, v in item.items() if k != 'updated_at'}
+        fingerprints[str(item['id'])] = hashlib.md5(
+            json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+        ).digest()
+    return fingerprints
+
+def changed_record_ids(baseline, data):
+    """IDs of records in `data` that are new or differ from the `baseline` fingerprints."""
+    current = fingerprint_records(data)
+    return sorted(doc_id for doc_id, digest in current.items() if baseline.get(doc_id) != digest)
+
+# SKU-indexed copy of order line items (see firestore.indexes.json)
+ORDER_LINES_COLLECTION = "order_items"
+
+def order_line_records(order):
+    """
+    One record per SKU in an order, keyed {order_id}_{sku} so re-syncs
+    overwrite rather than duplicate. Lines for the same SKU are summed.
+    """
+    lines = {}
+    for item in order.get('items') or []:
+        sku = item.get('sku')
+        if not sku:
+            continue
+        safe_sku = sku.replace("/", "_").replace("\\", "_")
+        line = lines.setdefault(sku, {
+            "id": f"{order['id']}_{safe_sku}",
+            "sku": sku,
+            "order_id": order['id'],
+            "purchase_date": order.get('purchase_date'),
+            "order_status": order.get('order_status'),
+            "quantity": 0,
+            "item_price": 0.0,
+            "currency": order.get('currency'),
+            "title": item.get('title'),
+            "accountId": order.get('accountId'),
+            "marketplaceId": order.get('marketplaceId'),
+            "updated_at": order.get('updated_at')
+        })
+        line["quantity"] += int(float(item.get('quantity') or 0))
+        line["item_price"] = round(line["item_price"] + float(item.get('item_price') or 0), 2)
+    return list(lines.values())
+
+def save_order_lines(orders, changed_ids):
+    """
+    Writes line records for the changed orders. The first run (empty
+    collection) writes every order, which backfills the index.
+    """
+    if get_db().collection(ORDER_LINES_COLLECTION).limit(1).get():
+        changed_ids = set(changed_ids)
+        orders = [o for o in orders if str(o.get('id')) in changed_ids]
+    else:
+        print(f"    {ORDER_LINES_COLLECTION} is empty; indexing all {len(orders)} orders.")
+    lines = [line for order in orders for line in order_line_records(order)]
+    if lines:
+        save_json(f"{ORDER_LINES_COLLECTION}.json", lines)
+
 # AWS Signature V4 Implementation
 def sign_request(method, url, access_token, data=None, params=None):
     region = os.environ.get("SP_API_REGION", "us-east-1")
@@ -176,12 +261,22 @@ def sign_request(method, url, access_token, data=None, params=None):
         'Content-Type': 'application/json'
     }
 
-def sync_amazon_data():
+def _report_phase(on_phase, phase):
+    """Notifies the progress callback (if any) that a sync phase has started."""
+    print(f"  [Phase] {phase}")
+    if on_phase:
+        on_phase(phase)
+
+def sync_amazon_data(on_phase=None):
     """
     Core logic to fetch data from Amazon SP-API.
     Saves to local JSON files.
+    on_phase: optional callback invoked with the name of each phase as it starts
+    (load, inventory, shipments, listings, orders, enrichment, save).
+    Returns {collection: [changed document IDs]} for this run.
     """
     print("Starting SP-API Sync Process (Local JSON Mode)...")
+    _report_phase(on_phase, "load")
     
     # Load existing data to append/merge
     existing_inventory = load_json("inventory.json")
@@ -190,6 +285,20 @@ def sync_amazon_data():
     existing_orders = [o for o in existing_orders if o.get('items') and len(o['items']) > 0]
     
     existing_shipments = load_json("shipments.json")
+
+    # Snapshot what we started from so the run can report which records changed
+    baseline = {
+        "inventory": fingerprint_records(existing_inventory),
+        "orders": fingerprint_records(existing_orders),
+        "shipments": fingerprint_records(existing_shipments)
+    }
+
+    # Stock levels as loaded, for the inventory history deltas
+    stock_before = stock_state(existing_inventory)
+
+    # Hold inventory and orders as compact records until the save phase
+    existing_inventory = [InventoryRecord.from_dict(item) for item in existing_inventory]
+    existing_orders = [OrderRecord.from_dict(order) for order in existing_orders]
     
     # 0. Process Hidden Default Account from Env Vars
     # 0. Process Hidden Default Account from Env Vars (injected via Secrets)
@@ -217,34 +326,27 @@ def sync_amazon_data():
                 mp_id = marketplace_id_map.get(mp)
                 hidden_account_id = "default_account_1"
                 
+                _report_phase(on_phase, "inventory")
                 try:
-                    new_inv = sync_inventory_from_api(access_token, hidden_account_id, mp_id, mp)
-                    # Simple merge: replace by ID
-                    inv_map = {item['id']: item for item in existing_inventory}
-                    for item in new_inv:
-                        inv_map[item['id']] = item
-                    
-                    # Convert map back to list
-                    existing_inventory = list(inv_map.values())
-                    
-                    # SAVE INTERMEDIATE: To ensure data is pushed even if later steps fail
-                    save_json("inventory.json", existing_inventory)
+                    # Saves the merged inventory itself, before advancing its watermark
+                    existing_inventory = sync_inventory_incremental(
+                        access_token, hidden_account_id, mp_id, mp, existing_inventory
+                    )
                 except Exception as e:
                     print(f"    Inventory Sync Failed: {e}")
                 
                 # Save immediately removed here as we saved above
 
+                _report_phase(on_phase, "shipments")
                 try:
-                    new_shipments = sync_shipments_from_api(access_token, hidden_account_id, mp_id, mp)
-                    # Simple merge
-                    shp_map = {item['id']: item for item in existing_shipments}
-                    for item in new_shipments:
-                        shp_map[item['id']] = item
-                    existing_shipments = list(shp_map.values())
+                    existing_shipments = sync_shipments_incremental(
+                        access_token, hidden_account_id, mp_id, mp, existing_shipments
+                    )
                 except Exception as e:
                     print(f"    Shipments Sync Failed: {e}")
 
                 # --- NEW: Sync Set Prices via Listings Report (inc. OOS) ---
+                _report_phase(on_phase, "listings")
                 try:
                     listing_prices = sync_all_listings_report(access_token, hidden_account_id, mp_id, mp)
                     
@@ -252,18 +354,16 @@ def sync_amazon_data():
                     if listing_prices:
                         print(f"    Enriching inventory with {len(listing_prices)} listing prices...")
                         for item in existing_inventory:
-                            sku = item.get('sku')
+                            sku = item.sku
                             if sku in listing_prices:
                                 price_val = listing_prices[sku]
                                 if price_val > 0:
-                                    item['price'] = price_val
-                                    item['estimated_fees'] = round(price_val * 0.15, 2)
-                                    item['estimated_proceeds'] = round(price_val * 0.85, 2)
+                                    item.price = price_val
                         save_json("inventory.json", existing_inventory)
                 except Exception as e:
                     print(f"    Listings Report Sync Failed: {e}")
 
-
+                _report_phase(on_phase, "orders")
                 try:
                     client_creds = {
                         "client_id": env_client_id,
@@ -271,33 +371,29 @@ def sync_amazon_data():
                         "refresh_token": env_refresh_token
                     }
                     
-                    # USE REPORTS API FOR LIFETIME SYNC
-                    print("    >>> Switching to Reports API for Lifetime Order Sync...", flush=True)
-                    new_orders = sync_lifetime_orders_via_report(access_token, hidden_account_id, mp_id, mp, client_creds)
-
-                    ord_map = {item['id']: item for item in existing_orders}
-                    for item in new_orders:
-                        # Update or Add
-                        ord_map[item['id']] = item
-                    
-                    existing_orders = list(ord_map.values())
+                    # Reports API: last-update report since the watermark, lifetime re-pull on a cadence
+                    print("    >>> Switching to Reports API for Order Sync...", flush=True)
+                    existing_orders = sync_orders_incremental(
+                        access_token, hidden_account_id, mp_id, mp, existing_orders, client_creds
+                    )
                 except Exception as e:
                     print(f"    Orders Sync Failed: {e}")
 
                 # --- NEW: Calculate Last Sold Date & Fallback Price ---
                 # Build map of SKU -> {date, price}
+                _report_phase(on_phase, "enrichment")
                 print("    Calculating Last Sold Dates & Fallback Prices...")
                 sku_last_prop = {}
                 for order in existing_orders:
-                    p_date = order.get('purchase_date')
+                    p_date = order.purchase_date
                     if not p_date: continue
                     
-                    for item in order.get('items', []):
-                        sku = item.get('sku')
+                    for item in order.items:
+                        sku = item.sku
                         if not sku: continue
                         
-                        qty = float(item.get('quantity', 0))
-                        total_price = float(item.get('item_price', 0))
+                        qty = float(item.quantity or 0)
+                        total_price = float(item.item_price or 0)
                         unit_price = (total_price / qty) if qty > 0 else 0
                         
                         # Keep the most recent data
@@ -309,24 +405,24 @@ def sync_amazon_data():
                 
                 # Enrich Inventory with Last Sold Date & Price Fallback
                 for item in existing_inventory:
-                    sku = item.get('sku')
+                    sku = item.sku
                     last_data = sku_last_prop.get(sku)
                     
                     if last_data:
-                        item['last_sold_date'] = last_data['date']
+                        item.last_sold_date = last_data['date']
                         
                         # Fallback Price Logic: Use last sold price if current price is 0 (e.g. OOS)
-                        current_price = item.get('price', 0)
-                        if (current_price == 0 or current_price is None) and last_data['price'] > 0:
+                        current_price = item.price or 0
+                        if current_price == 0 and last_data['price'] > 0:
                             fallback_price = round(last_data['price'], 2)
-                            item['price'] = fallback_price
-                            
-                            # Estimate Fees
-                            fees_est = fallback_price * 0.15
-                            proceeds_est = fallback_price - fees_est
-                            
-                            item['estimated_fees'] = round(fees_est, 2)
-                            item['estimated_proceeds'] = round(proceeds_est, 2)
+                            item.price = fallback_price
+                
+                # Fees for priced inventory and not-yet-estimated orders, from the Fees API cache
+                try:
+                    estimator = FeeEstimator(get_db(), access_token, hidden_account_id, mp_id, mp)
+                    apply_fee_estimates(estimator, existing_inventory, existing_orders)
+                except Exception as e:
+                    print(f"    Fee estimation failed: {e}")
                 
                 # Save enriched inventory
                 save_json("inventory.json", existing_inventory)
@@ -339,15 +435,67 @@ def sync_amazon_data():
              print(f"Hidden Default Account Sync Failed: {e}")
 
     # Save final results (Full sync)
+    _report_phase(on_phase, "save")
+    # Storage boundary: everything below works on plain documents
+    existing_inventory = [item.to_dict() for item in existing_inventory]
+    existing_orders = [order.to_dict() for order in existing_orders]
+
+    try:
+        from forecasting import forecast_inventory
+        forecast_inventory(existing_inventory, existing_orders)
+        from restock import plan_inventory_restock
+        plan_inventory_restock(existing_inventory, existing_shipments)
+    except Exception as e:
+        print(f"    Forecasting / restock planning failed: {e}")
     # Note: We saved inventory incrementally. Saving again ensures all merges are captured.
     save_json("inventory.json", existing_inventory)
     save_json("orders.json", existing_orders)
     save_json("shipments.json", existing_shipments)
     print("Sync Complete. Data saved to Firestore.")
 
+    delta = {
+        "inventory": changed_record_ids(baseline["inventory"], existing_inventory),
+        "orders": changed_record_ids(baseline["orders"], existing_orders),
+        "shipments": changed_record_ids(baseline["shipments"], existing_shipments)
+    }
+    print(f"Changed records: " + ", ".join(f"{name}={len(ids)}" for name, ids in delta.items()))
+
+    try:
+        record_inventory_changes(get_db(), stock_before, existing_inventory)
+        compact_inventory_history(get_db())
+    except Exception as e:
+        print(f"    Inventory history update failed: {e}")
+
+    try:
+        save_order_lines(existing_orders, delta["orders"])
+    except Exception as e:
+        print(f"    Order line index update failed: {e}")
+
+    # Columnar order archive: rewrite only the months with changed orders
+    archive_root = os.environ.get("ORDER_ARCHIVE_ROOT")
+    if archive_root and delta["orders"]:
+        try:
+            from order_archive import write_order_archive
+            write_order_archive(archive_root, existing_orders, delta["orders"])
+        except Exception as e:
+            print(f"    Order archive update failed: {e}")
+
+    # Mirror this run's changes to any extra sinks (SYNC_SINKS, e.g. Postgres)
+    publish_changes({
+        "inventory": existing_inventory,
+        "orders": existing_orders,
+        "shipments": existing_shipments
+    }, delta)
+    return delta
 
-def sync_inventory_from_api(access_token, account_id, marketplace_id, marketplace_code):
-    print(f"    Fetching Inventory via API ({marketplace_code})...")
+
+def sync_inventory_from_api(access_token, account_id, marketplace_id, marketplace_code, start_date_time=None):
+    """
+    Fetches FBA inventory summaries; with `start_date_time`, only those changed
+    since then. Returns (records, complete), complete=False if paging stopped early.
+    """
+    mode = f"changed since {start_date_time}" if start_date_time else "full"
+    print(f"    Fetching Inventory via API ({marketplace_code}, {mode})...")
     
     url = f"{SP_API_ENDPOINT}/fba/inventory/v1/summaries"
     base_params = {
@@ -356,9 +504,12 @@ def sync_inventory_from_api(access_token, account_id, marketplace_id, marketplac
         "granularityId": marketplace_id,
         "marketplaceIds": marketplace_id
     }
+    if start_date_time:
+        base_params["startDateTime"] = start_date_time
     
     all_products = []
     next_token = None
+    complete = False
     
     while True:
         params = base_params.copy()
@@ -386,24 +537,21 @@ def sync_inventory_from_api(access_token, account_id, marketplace_id, marketplac
                 inv_details = item.get('inventoryDetails', {})
                 fulfillable = inv_details.get('fulfillableQuantity', 0)
                 
-                safe_sku = sku.replace("/", "_").replace("\\", "_")
-                doc_id = f"{account_id}_{marketplace_code}_{safe_sku}"
-
-                all_products.append({
-                    "id": doc_id,
-                    "sku": sku,
-                    "asin": asin,
-                    "title": title,
-                    "stock_level": fulfillable,
-                    "currency": "USD",
-                    "status": "Healthy" if fulfillable > 0 else "OutOfStock",
-                    "accountId": account_id,
-                    "marketplaceId": marketplace_code,
-                    "updated_at": datetime.utcnow().isoformat()
-                })
+                all_products.append(InventoryRecord(
+                    sku=sys.intern(sku),
+                    asin=asin,
+                    title=sys.intern(title) if title else title,
+                    stock_level=fulfillable,
+                    currency="USD",
+                    status="Healthy" if fulfillable > 0 else "OutOfStock",
+                    account_id=account_id,
+                    marketplace_code=marketplace_code,
+                    updated_at=datetime.utcnow().isoformat()
+                ))
             
             next_token = data.get('pagination', {}).get('nextToken')
             if not next_token:
+                complete = True
                 break
                 
             # Respect rate limits - brief pause between pages
@@ -414,7 +562,56 @@ def sync_inventory_from_api(access_token, account_id, marketplace_id, marketplac
             break
     
     print(f"    Fetched total {len(all_products)} inventory items")
-    return all_products
+    return all_products, complete
+
+def sync_inventory_incremental(access_token, account_id, marketplace_id, marketplace_code, existing_inventory):
+    """
+    Merges changed FBA summaries into the stored catalog, asking only for
+    summaries changed since the last successful inventory sync. Every
+    INVENTORY_FULL_SYNC_HOURS a full pass runs instead, which also zeroes
+    SKUs Amazon no longer reports. Returns the merged inventory list.
+    """
+    db = get_db()
+    stream = f"inventory_{account_id}_{marketplace_code}"
+    mark = get_sync_watermark(db, stream)
+    started = datetime.utcnow()
+
+    last_full = mark.get('last_full_at')
+    full = not last_full or started - datetime.fromisoformat(last_full) >= timedelta(hours=INVENTORY_FULL_SYNC_HOURS)
+    since = None
+    if not full and mark.get('last_sync_at'):
+        since = (datetime.fromisoformat(mark['last_sync_at']) - WATERMARK_OVERLAP).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    new_inv, complete = sync_inventory_from_api(access_token, account_id, marketplace_id, marketplace_code, since)
+
+    # Simple merge: replace by ID
+    inv_map = {item.id: item for item in existing_inventory}
+    for item in new_inv:
+        inv_map[item.id] = item
+
+    if since is None and complete:
+        # Reconciliation: stock of SKUs missing from a full pass is gone
+        seen = {item.id for item in new_inv}
+        zeroed = 0
+        for item_id, item in inv_map.items():
+            if (item_id not in seen and item.account_id == account_id and item.marketplace_code == marketplace_code
+                    and item.stock_level):
+                item.stock_level = 0
+                item.status = "OutOfStock"
+                zeroed += 1
+        if zeroed:
+            print(f"    Reconciliation: zeroed {zeroed} SKUs no longer reported by FBA.")
+
+    inventory = list(inv_map.values())
+    # SAVE INTERMEDIATE: To ensure data is pushed even if later steps fail
+    save_json("inventory.json", inventory)
+
+    if complete:
+        values = {"last_sync_at": started.isoformat()}
+        if since is None:
+            values["last_full_at"] = started.isoformat()
+        set_sync_watermark(db, stream, **values)
+    return inventory
 
 def sync_orders_from_api(access_token, account_id, marketplace_id, marketplace_code, client_creds=None):
     print(f"    Fetching Orders via API ({marketplace_code})...")
@@ -468,7 +665,6 @@ def sync_orders_from_api(access_token, account_id, marketplace_id, marketplace_c
                 total_info = order.get('OrderTotal', {})
                 total_amount = float(total_info.get('Amount', 0.0)) if total_info else 0.0
                 currency = total_info.get('CurrencyCode', 'USD')
-                estimated_fees = total_amount * 0.15 
                 
                 items = []
                 # Fetch items for EVERY order (Time Consuming but necessary for SKUs)
@@ -494,8 +690,6 @@ def sync_orders_from_api(access_token, account_id, marketplace_id, marketplace_c
                     "order_total": total_amount,
                     "currency": currency,
                     "items": items,
-                    "estimated_fees": estimated_fees,
-                    "estimated_proceeds": total_amount - estimated_fees,
                     "fulfillment_channel": order.get('FulfillmentChannel', 'Unknown'),
                     "updated_at": datetime.utcnow().isoformat()
                 })
@@ -517,64 +711,135 @@ def sync_orders_from_api(access_token, account_id, marketplace_id, marketplace_c
     print(f"    Fetched total {len(orders_to_save)} orders")
     return orders_to_save
 
-def sync_shipments_from_api(access_token, account_id, marketplace_id, marketplace_code):
-    print(f"    Fetching Shipments via API ({marketplace_code})...")
-    
+def fetch_shipment_pages(access_token, marketplace_id, last_updated_after):
+    """
+    ShipmentData for every inbound shipment updated since `last_updated_after`,
+    following NextToken. Returns (shipments_data, complete).
+    """
     url = f"{SP_API_ENDPOINT}/fba/inbound/v0/shipments"
-    last_updated_after = (datetime.utcnow() - timedelta(days=365)).isoformat()
-    last_updated_before = datetime.utcnow().isoformat()
-    
     params = {
         "QueryType": "DATE_RANGE",
         "LastUpdatedAfter": last_updated_after,
-        "LastUpdatedBefore": last_updated_before,
+        "LastUpdatedBefore": datetime.utcnow().isoformat(),
         "MarketplaceId": marketplace_id,
         "ShipmentStatusList": "WORKING,SHIPPED,RECEIVING,CANCELLED,DELETED,CLOSED,ERROR,IN_TRANSIT,DELIVERED,CHECKED_IN"
     }
     
-    headers = sign_request('GET', url, access_token, params=params)
-    
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code != 200:
-        print(f"    Warning: API Error {response.status_code}: {response.text}")
-        return []
+    shipments_data = []
+    while True:
+        headers = sign_request('GET', url, access_token, params=params)
         
-    shipments_data = response.json().get('payload', {}).get('ShipmentData', [])
+        response = requests.get(url, headers=headers, params=params)
+        if response.status_code != 200:
+            print(f"    Warning: API Error {response.status_code}: {response.text}")
+            return shipments_data, False
+            
+        payload = response.json().get('payload', {})
+        shipments_data.extend(payload.get('ShipmentData', []))
+        next_token = payload.get('NextToken')
+        if not next_token:
+            return shipments_data, True
+        params = {"QueryType": "NEXT_TOKEN", "NextToken": next_token, "MarketplaceId": marketplace_id}
+        time.sleep(0.5)
+
+def shipment_updates(access_token, account_id, marketplace_code, shipments_data, existing_by_id, updated_since_stored):
+    """
+    Shipment documents to save for `shipments_data`. Items are refetched for
+    new shipments, status changes, shipments without stored items and, when
+    `updated_since_stored` (the data came from a watermark query), every
+    shipment. Stored terminal shipments with their items are skipped.
+    """
     shipments_to_save = []
-    
     for shp in shipments_data:
-        shipments_to_save.append({
-            "id": shp.get('ShipmentId'),
+        shp_id = shp.get('ShipmentId')
+        stored = existing_by_id.get(shp_id)
+        status = shp.get('ShipmentStatus')
+        items_stored = bool(stored and stored.get('items_synced_at'))
+        if items_stored and stored.get('status') in TERMINAL_SHIPMENT_STATUSES:
+            continue
+        if items_stored and stored.get('status') == status and not updated_since_stored:
+            continue
+
+        record = {
+            "id": shp_id,
             "shipment_name": shp.get('ShipmentName'),
             "destination": shp.get('DestinationFulfillmentCenterId', 'Unknown'),
-            "status": shp.get('ShipmentStatus'),
-            "items": 0,
-            "date": shp.get('ShipmentId'),
-            "created_date": datetime.utcnow().strftime("%Y-%m-%d"),
+            "status": status,
+            "items": stored.get('items', 0) if stored else 0,
+            "date": shp_id,
+            "created_date": stored.get('created_date') if stored else datetime.utcnow().strftime("%Y-%m-%d"),
             "carrier": "Unknown",
             "tracking": "Pending",
             "accountId": account_id,
             "marketplaceId": marketplace_code,
             "updated_at": datetime.utcnow().isoformat()
-        })
+        }
+        if stored:
+            for field in ("shipment_items", "items_synced_at"):
+                if field in stored:
+                    record[field] = stored[field]
+        shipments_to_save.append(record)
         
-    print(f"    Fetched {len(shipments_to_save)} shipments")
+    print(f"    Fetched {len(shipments_data)} shipments, {len(shipments_to_save)} new or changed")
     
-    # 2. Fetch items for each shipment
-    print("    Fetching items for shipments...")
+    # 2. Fetch items for each new or changed shipment
+    print(f"    Fetching items for {len(shipments_to_save)} shipments...")
     for shp in shipments_to_save:
         shp_id = shp['id']
         try:
             items = fetch_shipment_items(access_token, shp_id)
+            if items is None:
+                shp.setdefault('shipment_items', [])
+                continue
             shp['shipment_items'] = items
             shp['items'] = sum(item['quantity_shipped'] for item in items) 
             # Note: 'items' field updated to be sum of quantity shipped
+            shp['items_synced_at'] = datetime.utcnow().isoformat()
         except Exception as e:
             print(f"      Failed to fetch items for shipment {shp_id}: {e}")
-            shp['shipment_items'] = []
+            shp.setdefault('shipment_items', [])
             
     return shipments_to_save
 
+def sync_shipments_from_api(access_token, account_id, marketplace_id, marketplace_code):
+    """Every shipment updated in the past 365 days, with items (no stored state)."""
+    print(f"    Fetching Shipments via API ({marketplace_code})...")
+    last_updated_after = (datetime.utcnow() - timedelta(days=365)).isoformat()
+    shipments_data, _ = fetch_shipment_pages(access_token, marketplace_id, last_updated_after)
+    return shipment_updates(access_token, account_id, marketplace_code, shipments_data, {}, True)
+
+def sync_shipments_incremental(access_token, account_id, marketplace_id, marketplace_code, existing_shipments):
+    """
+    Fetches shipments updated since the stored LastUpdatedAfter watermark (the
+    past 365 days on the first run), merges the new or changed ones into
+    `existing_shipments`, saves them and advances the watermark. Returns the
+    merged shipment list.
+    """
+    db = get_db()
+    stream = f"shipments_{account_id}_{marketplace_code}"
+    mark = get_sync_watermark(db, stream)
+    started = datetime.utcnow()
+
+    if mark.get('last_updated_after'):
+        since = (datetime.fromisoformat(mark['last_updated_after']) - WATERMARK_OVERLAP).isoformat()
+    else:
+        since = (started - timedelta(days=365)).isoformat()
+    print(f"    Fetching Shipments via API ({marketplace_code}, updated since {since})...")
+    shipments_data, complete = fetch_shipment_pages(access_token, marketplace_id, since)
+
+    existing_by_id = {item['id']: item for item in existing_shipments}
+    changed = shipment_updates(
+        access_token, account_id, marketplace_code, shipments_data, existing_by_id, bool(mark.get('last_updated_after'))
+    )
+    # Simple merge
+    for item in changed:
+        existing_by_id[item['id']] = item
+    if changed:
+        save_json("shipments.json", changed)
+    if complete:
+        set_sync_watermark(db, stream, last_updated_after=started.isoformat())
+    return list(existing_by_id.values())
+
 def sync_pricing_from_api(access_token, marketplace_id, asins):
     """
     Fetches pricing for a list of ASINs using batch calls (max 20 per call).
@@ -641,7 +906,7 @@ def sync_pricing_from_api(access_token, marketplace_id, asins):
 
 def fetch_shipment_items(access_token, shipment_id):
     """
-    Fetches items for a specific inbound shipment.
+    Fetches items for a specific inbound shipment (None if the request failed).
     """
     # url = f"{SP_API_ENDPOINT}/fba/inbound/v0/shipments/{shipment_id}/items" # v0 is deprecated but often still works. v0 items might be cleaner.
     # Let's check documentation or assume v0 items endpoint.
@@ -670,10 +935,10 @@ def fetch_shipment_items(access_token, shipment_id):
             return items
         else:
             print(f"      Error fetching items for {shipment_id}: {response.status_code} {response.text}")
-            return []
+            return None
     except Exception as e:
         print(f"      Exception fetching items for {shipment_id}: {e}")
-        return []
+        return None
 
 def fetch_order_items(access_token, amazon_order_id, client_creds=None):
     url = f"{SP_API_ENDPOINT}/orders/v0/orders/{amazon_order_id}/orderItems"
@@ -751,76 +1016,195 @@ def sync_lifetime_orders_via_report(access_token, account_id, marketplace_id, ma
     Strategy: Loop from 2015 to Present in 30-day chunks.
     """
     print(f"    [Reports] Starting Lifetime Order Sync for {marketplace_code}...")
+    all_orders, _, _ = fetch_orders_report(
+        access_token, account_id, marketplace_id, marketplace_code, ORDERS_BY_ORDER_DATE_REPORT,
+        datetime(2015, 1, 1), client_creds
+    )
+    print(f"    [Reports] Total Lifetime Orders Fetched: {len(all_orders)}")
+    return all_orders
 
-    # Define Full Range
-    # We will use 2015.
-    start_date = datetime(2015, 1, 1)
+def fetch_orders_report(access_token, account_id, marketplace_id, marketplace_code, report_type, start_date,
+                        client_creds=None, write=None, deadline=None):
+    """
+    Orders from `report_type` between `start_date` and now, one report per
+    30-day chunk, through stream_order_reports: chunks are requested and
+    downloaded while earlier documents are parsed, merged (later chunks
+    winning) and, if `write` is given, handed to write(orders) chunk by chunk.
+
+    No chunk is started after `deadline` (a time.time() value) or after a
+    chunk failed (e.g. createReport throttled), so the remaining quota and
+    time are not spent on chunks that cannot be checkpointed. Returns
+    (orders, complete, resume_at): resume_at is the start of the first chunk
+    not fetched, everything before it is done (None when complete).
+    """
     end_date = datetime.utcnow() - timedelta(minutes=2) 
-    
-    report_type = "GET_FLAT_FILE_ALL_ORDERS_DATA_BY_ORDER_DATE_GENERAL"
-    
-    all_orders = []
-    
+    chunks = []
     current_start = start_date
-    
-    # Token Management
-    token_start_time = time.time()
-    current_access_token = access_token
-
     while current_start < end_date:
-        # Check Token Expiry (Refreshing every 45 mins to be safe)
-        if client_creds and (time.time() - token_start_time) > 2700:
-            print("    [Reports] Refreshing Access Token to prevent expiry...")
-            try:
-                current_access_token = get_lwa_access_token(
-                    client_creds['client_id'], 
-                    client_creds['client_secret'], 
-                    client_creds['refresh_token']
-                )
-                token_start_time = time.time()
-                print("    [Reports] Access Token Refreshed.")
-            except Exception as e:
-                print(f"    [Reports] Failed to refresh token: {e}. Continuing with old token.")
+        current_end = min(current_start + timedelta(days=30), end_date)
+        chunks.append((current_start, current_end))
+        current_start = current_end
 
-        current_end = current_start + timedelta(days=30)
-        if current_end > end_date:
-            current_end = end_date
-            
+    started = time.time()
+    # Token, report-creation pacing and the stop flag are shared by the fetch workers
+    lock = threading.Lock()
+    state = {"token": access_token, "token_time": time.time(), "last_create": 0.0, "stopped": False}
+
+    def download(chunk):
         # Format dates ISO 8601
-        start_str = current_start.strftime('%Y-%m-%dT%H:%M:%SZ')
-        end_str = current_end.strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-        print(f"    [Reports] Processing Chunk: {start_str} to {end_str}")
-        
-        orders_batch = fetch_report_range(current_access_token, report_type, start_str, end_str, marketplace_id, account_id, marketplace_code)
-        all_orders.extend(orders_batch)
-        
-        # Move to next chunk
-        current_start = current_end
-        
-        # Simple rate limit for Report Creation (15 burst, 1 every 60s).
-        # We might hit throttle if we go too fast.
-        # Let's wait a bit.
-        time.sleep(10) # Safe buffer
+        start_str, end_str = (value.strftime('%Y-%m-%dT%H:%M:%SZ') for value in chunk)
+        with lock:
+            if state["stopped"] or (deadline and time.time() >= deadline):
+                state["stopped"] = True
+                return None
+            # Check Token Expiry (Refreshing every 45 mins to be safe)
+            if client_creds and (time.time() - state["token_time"]) > 2700:
+                print("    [Reports] Refreshing Access Token to prevent expiry...")
+                try:
+                    state["token"] = get_lwa_access_token(
+                        client_creds['client_id'], 
+                        client_creds['client_secret'], 
+                        client_creds['refresh_token']
+                    )
+                    state["token_time"] = time.time()
+                    print("    [Reports] Access Token Refreshed.")
+                except Exception as e:
+                    print(f"    [Reports] Failed to refresh token: {e}. Continuing with old token.")
 
-    print(f"    [Reports] Total Lifetime Orders Fetched: {len(all_orders)}")
-    return all_orders
+            # Simple rate limit for Report Creation (15 burst, 1 every 60s).
+            # Keep a safe buffer between creations across workers.
+            wait = state["last_create"] + 10 - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            state["last_create"] = time.time()
+            token = state["token"]
+
+        print(f"    [Reports] Processing Chunk: {start_str} to {end_str}")
+        poll_seconds = 300 if not deadline else max(min(300, deadline + 120 - time.time()), 30)
+        content = download_report_range(token, report_type, start_str, end_str, marketplace_id, poll_seconds)
+        if content is None:
+            state["stopped"] = True
+        return content
+
+    all_orders, failed = stream_order_reports(chunks, download, account_id, marketplace_code, write=write)
+    resume_at = chunks[failed[0]][0] if failed else None
+    print(f"    [Reports] {len(all_orders)} orders from {len(chunks) - len(failed)} of {len(chunks)} chunks "
+          f"in {time.time() - started:.0f}s" + (f", resuming at {resume_at.isoformat()}" if failed else ""))
+    return all_orders, not failed, resume_at
+
+def merge_order_lines(stored, update):
+    """
+    Upserts a re-reported order by order and line item: the update's lines
+    replace stored lines with the same SKU, other stored lines are kept.
+    """
+    if stored is None:
+        return update
+    skus = {line.sku for line in update.items}
+    update.items = [line for line in stored.items if line.sku not in skus] + update.items
+    update.order_total = sum(float(line.item_price or 0) for line in update.items)
+    return update
+
+def sync_orders_incremental(access_token, account_id, marketplace_id, marketplace_code, existing_orders, client_creds=None):
+    """
+    Pulls orders modified since the stored watermark from the last-update
+    order report and upserts them into `existing_orders`. Every
+    ORDERS_FULL_SYNC_DAYS (and on the first run) the lifetime order-date
+    report is re-pulled as well, as a consistency check.
+
+    Both pulls stop starting chunks after ORDERS_FETCH_BUDGET_SECONDS and
+    checkpoint what they finished: last_update_at advances to the first
+    unfetched chunk, and an unfinished re-pull stores full_cursor and
+    resumes from it on the next runs. The first re-pull sets last_update_at
+    when it starts, so last-update mode begins while it is still running.
+    Changed orders are saved chunk by chunk, before any watermark advances.
+    Returns the merged order list.
+    """
+    db = get_db()
+    stream = f"orders_{account_id}_{marketplace_code}"
+    mark = get_sync_watermark(db, stream)
+    started = datetime.utcnow()
+    deadline = time.time() + ORDERS_FETCH_BUDGET_SECONDS
+    ord_map = {item.id: item for item in existing_orders}
+
+    def upsert(full):
+        def write(orders):
+            # Chunks arrive in order and one at a time, so ord_map needs no lock
+            for item in orders:
+                # Update or Add
+                stored = ord_map.get(item.id)
+                merged = item if full else merge_order_lines(stored, item)
+                ord_map[item.id] = carry_fee_estimates(stored, merged)
+            save_json("orders.json", [ord_map[item.id] for item in orders])
+        return write
+
+    fetched = 0
+    if mark.get('last_update_at'):
+        since = datetime.fromisoformat(mark['last_update_at']) - WATERMARK_OVERLAP
+        print(f"    [Reports] Orders updated since {since.isoformat()} ({marketplace_code})...")
+        new_orders, complete, resume_at = fetch_orders_report(
+            access_token, account_id, marketplace_id, marketplace_code, ORDERS_BY_LAST_UPDATE_REPORT,
+            since, client_creds, write=upsert(False), deadline=deadline
+        )
+        fetched += len(new_orders)
+        last_update = started if complete else resume_at
+        if last_update > datetime.fromisoformat(mark['last_update_at']):
+            set_sync_watermark(db, stream, last_update_at=last_update.isoformat())
+
+    cursor = mark.get('full_cursor')
+    last_full = mark.get('last_full_at')
+    due = cursor or not last_full or started - datetime.fromisoformat(last_full) >= timedelta(days=ORDERS_FULL_SYNC_DAYS)
+    if due and time.time() < deadline:
+        values = {}
+        if cursor:
+            print(f"    [Reports] Resuming full order re-pull for {marketplace_code} at {cursor}...")
+            cycle_started = mark.get('full_started_at') or started.isoformat()
+        else:
+            print(f"    [Reports] Full order re-pull for {marketplace_code} (consistency check)...")
+            cycle_started = values["full_started_at"] = started.isoformat()
+            if not mark.get('last_update_at'):
+                # Orders changing behind the re-pull are caught by last-update mode from now on
+                values["last_update_at"] = started.isoformat()
+            set_sync_watermark(db, stream, **values)
+        new_orders, complete, resume_at = fetch_orders_report(
+            access_token, account_id, marketplace_id, marketplace_code, ORDERS_BY_ORDER_DATE_REPORT,
+            datetime.fromisoformat(cursor) if cursor else datetime(2015, 1, 1), client_creds,
+            write=upsert(True), deadline=deadline
+        )
+        fetched += len(new_orders)
+        if complete:
+            set_sync_watermark(db, stream, last_full_at=cycle_started, full_cursor=None)
+        elif resume_at.isoformat() != cursor:
+            set_sync_watermark(db, stream, full_cursor=resume_at.isoformat())
+    print(f"    [Reports] {fetched} orders fetched.")
+    return list(ord_map.values())
 
 def fetch_report_range(access_token, report_type, start_time, end_time, marketplace_id, account_id, marketplace_code):
+    """Orders in one report range as OrderRecords; None if the report could not be fetched."""
+    report_content = download_report_range(access_token, report_type, start_time, end_time, marketplace_id)
+    if report_content is None:
+        return None
+
+    # Parse the flat file column-wise into order records
+    orders = parse_orders_report(report_content, account_id, marketplace_code)
+    print(f"      [Reports] Processed {len(orders)} orders in chunk.")
+    return orders
+
+def download_report_range(access_token, report_type, start_time, end_time, marketplace_id, poll_seconds=300):
+    """Creates a report for one range, waits for it and returns the document bytes (None on failure)."""
     print(f"      [Reports] Requesting report...")
     report_id = create_report(access_token, report_type, start_time, end_time, marketplace_id)
     
     if not report_id:
         print("      [Reports] Failed to create report for this chunk. Skipping.")
-        return []
+        return None
 
     # Poll for Completion
     print(f"      [Reports] Polling for Report ID: {report_id}...")
     document_id = None
     
-    # Poll for up to 5 minutes
+    # Poll for up to poll_seconds (5 minutes by default)
     start_poll = time.time()
-    while (time.time() - start_poll) < 300:
+    while (time.time() - start_poll) < poll_seconds:
         report_status, doc_id = get_report_status(access_token, report_id)
         
         if report_status == "DONE":
@@ -838,85 +1222,15 @@ def fetch_report_range(access_token, report_type, start_time, end_time, marketpl
         
     if not document_id:
         print("      [Reports] Timed out or failed to get Document ID.")
-        return []
+        return None
 
-    # Download & Parse
+    # Download
     print(f"      [Reports] Downloading Document: {document_id}")
     report_content = get_report_document(access_token, document_id)
     
     if not report_content:
-        return []
-
-    # Parse CSV
-    import csv
-    try:
-        text_content = report_content.decode('utf-8')
-    except:
-        text_content = report_content.decode('iso-8859-1')
-
-    csv_reader = csv.DictReader(io.StringIO(text_content), delimiter='\t')
-    
-    orders = []
-    
-    for row in csv_reader:
-        amz_order_id = row.get('amazon-order-id')
-        if not amz_order_id: continue
-
-        # Basic Fields
-        status = row.get('order-status', 'Unknown')
-        purchase_date = row.get('purchase-date')
-        
-        currency = row.get('currency', 'USD')
-        sku = row.get('sku')
-        title = row.get('product-name')
-        
-        try:
-            qty = int(row.get('quantity-shipped', 0))
-        except: 
-            qty = 0
-            
-        try:
-            item_price = float(row.get('item-price', 0.0))
-        except:
-            item_price = 0.0
-            
-        estimated_fees = item_price * 0.15
-        estimated_proceeds = item_price - estimated_fees
-        channel = row.get('fulfillment-channel', 'Unknown') 
-
-        item_obj = {
-            "sku": sku,
-            "title": title,
-            "quantity": qty,
-            "item_price": item_price
-        }
-
-        existing_order = next((o for o in orders if o['id'] == amz_order_id), None)
-        
-        if existing_order:
-            existing_order['items'].append(item_obj)
-            existing_order['order_total'] += item_price
-            existing_order['estimated_fees'] += estimated_fees
-            existing_order['estimated_proceeds'] += estimated_proceeds
-        else:
-            orders.append({
-                "id": amz_order_id,
-                "amazon_order_id": amz_order_id,
-                "accountId": account_id,
-                "marketplaceId": marketplace_code,
-                "purchase_date": purchase_date,
-                "order_status": status,
-                "order_total": item_price,
-                "currency": currency,
-                "items": [item_obj],
-                "estimated_fees": estimated_fees,
-                "estimated_proceeds": estimated_proceeds,
-                "fulfillment_channel": "FBA" if channel == "AFN" else "FBM",
-                "updated_at": datetime.utcnow().isoformat()
-            })
-
-    print(f"      [Reports] Processed {len(orders)} orders in chunk.")
-    return orders
+        return None
+    return report_content
 
 def create_report(access_token, report_type, start_time, end_time, marketplace_ids):
     url = f"{SP_API_ENDPOINT}/reports/2021-06-30/reports"
@@ -984,32 +1298,60 @@ def sync_all_listings_report(access_token, account_id, marketplace_id, marketpla
     if not report_content:
         return {}
 
-    # Parse TSV
-    import csv
-    try:
-        text_content = report_content.decode('utf-8')
-    except:
-        text_content = report_content.decode('iso-8859-1')
-        
     # Headers in this report: seller-sku, asin1, item-name, price, quantity, status, etc.
-    csv_reader = csv.DictReader(io.StringIO(text_content), delimiter='\t')
-    
-    sku_price_map = {}
-    
-    for row in csv_reader:
-        sku = row.get('seller-sku')
-        price_str = row.get('price')
-        
-        if sku and price_str:
-            try:
-                price = float(price_str)
-                sku_price_map[sku] = price
-            except:
-                pass
+    sku_price_map = parse_listing_prices(report_content)
                 
     print(f"    [Reports] Fetched prices for {len(sku_price_map)} listings.")
     return sku_price_map
 
+def list_reports(access_token, report_types, created_since=None, marketplace_ids=None, processing_statuses="DONE"):
+    """
+    Lists reports (e.g. Amazon-generated settlement reports) via getReports.
+    Follows nextToken pagination. Returns a list of report dicts as returned
+    by the API (reportId, reportType, dataStartTime, dataEndTime, reportDocumentId, ...).
+    """
+    url = f"{SP_API_ENDPOINT}/reports/2021-06-30/reports"
+    base_params = {
+        "reportTypes": ",".join(report_types),
+        "processingStatuses": processing_statuses,
+        "pageSize": 100
+    }
+    if created_since:
+        base_params["createdSince"] = created_since
+    if marketplace_ids:
+        base_params["marketplaceIds"] = ",".join(marketplace_ids)
+
+    reports = []
+    next_token = None
+
+    while True:
+        # nextToken must be sent on its own; other filters are rejected alongside it
+        params = {"nextToken": next_token} if next_token else base_params.copy()
+        headers = sign_request('GET', url, access_token, params=params)
+        try:
+            response = requests.get(url, headers=headers, params=params)
+            if response.status_code == 429:
+                print("      [Reports] Throttled listing reports, retrying in 60s...")
+                time.sleep(60)
+                continue
+            if response.status_code != 200:
+                print(f"      List Reports Failed {response.status_code}: {response.text}")
+                break
+
+            data = response.json()
+            reports.extend(data.get('reports', []))
+            next_token = data.get('nextToken')
+            if not next_token:
+                break
+            # getReports: 0.0222 req/s sustained, burst 10
+            time.sleep(2)
+        except Exception as e:
+            print(f"      Exception Listing Reports: {e}")
+            break
+
+    print(f"      [Reports] Listed {len(reports)} reports.")
+    return reports
+
 def get_report_status(access_token, report_id):
     url = f"{SP_API_ENDPOINT}/reports/2021-06-30/reports/{report_id}"
     
@@ -0,0 +1,337 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from firebase_admin import firestore
+
+# Sync jobs live in Firestore so any instance can report on them.
+JOBS_COLLECTION = "sync_jobs"
+LOCKS_COLLECTION = "sync_locks"
+SYNC_LEASE_ID = "amazon_sync"
+
+# Lease must outlive the worker's 540s timeout so a crashed run frees it on its own.
+LEASE_TTL_SECONDS = 600
+
+# Sync generation: bumped on every collection write, read by API caches.
+SYNC_META_COLLECTION = "sync_meta"
+SYNC_STATE_DOC = "state"
+# Incremental sync watermarks: one map per stream, e.g. "inventory_{account}_{marketplace}"
+SYNC_WATERMARKS_DOC = "watermarks"
+
+# Phases reported by sync_amazon_data, in run order (used for progress).
+SYNC_PHASES = ["load", "inventory", "shipments", "listings", "orders", "enrichment", "save"]
+
+# Above this many changed IDs a collection is flagged for a full refetch instead
+# (keeps the job document well under Firestore's 1 MB limit).
+MAX_DELTA_IDS = 2000
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+ACTIVE_STATUSES = ("queued", "running")
+TIMED_OUT_ERROR = "timed out"
+
+
+def job_expires_at(job):
+    """When the job's sync lease runs out (jobs from before expires_at was stored: created_at + TTL)."""
+    if job.get('expires_at'):
+        return job['expires_at']
+    created = datetime.fromisoformat(job.get('created_at') or datetime.utcnow().isoformat())
+    return (created + timedelta(seconds=LEASE_TTL_SECONDS)).isoformat()
+
+
+def timed_out_update(job, now):
+    """
+    Update marking a queued/running job whose lease has expired as failed
+    (its worker was killed or ran out of memory), or None if it is still live.
+    """
+    if job.get('status') not in ACTIVE_STATUSES or job_expires_at(job) > now.isoformat():
+        return None
+    return {"status": "failed", "error": TIMED_OUT_ERROR, "finished_at": now.isoformat(), "updated_at": now.isoformat()}
+
+
+def enqueue_sync_job(db, trigger):
+    """
+    Creates a queued job in 'sync_jobs' and takes the sync lease for it.
+    If another sync already holds a live lease, no job is created and the
+    running job's ID is returned instead (coalescing duplicate triggers).
+    A job left queued/running under an expired lease is marked failed.
+    Returns (job_id, coalesced).
+    """
+    lease_ref = db.collection(LOCKS_COLLECTION).document(SYNC_LEASE_ID)
+    job_ref = db.collection(JOBS_COLLECTION).document()
+
+    @firestore.transactional
+    def _claim(transaction):
+        now = datetime.utcnow()
+        snapshot = lease_ref.get(transaction=transaction)
+        lease = snapshot.to_dict() if snapshot.exists else None
+
+        if lease and lease.get('expires_at', '') > now.isoformat():
+            return lease.get('job_id'), True
+
+        stale_update = None
+        if lease and lease.get('job_id'):
+            stale_ref = db.collection(JOBS_COLLECTION).document(lease['job_id'])
+            stale = stale_ref.get(transaction=transaction)
+            if stale.exists:
+                stale_update = timed_out_update(stale.to_dict(), now)
+
+        expires_at = (now + timedelta(seconds=LEASE_TTL_SECONDS)).isoformat()
+        if stale_update:
+            transaction.update(stale_ref, stale_update)
+        transaction.set(lease_ref, {
+            "job_id": job_ref.id,
+            "trigger": trigger,
+            "acquired_at": now.isoformat(),
+            "expires_at": expires_at
+        })
+        transaction.create(job_ref, {
+            "id": job_ref.id,
+            "trigger": trigger,
+            "status": "queued",
+            "phase": None,
+            "progress": 0.0,
+            "phases": {},
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "expires_at": expires_at
+        })
+        return job_ref.id, False
+
+    return _claim(db.transaction())
+
+
+def claim_sync_job(db, job_id):
+    """
+    Moves a job from 'queued' to 'running'. Returns False if the job was
+    already picked up (e.g. a redelivered trigger event).
+    """
+    job_ref = db.collection(JOBS_COLLECTION).document(job_id)
+
+    @firestore.transactional
+    def _claim(transaction):
+        snapshot = job_ref.get(transaction=transaction)
+        if not snapshot.exists or snapshot.to_dict().get('status') != "queued":
+            return False
+        now = datetime.utcnow().isoformat()
+        transaction.update(job_ref, {"status": "running", "started_at": now, "updated_at": now})
+        return True
+
+    return _claim(db.transaction())
+
+
+def release_sync_lease(db, job_id):
+    """Drops the sync lease, but only if it is still held by this job."""
+    lease_ref = db.collection(LOCKS_COLLECTION).document(SYNC_LEASE_ID)
+
+    @firestore.transactional
+    def _release(transaction):
+        snapshot = lease_ref.get(transaction=transaction)
+        if snapshot.exists and snapshot.to_dict().get('job_id') == job_id:
+            transaction.delete(lease_ref)
+
+    _release(db.transaction())
+
+
+def get_sync_generation(db):
+    snapshot = db.collection(SYNC_META_COLLECTION).document(SYNC_STATE_DOC).get()
+    return snapshot.to_dict().get('generation', 0) if snapshot.exists else 0
+
+
+def bump_sync_generation(db, collection_name):
+    """Marks synced data as changed so warm API instances drop cached reads."""
+    db.collection(SYNC_META_COLLECTION).document(SYNC_STATE_DOC).set({
+        "generation": firestore.Increment(1),
+        "last_collection": collection_name,
+        "updated_at": datetime.utcnow().isoformat()
+    }, merge=True)
+
+
+def get_sync_watermark(db, name):
+    """Stored watermark map for an incremental sync stream ({} if none yet)."""
+    snapshot = db.collection(SYNC_META_COLLECTION).document(SYNC_WATERMARKS_DOC).get()
+    return (snapshot.to_dict() or {}).get(name, {}) if snapshot.exists else {}
+
+
+def set_sync_watermark(db, name, **values):
+    """Merges `values` into a stream's watermark; call only after a successful fetch."""
+    db.collection(SYNC_META_COLLECTION).document(SYNC_WATERMARKS_DOC).set({name: values}, merge=True)
+
+
+def get_current_sync_job_id(db):
+    """ID of the job holding the sync lease, or None if no sync is running."""
+    snapshot = db.collection(LOCKS_COLLECTION).document(SYNC_LEASE_ID).get()
+    if not snapshot.exists:
+        return None
+    lease = snapshot.to_dict()
+    if lease.get('expires_at', '') <= datetime.utcnow().isoformat():
+        return None
+    return lease.get('job_id')
+
+
+def compact_delta(delta):
+    """
+    Shrinks {collection: [ids]} for clients: collections with too many changes
+    are sent as {"full": true} so the client just refetches them.
+    """
+    compact = {}
+    for collection_name, ids in (delta or {}).items():
+        if len(ids) > MAX_DELTA_IDS:
+            compact[collection_name] = {"full": True, "count": len(ids)}
+        else:
+            compact[collection_name] = {"full": False, "ids": ids}
+    return compact
+
+
+def get_sync_job(db, job_id):
+    """The job document; a queued/running job past its lease is marked failed first."""
+    job_ref = db.collection(JOBS_COLLECTION).document(job_id)
+    snapshot = job_ref.get()
+    if not snapshot.exists:
+        return None
+    job = snapshot.to_dict()
+    update = timed_out_update(job, datetime.utcnow())
+    if update:
+        @firestore.transactional
+        def _expire(transaction):
+            # Re-check inside the transaction: the worker may have just finished
+            current = job_ref.get(transaction=transaction).to_dict()
+            current_update = timed_out_update(current, datetime.utcnow())
+            if current_update:
+                transaction.update(job_ref, current_update)
+                current.update(current_update)
+            return current
+
+        job = _expire(db.transaction())
+    return job
+
+
+class SyncJobTracker:
+    """
+    Records phase, progress and per-phase timing on a job document.
+    Pass `tracker.phase` as the on_phase callback of sync_amazon_data.
+    """
+
+    def __init__(self, db, job_id):
+        self.job_ref = db.collection(JOBS_COLLECTION).document(job_id)
+        self.current_phase = None
+        self.phase_started = None
+        self.phases = {}
+
+    def _close_phase(self):
+        if self.current_phase:
+            self.phases[self.current_phase]["finished_at"] = datetime.utcnow().isoformat()
+            self.phases[self.current_phase]["duration_sec"] = round(time.time() - self.phase_started, 2)
+
+    def phase(self, name):
+        self._close_phase()
+        self.current_phase = name
+        self.phase_started = time.time()
+        self.phases[name] = {"started_at": datetime.utcnow().isoformat()}
+
+        progress = SYNC_PHASES.index(name) / len(SYNC_PHASES) if name in SYNC_PHASES else None
+        update = {"phase": name, "phases": self.phases, "updated_at": datetime.utcnow().isoformat()}
+        if progress is not None:
+            update["progress"] = round(progress, 2)
+        try:
+            self.job_ref.update(update)
+        except Exception as e:
+            # Progress reporting must never break the sync itself.
+            print(f"    Failed to update job progress: {e}")
+
+    def finish(self, status, error=None, delta=None):
+        self._close_phase()
+        self.current_phase = None
+        update = {
+            "status": status,
+            "phases": self.phases,
+            "finished_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        if status == "succeeded":
+            update["progress"] = 1.0
+        if error:
+            update["error"] = error
+        if delta is not None:
+            update["delta"] = compact_delta(delta)
+        self.job_ref.update(update)
+
+
+def run_sync_job(db, job_id):
+    """Worker entry point: claims the job, runs the sync and releases the lease."""
+    if not claim_sync_job(db, job_id):
+        print(f"Sync job {job_id} is not queued. Skipping.")
+        return
+
+    from sp_api_sync import sync_amazon_data
+
+    tracker = SyncJobTracker(db, job_id)
+    try:
+        delta = sync_amazon_data(on_phase=tracker.phase)
+        tracker.finish("succeeded", delta=delta)
+    except Exception as e:
+        print(f"Sync job {job_id} failed: {e}")
+        tracker.finish("failed", error=str(e))
+    finally:
+        release_sync_lease(db, job_id)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_job_events(job_id, load_job, poll_interval=2.0, timeout=300):
+    """
+    Server-sent events for a sync job. `load_job` returns the current job dict.
+    Emits a `phase` event per phase change, then `delta` (changed document IDs
+    per collection) and `done` once the job finishes. Comment lines are sent
+    between polls to keep proxies from closing the connection. If the job is
+    still running after `timeout` seconds a `timeout` event ends the stream,
+    and the client reconnects to keep following it.
+    """
+    deadline = time.time() + timeout
+    last_phase = None
+
+    while time.time() < deadline:
+        job = load_job()
+        if job is None:
+            yield format_sse("error", {"error": "Sync job not found"})
+            return
+
+        if job.get('phase') and job.get('phase') != last_phase:
+            last_phase = job['phase']
+            yield format_sse("phase", {
+                "job_id": job_id,
+                "phase": last_phase,
+                "progress": job.get('progress'),
+                "phases": job.get('phases', {})
+            })
+
+        if job.get('status') in TERMINAL_STATUSES:
+            if job.get('status') == "succeeded":
+                yield format_sse("delta", job.get('delta', {}))
+            yield format_sse("done", {
+                "job_id": job_id,
+                "status": job.get('status'),
+                "error": job.get('error')
+            })
+            return
+
+        yield ": keep-alive\n\n"
+        time.sleep(poll_interval)
+
+    yield format_sse("timeout", {"job_id": job_id})
+
+
+def wait_for_job_change(load_job, after, poll_interval=1.0, timeout=25):
+    """
+    Long-poll fallback for clients that cannot use SSE: blocks until the job's
+    updated_at moves past `after` (or the job finishes, or the timeout hits).
+    """
+    deadline = time.time() + timeout
+    job = load_job()
+    while job is not None and time.time() < deadline:
+        if (job.get('updated_at') or '') > (after or '') or job.get('status') in TERMINAL_STATUSES:
+            break
+        time.sleep(poll_interval)
+        job = load_job()
+    return job
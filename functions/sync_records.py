@@ -0,0 +1,202 @@
+"""
+Compact in-memory records for the sync pipeline.
+
+A lifetime sync holds every order and inventory item in memory. As plain
+dicts each record carries its own hash table and, when decoded from
+Firestore, its own copies of the account, marketplace, status and title
+strings. These slotted dataclasses store the fields positionally and intern
+the low-cardinality strings, so all records share one copy of each.
+
+Records are converted to dicts only at the Firestore/JSON boundary
+(as_dict / to_dict); from_dict(...).to_dict() round-trips exactly, including
+absent keys and unknown fields, so change fingerprints are unaffected.
+"""
+import sys
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+class _Absent:
+    """Marks a field whose key was not present in the source document."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "ABSENT"
+
+    def __bool__(self):
+        return False
+
+
+ABSENT = _Absent()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def as_dict(item):
+    """Record -> dict at the storage boundary; dicts pass through unchanged."""
+    to_dict = getattr(item, 'to_dict', None)
+    return to_dict() if to_dict is not None else item
+
+
+def _split(data, keys):
+    extra = {k: v for k, v in data.items() if k not in keys}
+    return extra or None
+
+
+def _emit(pairs, extra):
+    doc = {key: value for key, value in pairs if value is not ABSENT}
+    if extra:
+        doc.update(extra)
+    return doc
+
+
+@dataclass(slots=True)
+class OrderLine:
+    sku: Optional[str]
+    title: Optional[str]
+    quantity: Any = 0
+    item_price: Any = 0.0
+    extra: Optional[dict] = None
+
+    KEYS = frozenset(("sku", "title", "quantity", "item_price"))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            _intern(data.get('sku', ABSENT)), _intern(data.get('title', ABSENT)),
+            data.get('quantity', ABSENT), data.get('item_price', ABSENT), _split(data, cls.KEYS)
+        )
+
+    def to_dict(self):
+        return _emit((
+            ("sku", self.sku), ("title", self.title), ("quantity", self.quantity), ("item_price", self.item_price)
+        ), self.extra)
+
+
+@dataclass(slots=True)
+class OrderRecord:
+    id: str
+    account_id: Any
+    marketplace_code: Any
+    purchase_date: Any
+    order_status: Any
+    order_total: Any
+    currency: Any
+    items: list
+    estimated_fees: Any = ABSENT
+    estimated_proceeds: Any = ABSENT
+    fulfillment_channel: Any = ABSENT
+    updated_at: Any = ABSENT
+    fee_source: Any = ABSENT
+    # Usually the same string object as `id`, so it costs one pointer
+    amazon_order_id: Any = ABSENT
+    extra: Optional[dict] = None
+
+    KEYS = frozenset((
+        "id", "amazon_order_id", "accountId", "marketplaceId", "purchase_date", "order_status", "order_total",
+        "currency", "items", "estimated_fees", "estimated_proceeds", "fulfillment_channel", "updated_at",
+        "fee_source"
+    ))
+
+    @classmethod
+    def from_dict(cls, data):
+        order_id = data['id']
+        amazon_order_id = data.get('amazon_order_id', ABSENT)
+        return cls(
+            id=order_id,
+            account_id=_intern(data.get('accountId', ABSENT)),
+            marketplace_code=_intern(data.get('marketplaceId', ABSENT)),
+            purchase_date=data.get('purchase_date', ABSENT),
+            order_status=_intern(data.get('order_status', ABSENT)),
+            order_total=data.get('order_total', ABSENT),
+            currency=_intern(data.get('currency', ABSENT)),
+            items=[OrderLine.from_dict(item) for item in data.get('items') or []],
+            estimated_fees=data.get('estimated_fees', ABSENT),
+            estimated_proceeds=data.get('estimated_proceeds', ABSENT),
+            fulfillment_channel=_intern(data.get('fulfillment_channel', ABSENT)),
+            updated_at=data.get('updated_at', ABSENT),
+            fee_source=_intern(data.get('fee_source', ABSENT)),
+            amazon_order_id=order_id if amazon_order_id == order_id else amazon_order_id,
+            extra=_split(data, cls.KEYS)
+        )
+
+    def to_dict(self):
+        return _emit((
+            ("id", self.id), ("amazon_order_id", self.amazon_order_id), ("accountId", self.account_id),
+            ("marketplaceId", self.marketplace_code), ("purchase_date", self.purchase_date),
+            ("order_status", self.order_status), ("order_total", self.order_total), ("currency", self.currency),
+            ("items", [item.to_dict() for item in self.items]), ("estimated_fees", self.estimated_fees),
+            ("estimated_proceeds", self.estimated_proceeds), ("fulfillment_channel", self.fulfillment_channel),
+            ("updated_at", self.updated_at), ("fee_source", self.fee_source)
+        ), self.extra)
+
+
+def inventory_doc_id(account_id, marketplace_code, sku):
+    safe_sku = sku.replace("/", "_").replace("\\", "_")
+    return f"{account_id}_{marketplace_code}_{safe_sku}"
+
+
+@dataclass(slots=True)
+class InventoryRecord:
+    sku: str
+    asin: Any
+    title: Any
+    stock_level: Any
+    currency: Any
+    status: Any
+    account_id: Any
+    marketplace_code: Any
+    updated_at: Any = ABSENT
+    price: Any = ABSENT
+    estimated_fees: Any = ABSENT
+    estimated_proceeds: Any = ABSENT
+    last_sold_date: Any = ABSENT
+    fee_source: Any = ABSENT
+    # Only set when the stored document ID is not the derived one
+    id_override: Optional[str] = None
+    extra: Optional[dict] = None
+
+    KEYS = frozenset((
+        "id", "sku", "asin", "title", "stock_level", "currency", "status", "accountId", "marketplaceId",
+        "updated_at", "price", "estimated_fees", "estimated_proceeds", "last_sold_date", "fee_source"
+    ))
+
+    @property
+    def id(self):
+        return self.id_override or inventory_doc_id(self.account_id, self.marketplace_code, self.sku)
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls(
+            sku=_intern(data.get('sku', ABSENT)),
+            asin=_intern(data.get('asin', ABSENT)),
+            title=_intern(data.get('title', ABSENT)),
+            stock_level=data.get('stock_level', ABSENT),
+            currency=_intern(data.get('currency', ABSENT)),
+            status=_intern(data.get('status', ABSENT)),
+            account_id=_intern(data.get('accountId', ABSENT)),
+            marketplace_code=_intern(data.get('marketplaceId', ABSENT)),
+            updated_at=data.get('updated_at', ABSENT),
+            price=data.get('price', ABSENT),
+            estimated_fees=data.get('estimated_fees', ABSENT),
+            estimated_proceeds=data.get('estimated_proceeds', ABSENT),
+            last_sold_date=data.get('last_sold_date', ABSENT),
+            fee_source=_intern(data.get('fee_source', ABSENT)),
+            extra=_split(data, cls.KEYS)
+        )
+        doc_id = data.get('id')
+        if not isinstance(record.sku, str) or doc_id != record.id:
+            record.id_override = doc_id
+        return record
+
+    def to_dict(self):
+        return _emit((
+            ("id", self.id), ("sku", self.sku), ("asin", self.asin), ("title", self.title),
+            ("stock_level", self.stock_level), ("currency", self.currency), ("status", self.status),
+            ("accountId", self.account_id), ("marketplaceId", self.marketplace_code), ("updated_at", self.updated_at),
+            ("price", self.price), ("estimated_fees", self.estimated_fees),
+            ("estimated_proceeds", self.estimated_proceeds), ("last_sold_date", self.last_sold_date),
+            ("fee_source", self.fee_source)
+        ), self.extra)
@@ -0,0 +1,73 @@
+import os
+from abc import ABC, abstractmethod
+
+# Comma-separated list of extra sinks each sync run writes its changed records
+# to, e.g. SYNC_SINKS=postgres. Firestore stays the primary store and is
+# written by sp_api_sync.save_json as before.
+SYNC_SINKS_ENV = "SYNC_SINKS"
+
+
+class SyncSink(ABC):
+    """
+    Destination for the records a sync run changed. write() receives whole
+    records for one collection ('inventory', 'orders', 'shipments') and may be
+    called several times per run; close() is called once at the end.
+    """
+    name = "sink"
+
+    @abstractmethod
+    def write(self, collection, records):
+        """Writes `records` for `collection`; returns the number written."""
+
+    def close(self):
+        pass
+
+
+def _postgres_sink():
+    # Imported lazily: psycopg2 is only needed when the sink is enabled
+    from postgres_sink import PostgresSink
+    return PostgresSink(os.environ["POSTGRES_SINK_URL"])
+
+
+SINK_FACTORIES = {
+    "postgres": _postgres_sink,
+}
+
+
+def configured_sinks():
+    """Instantiates the sinks named in SYNC_SINKS. Unknown or broken sinks are skipped."""
+    sinks = []
+    for name in os.environ.get(SYNC_SINKS_ENV, "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        factory = SINK_FACTORIES.get(name)
+        if factory is None:
+            print(f"    [Sinks] Unknown sink '{name}', skipping.")
+            continue
+        try:
+            sinks.append(factory())
+        except Exception as e:
+            print(f"    [Sinks] Could not start sink '{name}': {e}")
+    return sinks
+
+
+def publish_changes(records_by_collection, delta, sinks=None):
+    """
+    Sends the records listed in `delta` ({collection: [changed IDs]}) to every
+    sink. A failing sink is logged and does not fail the sync; its data can be
+    repaired with the sink's backfill (see postgres_sink.py).
+    """
+    if sinks is None:
+        sinks = configured_sinks()
+    for sink in sinks:
+        try:
+            for collection, ids in delta.items():
+                wanted = set(ids)
+                records = [r for r in records_by_collection.get(collection, []) if str(r.get('id')) in wanted]
+                if records:
+                    sink.write(collection, records)
+        except Exception as e:
+            print(f"    [Sinks] {sink.name} failed: {e}")
+        finally:
+            sink.close()
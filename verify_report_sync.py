@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 
 load_dotenv(".env.local")
 
-print("Running Manual Sync Verification...")
-sync_amazon_data()
-print("Manual Sync Verification Done.")
+if __name__ == "__main__":
+    print("Running Manual Sync Verification...")
+    sync_amazon_data()
+    print("Manual Sync Verification Done.")